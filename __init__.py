@@ -1,6 +1,9 @@
-
-from poetree.main   import Poetree
-from poetree.corpus import Corpus
-from poetree.author import Author
-from poetree.source import Source
-from poetree.poem   import Poem
+from poetree.main      import Poetree
+from poetree.corpus    import Corpus
+from poetree.author    import Author
+from poetree.source    import Source
+from poetree.poem      import Poem
+from poetree.transport import Transport, BaseTransport, InProcessTransport, ReplayTransport
+from poetree.glob      import fetch_bodies
+from poetree.cache     import Cache, CacheMiss
+from poetree.query     import Index
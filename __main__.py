@@ -0,0 +1,4 @@
+import sys
+from poetree.cli import main
+
+sys.exit(main())
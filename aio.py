@@ -0,0 +1,698 @@
+import asyncio
+import random
+import time
+import weakref
+from typing import Union, Any, AsyncIterator, TYPE_CHECKING
+from .config import BASE_URL
+from .glob import Entity, metadata, _decode
+from .cache import Cache, CacheMiss
+from .snapshot import get_snapshot
+from .singleflight import AsyncSingleFlight
+from .scheduler import AsyncScheduler, retry_after
+from .hooks import Hooks
+if TYPE_CHECKING:
+    import pandas as pd
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncTransport:
+    '''
+    Asynchronous counterpart of Transport built on aiohttp. Owns a pooled
+    aiohttp.ClientSession and a scheduler adapting the number of requests
+    in flight, retries transient failures with exponential backoff and
+    full jitter. Events of the request path are reported to handlers in
+    hooks.
+    '''
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(
+            self,
+            timeout         : float                      = 30,
+            retries         : int                        = 3,
+            backoff_factor  : float                      = 0.5,
+            backoff_max     : float                      = 30,
+            pool_maxsize    : int                        = 10,
+            max_concurrency : int                        = 10,
+            headers         : Union[dict,None]           = None,
+            cache           : Union[Cache,None]          = None,
+            scheduler       : Union[AsyncScheduler,None] = None,
+        ):
+        '''
+        Store settings. The session itself is created on first request
+        as it has to be bound to a running event loop.
+
+        Arguments:
+            timeout         (float)               : Total request timeout in seconds; default: 30
+            retries         (int)                 : How many times to retry a failed request;
+                                                    default: 3
+            backoff_factor  (float)               : Base of exponential backoff in seconds;
+                                                    default: 0.5
+            backoff_max     (float)               : Upper bound of a single backoff in seconds;
+                                                    default: 30
+            pool_maxsize    (int)                 : Max. number of pooled connections; default: 10
+            max_concurrency (int)                 : Max. number of requests in flight; default: 10
+            headers         (dict|None)           : Extra headers sent with every request
+            cache           (Cache|None)          : On-disk response cache consulted before
+                                                    sending a request; default: None
+            scheduler       (AsyncScheduler|None) : Rate and concurrency limits of requests;
+                                                    default: None (adaptive, at most
+                                                    max_concurrency requests in flight)
+
+        Raises:
+            ImportError : If aiohttp is not installed
+
+        Returns:
+            None
+        '''
+        if aiohttp is None:
+            raise ImportError('Async client requires aiohttp (pip install aiohttp)')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+        self.cache = cache
+        self.inflight = AsyncSingleFlight()
+        self.hooks = Hooks()
+        self.headers = {'Accept-Encoding': 'gzip, deflate', **(headers or dict())}
+        self.scheduler = scheduler if scheduler is not None else AsyncScheduler(
+            max_concurrency = max_concurrency
+        )
+        self.session = None
+
+
+    async def get(self, url:str, params:dict) -> tuple:
+        '''
+        Send GET request, retrying transient failures. The last response
+        (or exception) is passed on once retries are exhausted.
+
+        Arguments:
+            url    (str)  : Full URL of the API method
+            params (dict) : URL parameters
+
+        Returns:
+            (tuple) : Status code, reason and body of the response
+        '''
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector = aiohttp.TCPConnector(limit=self.pool_maxsize),
+                timeout   = aiohttp.ClientTimeout(total=self.timeout),
+                headers   = self.headers,
+            )
+        params = {k: str(v) for k, v in params.items()}
+        endpoint = url.rsplit('/', 1)[-1]
+        priority = self.scheduler.priority(url, params)
+        for attempt in range(self.retries + 1):
+            started = await self.scheduler.acquire(priority)
+            overloaded, delay = False, None
+            event = {'url': url, 'endpoint': endpoint, 'params': params, 'attempt': attempt}
+            self.hooks.emit('before_request', **event)
+            sent = time.perf_counter()
+            try:
+                async with self.session.get(url, params=params) as response:
+                    body = await response.read()
+                    self.hooks.emit(
+                        'after_response', status=response.status, size=len(body),
+                        elapsed=time.perf_counter() - sent, **event
+                    )
+                    if response.status in self.RETRY_STATUS:
+                        overloaded, delay = True, retry_after(response.headers)
+                    if not overloaded or attempt == self.retries:
+                        return response.status, response.reason, body
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                overloaded = True
+                self.hooks.emit('on_error', error=e, elapsed=time.perf_counter() - sent, **event)
+                if attempt == self.retries:
+                    raise
+            finally:
+                self.scheduler.release(started, (url, priority), overloaded, delay)
+            await asyncio.sleep(
+                random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+            )
+
+
+    async def close(self):
+        '''
+        Close the session and all pooled connections.
+        '''
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+_default_transports = weakref.WeakKeyDictionary()
+
+def get_default_transport() -> AsyncTransport:
+    '''
+    Return the transport used by instances created without one. Sessions
+    cannot be shared across event loops, so there is one per running loop.
+
+    Returns:
+        (AsyncTransport) : Default transport of the running event loop
+    '''
+    loop = asyncio.get_running_loop()
+    if loop not in _default_transports:
+        _default_transports[loop] = AsyncTransport()
+    return _default_transports[loop]
+
+
+async def make_request(
+        base_url  : str,
+        endpoint  : str,
+        transport : Union[AsyncTransport,None] = None,
+        **kwargs
+    ) -> Union[dict,list]:
+    '''
+    Send request to PoeTree API. Returns the decoded JSON response.
+    Asynchronous counterpart of glob.make_request.
+
+    Arguments:
+        url       (string)              : API method name
+        transport (AsyncTransport|None) : Transport to send the request with
+                                          (default: transport of the running loop)
+        **kwargs  (dict)                : URL parameters
+
+    Returns:
+        response (dict|list) : response JSON decoded
+    '''
+    if base_url.startswith('file://'):
+        return get_snapshot(base_url).request(endpoint, **kwargs)
+    if not base_url.endswith('/'):
+        base_url += '/'
+    if transport is None:
+        transport = get_default_transport()
+    key = (base_url, endpoint, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+    return await transport.inflight.do(
+        key, lambda: _send(base_url, endpoint, transport, kwargs)
+    )
+
+
+async def _send(
+        base_url  : str,
+        endpoint  : str,
+        transport : AsyncTransport,
+        kwargs    : dict
+    ) -> Union[dict,list]:
+    '''
+    Body of make_request(): get the response from the cache or the server
+    and decode it. Concurrent identical requests share one call. The cache
+    (SQLite, blocking) is read and written in worker threads, off the
+    event loop.
+    '''
+    url = base_url + endpoint
+    cache = transport.cache
+    if cache is not None:
+        key = cache.key(base_url, endpoint, kwargs)
+        cached = await asyncio.to_thread(cache.get, key)
+        transport.hooks.emit('cache', endpoint=endpoint, params=kwargs, hit=cached is not None)
+        if cached is not None:
+            return _decode(transport, endpoint, cached)
+        if cache.offline:
+            raise CacheMiss(f'Response not cached (offline mode): {endpoint} {kwargs}')
+    status, reason, body = await transport.get(url, kwargs)
+    if status == 200:
+        try:
+            decoded = _decode(transport, endpoint, body)
+        except:
+            raise Exception(f'Invalid JSON response')
+        if cache is not None:
+            await asyncio.to_thread(cache.set, key, body)
+        return decoded
+    else:
+        raise Exception(f'Server responded with status code {status}: {reason}')
+
+
+async def get_content(
+        base_url  : str,
+        endpoint  : str,
+        class_    : Any,
+        transport : Union[AsyncTransport,None] = None,
+        **kwargs
+    ) -> list:
+    '''
+    Get metadata on subordinate elements (Poetree->Corpus->Author/Source->Poem).
+    Asynchronous counterpart of glob.get_content.
+
+    Params:
+        transport (AsyncTransport|None) : Transport shared with the created instances
+
+    Returns:
+        (list) : List holding instances of subordinate class
+    '''
+    response = await make_request(base_url, endpoint, transport, **kwargs)
+    content = list()
+    started = time.perf_counter()
+    for r in response:
+        if endpoint != 'corpora':
+            # the response may be shared with concurrent callers
+            r = {**r, 'corpus': kwargs['corpus']}
+        content.append(
+            class_(base_url=base_url, transport=transport, metadata=r)
+        )
+    (transport or get_default_transport()).hooks.emit(
+        'construct', endpoint=endpoint, count=len(content), elapsed=time.perf_counter() - started
+    )
+    return content
+
+
+async def fetch_bodies(poems:list, **kwargs) -> dict:
+    '''
+    Fetch bodies of many poems concurrently and store them in each
+    AsyncPoem.content_. Concurrency is bounded by the transport. A failed
+    poem does not abort the batch, its error is reported in the returned
+    dict instead.
+
+    Arguments:
+        poems    (list) : AsyncPoem instances
+        **kwargs (dict) : URL parameters passed to AsyncPoem.get_body()
+
+    Returns:
+        (dict) : Exceptions keyed by AsyncPoem instances that failed; empty if
+                 all bodies were fetched
+    '''
+    results = await asyncio.gather(
+        *[p.get_body(**kwargs) for p in poems], return_exceptions=True
+    )
+    return {p: r for p, r in zip(poems, results) if isinstance(r, Exception)}
+
+
+class _AsyncEntity(Entity):
+    '''
+    Shared behaviour of async entities: instances created directly (without
+    metadata) fetch their metadata when awaited.
+    '''
+
+    __slots__ = ('_request',)
+
+    def __await__(self):
+        return self._load().__await__()
+
+
+    async def _load(self):
+        if self._request is not None:
+            endpoint, params = self._request
+            response = await make_request(
+                self.base_url, endpoint, self.transport, **params
+            )
+            # the response may be shared with concurrent callers
+            self.metadata_ = {**response, 'corpus': params['corpus']}
+            self._request = None
+        return self
+
+
+    def metadata(
+            self,
+            target  : str             = 'self',
+            output  : str             = 'list',
+            sortby  : Union[str,list] = None,
+            reverse : bool            = False
+        ) -> Union[list, 'pd.DataFrame', None]:
+        '''
+        Returns target metadata, see Corpus.metadata()
+        '''
+        if target == 'self':
+            return metadata([self], output, sortby, reverse)
+        else:
+            return metadata(self.content_[target], output, sortby, reverse)
+
+
+class AsyncPoetree:
+    '''
+    Asynchronous counterpart of Poetree
+    '''
+
+    def __init__(
+            self,
+            base_url  : str                        = BASE_URL,
+            transport : Union[AsyncTransport,None] = None
+        ):
+        '''
+        Set API base URL. Create empty dict self.content_ that will
+        hold a list of AsyncCorpus instances.
+
+        Params:
+            base_url  (str)                 : API base URL (default: set in config.py)
+            transport (AsyncTransport|None) : Transport shared by all instances created
+                                              from this one (default: transport of the
+                                              running loop)
+        '''
+        self.base_url = base_url
+        self.transport = transport
+        self.content_ = dict()
+
+
+    async def get_corpora(self) -> list:
+        '''
+        Get metadata of all available corpora, see Poetree.get_corpora()
+        '''
+        self.content_['corpora'] = await get_content(
+            self.base_url, 'corpora', AsyncCorpus, self.transport
+        )
+        return self.content_['corpora']
+
+
+    async def iter_corpora(self) -> AsyncIterator:
+        '''
+        Iterate over all available corpora (async for). Instances are not
+        stored in self.content_.
+        '''
+        for corpus in await get_content(
+            self.base_url, 'corpora', AsyncCorpus, self.transport
+        ):
+            yield corpus
+
+
+    def metadata(
+            self,
+            target  : str             = 'corpora',
+            output  : str             = 'list',
+            sortby  : Union[str,list] = None,
+            reverse : bool            = False
+        ) -> Union[list, 'pd.DataFrame', None]:
+        '''
+        Returns metadata of selected target, see Poetree.metadata()
+        '''
+        return metadata(self.content_[target], output, sortby, reverse)
+
+
+class AsyncCorpus(_AsyncEntity):
+    '''
+    Asynchronous counterpart of Corpus. When initialized directly it has
+    to be awaited: corpus = await AsyncCorpus('cs')
+    '''
+
+    __slots__ = ()
+
+    def __init__(
+            self,
+            lang      : Union[str,None]            = None,
+            base_url  : str                        = BASE_URL,
+            metadata  : Union[dict,None]           = None,
+            transport : Union[AsyncTransport,None] = None
+        ):
+        '''
+        See Corpus.__init__()
+        '''
+        self.base_url = base_url
+        self.transport = transport
+        self.content_ = dict()
+        self._request = None
+        if metadata is not None:
+            self.metadata_ = metadata
+        elif lang is not None:
+            self._request = ('corpus', {'corpus': lang})
+        else:
+            raise ValueError (
+                'Argument [lang] is required when initializing ' +
+                f'{__class__.__name__} instance directly'
+            )
+
+
+    async def get_authors(self, **kwargs) -> list:
+        '''
+        Get metadata of all available authors, see Corpus.get_authors()
+        '''
+        if 'country' in kwargs and isinstance(kwargs['country'], list):
+            kwargs['country'] = ','.join(kwargs['country'])
+        self.content_['authors'] = await get_content(
+            self.base_url, 'authors', AsyncAuthor, self.transport,
+            corpus=self.metadata_['corpus'], **kwargs
+        )
+        return self.content_['authors']
+
+
+    async def iter_authors(self, **kwargs) -> AsyncIterator:
+        '''
+        Iterate over authors (async for), see Corpus.get_authors(). Instances
+        are not stored in self.content_.
+        '''
+        if 'country' in kwargs and isinstance(kwargs['country'], list):
+            kwargs['country'] = ','.join(kwargs['country'])
+        for author in await get_content(
+            self.base_url, 'authors', AsyncAuthor, self.transport,
+            corpus=self.metadata_['corpus'], **kwargs
+        ):
+            yield author
+
+
+    async def get_sources(self, **kwargs) -> list:
+        '''
+        Get metadata of all available sources, see Corpus.get_sources()
+        '''
+        self.content_['sources'] = await get_content(
+            self.base_url, 'sources', AsyncSource, self.transport,
+            corpus=self.metadata_['corpus'], **kwargs
+        )
+        return self.content_['sources']
+
+
+    async def iter_sources(self, **kwargs) -> AsyncIterator:
+        '''
+        Iterate over sources (async for), see Corpus.get_sources(). Instances
+        are not stored in self.content_.
+        '''
+        for source in await get_content(
+            self.base_url, 'sources', AsyncSource, self.transport,
+            corpus=self.metadata_['corpus'], **kwargs
+        ):
+            yield source
+
+
+class AsyncAuthor(_AsyncEntity):
+    '''
+    Asynchronous counterpart of Author. When initialized directly it has
+    to be awaited: author = await AsyncAuthor('cs', id_=1)
+    '''
+
+    __slots__ = ('errors_',)
+
+    def __init__(
+            self,
+            lang      : Union[None,str]            = None,
+            base_url  : str                        = BASE_URL,
+            id_       : Union[None,int]            = None,
+            wiki      : Union[None,str]            = None,
+            viaf      : Union[None,str]            = None,
+            metadata  : dict                       = None,
+            transport : Union[AsyncTransport,None] = None
+        ):
+        '''
+        See Author.__init__()
+        '''
+        self.base_url = base_url
+        self.transport = transport
+        self.content_ = dict()
+        self.errors_ = dict()
+        self._request = None
+
+        if metadata is not None:
+            self.metadata_ = metadata
+        elif lang is None:
+            raise ValueError (
+                'Argument [lang] is required when initializing ' +
+                f'{__class__.__name__} instance directly'
+            )
+        elif id_ is not None:
+            self._request = ('author', {'corpus': lang, 'id_author': id_})
+        elif wiki is not None:
+            self._request = ('author', {'corpus': lang, 'wiki': wiki})
+        elif viaf is not None:
+            self._request = ('author', {'corpus': lang, 'viaf': viaf})
+        else:
+            raise ValueError (
+                'One of the arguments [id_,wiki,viaf] is required when initializing ' +
+                f'{__class__.__name__} instance directly'
+            )
+
+
+    async def get_sources(self, **kwargs) -> list:
+        '''
+        Get metadata of sources by the author, see Author.get_sources()
+        '''
+        self.content_['sources'] = await get_content(
+            self.base_url, 'sources', AsyncSource, self.transport,
+            corpus = self.metadata_['corpus'],
+            id_author = self.metadata_['id_'],
+            **kwargs
+        )
+        return self.content_['sources']
+
+
+    async def get_poems(self, with_bodies:bool=False, **kwargs) -> list:
+        '''
+        Get metadata of poems by the author, see Author.get_poems(). With
+        [with_bodies] the bodies are fetched concurrently, bounded by the
+        transport.
+        '''
+        self.content_['poems'] = await get_content(
+            self.base_url, 'poems', AsyncPoem, self.transport,
+            corpus = self.metadata_['corpus'],
+            id_author = self.metadata_['id_'],
+            **kwargs
+        )
+        if with_bodies:
+            self.errors_ = await fetch_bodies(self.content_['poems'])
+        return self.content_['poems']
+
+
+    async def iter_poems(self, **kwargs) -> AsyncIterator:
+        '''
+        Iterate over poems by the author (async for). Instances are not
+        stored in self.content_.
+        '''
+        for poem in await get_content(
+            self.base_url, 'poems', AsyncPoem, self.transport,
+            corpus = self.metadata_['corpus'],
+            id_author = self.metadata_['id_'],
+            **kwargs
+        ):
+            yield poem
+
+
+class AsyncSource(_AsyncEntity):
+    '''
+    Asynchronous counterpart of Source. When initialized directly it has
+    to be awaited: source = await AsyncSource('cs', id_=1)
+    '''
+
+    __slots__ = ('errors_',)
+
+    def __init__(
+            self,
+            lang      : Union[None,str]            = None,
+            base_url  : str                        = BASE_URL,
+            id_       : Union[None,int]            = None,
+            id_poem   : Union[None,int]            = None,
+            metadata  : dict                       = None,
+            transport : Union[AsyncTransport,None] = None
+        ):
+        '''
+        See Source.__init__()
+        '''
+        self.base_url = base_url
+        self.transport = transport
+        self.content_ = dict()
+        self.errors_ = dict()
+        self._request = None
+
+        if metadata is not None:
+            self.metadata_ = metadata
+        elif lang is None:
+            raise ValueError (
+                f'Argument [lang] is required when initializing {__class__.__name__} instance directly'
+            )
+        elif id_ is not None:
+            self._request = ('source', {'corpus': lang, 'id_source': id_})
+        elif id_poem is not None:
+            self._request = ('source', {'corpus': lang, 'id_poem': id_poem})
+        else:
+            raise ValueError (
+                f'One of the arguments [id_,id_poem] is required when initializing {__class__.__name__} instance directly'
+            )
+
+
+    async def get_poems(self, with_bodies:bool=False, **kwargs) -> list:
+        '''
+        Get metadata of poems in the source, see Source.get_poems(). With
+        [with_bodies] the bodies are fetched concurrently, bounded by the
+        transport.
+        '''
+        self.content_['poems'] = await get_content(
+            self.base_url, 'poems', AsyncPoem, self.transport,
+            corpus = self.metadata_['corpus'],
+            id_source = self.metadata_['id_'],
+            **kwargs
+        )
+        if with_bodies:
+            self.errors_ = await fetch_bodies(self.content_['poems'])
+        return self.content_['poems']
+
+
+    async def iter_poems(self, **kwargs) -> AsyncIterator:
+        '''
+        Iterate over poems in the source (async for). Instances are not
+        stored in self.content_.
+        '''
+        for poem in await get_content(
+            self.base_url, 'poems', AsyncPoem, self.transport,
+            corpus = self.metadata_['corpus'],
+            id_source = self.metadata_['id_'],
+            **kwargs
+        ):
+            yield poem
+
+
+class AsyncPoem(_AsyncEntity):
+    '''
+    Asynchronous counterpart of Poem. When initialized directly it has
+    to be awaited: poem = await AsyncPoem('cs', id_=1)
+    '''
+
+    __slots__ = ()
+
+    def __init__(
+            self,
+            lang      : Union[None,str]            = None,
+            base_url  : str                        = BASE_URL,
+            id_       : Union[None,int]            = None,
+            metadata  : dict                       = None,
+            transport : Union[AsyncTransport,None] = None
+        ):
+        '''
+        See Poem.__init__()
+        '''
+        self.base_url = base_url
+        self.transport = transport
+        self.content_ = list()
+        self._request = None
+
+        if metadata is not None:
+            self.metadata_ = metadata
+        elif lang is None:
+            raise ValueError (
+                'Argument [lang] is required when initializing ' +
+                f'{__class__.__name__} instance directly'
+            )
+        elif id_ is None:
+            raise ValueError (
+                'One of the arguments [id_,wiki,viaf] is required when initializing ' +
+                f'{__class__.__name__} instance directly'
+            )
+        else:
+            self._request = ('poem', {'corpus': lang, 'id_poem': id_, 'lines': 0})
+
+
+    async def get_body(self, **kwargs) -> list:
+        '''
+        Get body of the poem (if not fetched yet), see Poem.get_body()
+        '''
+        if len(self.content_) == 0:
+            response = await make_request(
+                self.base_url,
+                'poem',
+                self.transport,
+                **{'corpus': self.corpus, 'id_poem': self.id_, **kwargs}
+            )
+            self.content_[:] = response['body']
+        return self.content_
+
+
+    async def get_all(self) -> dict:
+        '''
+        Get body of the poem together with metadata, see Poem.get_all()
+        '''
+        if len(self.content_) == 0:
+            await self.get_body()
+        return {**self.metadata_, **{'body': self.content_}}
@@ -1,24 +1,30 @@
-from typing import Union
-import pandas as pd
+from typing import Union, Iterator, TYPE_CHECKING
 from .config import BASE_URL
-from .glob import make_request, metadata, get_content
+from .transport import BaseTransport
+from .glob import IndexedEntity, make_request, metadata, get_content, iter_content, fetch_bodies, construct_many
 from .source import Source
 from .poem import Poem
+if TYPE_CHECKING:
+    import pandas as pd
 
 
-class Author:
+class Author(IndexedEntity):
     '''
     Class corresponding to a particular author.
     '''
 
+    __slots__ = ('errors_',)
+    QUERY_TARGETS = ('poems', 'sources')
+
     def __init__(
             self, 
-            lang     : Union[None,str] = None, 
-            base_url : str             = BASE_URL, 
-            id_      : Union[None,int] = None,
-            wiki     : Union[None,str] = None, 
-            viaf     : Union[None,str] = None,
-            metadata : dict            = None 
+            lang      : Union[None,str]           = None, 
+            base_url  : str                       = BASE_URL, 
+            id_       : Union[None,int]           = None,
+            wiki      : Union[None,str]           = None, 
+            viaf      : Union[None,str]           = None,
+            metadata  : dict                      = None,
+            transport : Union[BaseTransport,None] = None
         ):
         '''
         Store author metadata (if initialized by Poetree instance) or get them 
@@ -26,12 +32,14 @@ class Author:
         that will hold lists of Source and Poem instances.
 
         Arguments:
-            lang     (str|None)  : ISO code of the corpus, required if initialized directly 
-            base_url (str)       : API base URL (default: set in config.py)
-            id_      (int|None)  : Id(DB) of the author
-            wiki     (str|None)  : Wiki id of the author
-            viaf     (str|None)  : Viaf id of the author
-            metadata (dict|None) : Author metadata passed when initialized by Poetree instance
+            lang      (str|None)       : ISO code of the corpus, required if initialized directly 
+            base_url  (str)            : API base URL (default: set in config.py)
+            id_       (int|None)       : Id(DB) of the author
+            wiki      (str|None)       : Wiki id of the author
+            viaf      (str|None)       : Viaf id of the author
+            metadata  (dict|None)      : Author metadata passed when initialized by Poetree instance
+            transport (Transport|None) : Transport to send requests with (default: 
+                                         process-wide shared transport)
         
         Raises:
             ValueError : If neither [metadata] nor [lang] is passed
@@ -41,7 +49,10 @@ class Author:
             None    
         '''
         self.base_url = base_url
+        self.transport = transport
         self.content_ = dict()
+        self.indexes_ = dict()
+        self.errors_ = dict()
 
         if metadata is not None:
             self.metadata_ = metadata
@@ -61,7 +72,48 @@ class Author:
                 'One of the arguments [id_,wiki,viaf] is required when initializing ' +
                 f'{__class__.__name__} instance directly'
             )
-        for k, v in self.metadata_.items(): setattr(self, k, v)
+        self._register('author')
+
+
+    @classmethod
+    def from_ids(
+            cls,
+            lang        : str,
+            ids         : list,
+            id_type     : str                       = 'id_',
+            base_url    : str                       = BASE_URL,
+            transport   : Union[BaseTransport,None] = None,
+            max_workers : int                       = 8,
+        ) -> tuple:
+        '''
+        Create Author instances of many authors at once, fetching their
+        metadata concurrently.
+
+        Arguments:
+            lang        (str)            : ISO code of the corpus
+            ids         (list)           : Identifiers of the authors
+            id_type     (str)            : Which identifier [ids] are: 'id_', 'wiki'
+                                           or 'viaf'; default: 'id_'
+            base_url    (str)            : API base URL (default: set in config.py)
+            transport   (Transport|None) : Transport to send requests with (default: 
+                                           process-wide shared transport)
+            max_workers (int)            : Max. number of concurrent requests; default: 8
+
+        Raises:
+            ValueError : If [id_type] is not one of 'id_', 'wiki', 'viaf'
+
+        Returns:
+            (tuple) : List of Author instances in the order of [ids] (None where
+                      an author failed) and dict of exceptions keyed by the
+                      identifiers that failed
+        '''
+        if id_type not in ('id_', 'wiki', 'viaf'):
+            raise ValueError(f'Unknown [id_type]: {id_type} (expected one of id_, wiki, viaf)')
+        return construct_many(
+            lambda value: cls(lang, base_url, transport=transport, **{id_type: value}),
+            list(ids),
+            max_workers,
+        )
 
 
     def _get_author_metadata(
@@ -71,7 +123,8 @@ class Author:
             id_val  : Union[int,str],
         ):
         '''
-        Get metadata on author and store them in self.metadata_
+        Get metadata on author (unless loaded already through the same 
+        transport) and store them in self.metadata_
         
         Arguments:
             lang    (str)     : ISO code of the corpus
@@ -81,12 +134,17 @@ class Author:
         Returns:
             None      
         '''
-        self.metadata_ = make_request(
+        key = 'id_' if id_type == 'id_author' else id_type
+        if self._resolve('author', lang, key, id_val):
+            return
+        response = make_request(
             self.base_url, 
             'author',
+            self.transport,
             **{'corpus': lang, id_type: id_val}
         )
-        self.metadata_['corpus'] = lang
+        # the response may be shared with concurrent callers
+        self.metadata_ = {**response, 'corpus': lang}
         
 
     def get_sources(self, **kwargs) -> list:
@@ -105,21 +163,46 @@ class Author:
             (list) : List holding instances of Source      
         '''
         self.content_['sources'] = get_content(
-            self.base_url, 'sources', Source, 
+            self.base_url, 'sources', Source, self.transport,
             corpus = self.metadata_['corpus'], 
             id_author = self.metadata_['id_'],
             **kwargs
         )
         return self.content_['sources']         
+
+
+    def iter_sources(self, **kwargs) -> Iterator:
+        '''
+        Lazy variant of get_sources(): yield Source instances one by one
+        without storing them in self.content_. Accepts the same keyword
+        arguments as get_sources().
+        
+        Returns:
+            (Iterator) : Source instances      
+        '''
+        return iter_content(
+            self.base_url, 'sources', Source, self.transport,
+            corpus = self.metadata_['corpus'], 
+            id_author = self.metadata_['id_'],
+            **kwargs
+        )
     
 
-    def get_poems(self, **kwargs) -> list:
+    def get_poems(
+            self, 
+            with_bodies : bool = False, 
+            max_workers : int  = 8, 
+            **kwargs
+        ) -> list:
         '''
         Get metadata of poems by the author. Create a new Poem instance 
         for each poem, store it in a list and return it.
         
         Arguments:
-            None
+            with_bodies (bool) : Fetch bodies of the poems as well (concurrently);
+                                 poems that failed are stored in self.errors_ 
+                                 together with the exception; default: False
+            max_workers (int)  : Max. number of concurrent body requests; default: 8
         
         Keyword arguments:
             id_source  (int) : Limit to poems from certain source
@@ -128,12 +211,31 @@ class Author:
             (list) : List holding instances of Poem      
         '''
         self.content_['poems'] = get_content(
-            self.base_url, 'poems', Poem, 
+            self.base_url, 'poems', Poem, self.transport,
             corpus = self.metadata_['corpus'], 
             id_author = self.metadata_['id_'],
             **kwargs
         )
+        if with_bodies:
+            self.errors_ = fetch_bodies(self.content_['poems'], max_workers)
         return self.content_['poems']       
+
+
+    def iter_poems(self, **kwargs) -> Iterator:
+        '''
+        Lazy variant of get_poems(): yield Poem instances one by one
+        without storing them in self.content_. Accepts the same keyword
+        arguments as get_poems() (except [with_bodies], [max_workers]).
+        
+        Returns:
+            (Iterator) : Poem instances      
+        '''
+        return iter_content(
+            self.base_url, 'poems', Poem, self.transport,
+            corpus = self.metadata_['corpus'], 
+            id_author = self.metadata_['id_'],
+            **kwargs
+        )
     
 
     def metadata(
@@ -142,7 +244,7 @@ class Author:
             output  : str             = 'list', 
             sortby  : Union[str,list] = None, 
             reverse : bool            = False
-        ) -> Union[list, pd.DataFrame, None]:
+        ) -> Union[list, 'pd.DataFrame', None]:
         '''
         Returns targt metadata either as a formatted table (tabular=True)
         or as a list as received from API (tabular=False). The list may be
@@ -0,0 +1,147 @@
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# run as a script there is no __package__, the package is named after its directory
+PACKAGE = (__package__ or '').split('.')[0] or os.path.basename(PACKAGE_DIR)
+ROOT = os.path.dirname(PACKAGE_DIR)
+# heavy dependencies loaded only by the features that need them
+LAZY = ('pandas', 'numpy', 'tabulate', 'requests', 'aiohttp', 'asyncio')
+# walk over a local snapshot, which needs none of them
+FILE_WALK = '''
+import time
+started = time.perf_counter()
+import {package}, sys
+corpus = {package}.Corpus({lang!r}, base_url={url!r})
+corpus.get_authors()[0].get_poems()[0].get_body()
+print(int((time.perf_counter() - started) * 1e6))
+print(" ".join(m for m in {lazy!r} if m in sys.modules))
+'''
+
+
+def _run(code:str) -> subprocess.CompletedProcess:
+    '''
+    Run Python code in a fresh interpreter that imports this copy of the
+    package
+    '''
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    return subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, env=env, check=True,
+    )
+
+
+def measure(runs:int=5) -> dict:
+    '''
+    Measure the cost of "import poetree" in fresh interpreters.
+
+    Arguments:
+        runs (int) : Number of interpreters to start; default: 5
+
+    Returns:
+        (dict) : Median cumulative import time of the package, self time of
+                 its slowest modules (microseconds) and lazily imported
+                 dependencies that were loaded anyway
+    '''
+    totals, modules, loaded = list(), dict(), set()
+    for _ in range(runs):
+        process = _run(
+            f'import {PACKAGE}, sys; '
+            f'print(" ".join(m for m in {LAZY!r} if m in sys.modules))'
+        )
+        loaded.update(process.stdout.split())
+        for line in process.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            if name == PACKAGE:
+                totals.append(int(cumulative_us))
+            if name.startswith(PACKAGE + '.'):
+                modules.setdefault(name, list()).append(int(self_us))
+    return {
+        'runs'           : runs,
+        'total_us'       : statistics.median(totals),
+        'modules_us'     : dict(sorted(
+            ((name, statistics.median(t)) for name, t in modules.items()),
+            key=lambda item: -item[1],
+        )),
+        'loaded_eagerly' : sorted(loaded),
+    }
+
+
+def measure_file(runs:int=5) -> dict:
+    '''
+    Measure a walk over a small local snapshot (file:// base URL: a corpus,
+    its authors, poems of the first one and a body) in fresh interpreters.
+
+    Arguments:
+        runs (int) : Number of interpreters to start; default: 5
+
+    Returns:
+        (dict) : Median time from the import of the package to the body
+                 (microseconds) and lazily imported dependencies that were
+                 loaded on the way
+    '''
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    synthetic = importlib.import_module(f'{PACKAGE}.benchmarks.synthetic')
+    totals, loaded = list(), set()
+    with tempfile.TemporaryDirectory() as path:
+        synthetic.generate(path, corpora=1, authors=2, sources=1, poems=2)
+        with open(os.path.join(path, 'corpora.jsonl'), encoding='utf-8') as f:
+            lang = json.loads(f.readline())['corpus']
+        code = FILE_WALK.format(package=PACKAGE, lang=lang, url='file://' + path, lazy=LAZY)
+        for _ in range(runs):
+            elapsed, _, modules = _run(code).stdout.partition('\n')
+            totals.append(int(elapsed))
+            loaded.update(modules.split())
+    return {
+        'runs'        : runs,
+        'total_us'    : statistics.median(totals),
+        'loaded_lazy' : sorted(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check that "import poetree" stays cheap: no heavy dependency is '
+                    'imported eagerly or by a walk over a local snapshot, and the import time '
+                    'stays within a budget'
+    )
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=150.0,
+                        help='Max. median import time in milliseconds (default: 150)')
+    parser.add_argument('--out', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    result['budget_us'] = args.budget_ms * 1000
+    result['file'] = measure_file(args.runs)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    print(f'import {PACKAGE}: {result["total_us"] / 1000:.1f} ms (median of {args.runs})')
+    for name, us in list(result['modules_us'].items())[:5]:
+        print(f'  {name:<24} {us / 1000:6.1f} ms')
+    print(f'file:// walk: {result["file"]["total_us"] / 1000:.1f} ms (median of {args.runs})')
+    failures = list()
+    if len(result['loaded_eagerly']) > 0:
+        failures.append(f'imported eagerly: {", ".join(result["loaded_eagerly"])}')
+    if len(result['file']['loaded_lazy']) > 0:
+        failures.append(f'imported by file:// walk: {", ".join(result["file"]["loaded_lazy"])}')
+    if result['total_us'] > result['budget_us']:
+        failures.append(f'over budget of {args.budget_ms:.0f} ms')
+    for failure in failures:
+        print(f'FAIL: {failure}', file=sys.stderr)
+    sys.exit(1 if len(failures) > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
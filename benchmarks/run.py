@@ -0,0 +1,282 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Union
+from ..main import Poetree
+from ..glob import fetch_bodies
+from ..transport import Transport
+from .synthetic import generate
+from .server import Server
+
+
+def _traverse(poetree:Poetree) -> int:
+    '''
+    Metadata of all corpora, authors, sources and poems via get_*()
+    '''
+    items = 0
+    for corpus in poetree.get_corpora():
+        for author in corpus.get_authors():
+            items += 1 + len(author.get_sources()) + len(author.get_poems())
+    return items
+
+
+def _iterate(poetree:Poetree) -> int:
+    '''
+    The same walk as _traverse() with the lazy iter_*() methods
+    '''
+    items = 0
+    for corpus in poetree.iter_corpora():
+        for author in corpus.iter_authors():
+            items += 1 + sum(1 for _ in author.iter_sources()) + sum(1 for _ in author.iter_poems())
+    return items
+
+
+def _list_poems(poetree:Poetree) -> list:
+    return [
+        poem
+        for corpus in poetree.get_corpora()
+        for author in corpus.get_authors()
+        for poem in author.get_poems()
+    ]
+
+
+def _bodies(poems:list, max_workers:int) -> int:
+    errors = fetch_bodies(poems, max_workers=max_workers)
+    if len(errors) > 0:
+        raise next(iter(errors.values()))
+    return sum(len(poem.content_) for poem in poems)
+
+
+def _metadata_pandas(poetree:Poetree) -> int:
+    '''
+    Per-corpus DataFrames of authors via metadata(output='pandas')
+    '''
+    rows = 0
+    for corpus in poetree.get_corpora():
+        corpus.get_authors()
+        rows += len(corpus.metadata(target='authors', output='pandas'))
+    return rows
+
+
+# name: (setup, run); setup gets a Poetree bound to a fresh transport and
+# the number of workers, its result is passed to run which returns the
+# number of processed items
+BENCHMARKS = {
+    'traverse'        : (lambda pt, w: pt, _traverse),
+    'iterate'         : (lambda pt, w: pt, _iterate),
+    'bodies'          : (lambda pt, w: (_list_poems(pt), w), lambda state: _bodies(*state)),
+    'iter_poems'      : (lambda pt, w: pt, lambda pt: sum(1 for _ in pt.iter_poems(with_bodies=True))),
+    'metadata_frame'  : (lambda pt, w: (pt, w), lambda state: len(state[0].metadata_frame(max_workers=state[1]))),
+    'metadata_pandas' : (lambda pt, w: pt, _metadata_pandas),
+}
+
+
+def measure(
+        name        : str,
+        base_url    : str,
+        server      : Server,
+        repeat      : int = 3,
+        max_workers : int = 8,
+    ) -> dict:
+    '''
+    Run one benchmark [repeat] times for timing and once more under
+    tracemalloc for the peak of allocated memory. Every run starts with a
+    fresh transport, so nothing is shared between runs but the server.
+
+    Arguments:
+        name        (str)    : Benchmark name (key of BENCHMARKS)
+        base_url    (str)    : API base URL
+        server      (Server) : Server answering the requests (for counting them)
+        repeat      (int)    : Number of timed runs; default: 3
+        max_workers (int)    : Concurrency of bulk operations; default: 8
+
+    Returns:
+        (dict) : Result of the benchmark
+    '''
+    setup, run = BENCHMARKS[name]
+
+    def once(trace:bool) -> tuple:
+        with Transport(pool_maxsize=max_workers) as transport:
+            state = setup(Poetree(base_url=base_url, transport=transport), max_workers)
+            requests = server.requests
+            if trace:
+                tracemalloc.start()
+            started = time.perf_counter()
+            items = run(state)
+            elapsed = time.perf_counter() - started
+            peak = None
+            if trace:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            return items, elapsed, server.requests - requests, peak
+
+    timings = list()
+    for _ in range(repeat):
+        items, elapsed, requests, _ = once(False)
+        timings.append(elapsed)
+    _, _, _, peak = once(True)
+    median = statistics.median(timings)
+    return {
+        'name'             : name,
+        'items'            : items,
+        'requests'         : requests,
+        'seconds'          : timings,
+        'seconds_min'      : min(timings),
+        'seconds_median'   : median,
+        'items_per_second' : items / median if median > 0 else None,
+        'peak_bytes'       : peak,
+    }
+
+
+def _environment() -> dict:
+    versions = dict()
+    for package in ('requests', 'pandas', 'numpy', 'orjson', 'aiohttp'):
+        try:
+            versions[package] = __import__(package).__version__
+        except ImportError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python'   : platform.python_version(),
+        'platform' : platform.platform(),
+        'commit'   : commit,
+        'packages' : versions,
+    }
+
+
+def _max_rss() -> Union[int,None]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_benchmarks(
+        data        : Union[str,None]      = None,
+        names       : Union[list,None]     = None,
+        repeat      : int                  = 3,
+        max_workers : int                  = 8,
+        latency     : float                = 0.0,
+        size        : Union[dict,None]     = None,
+        progress    : Union[Callable,None] = None,
+    ) -> dict:
+    '''
+    Serve a synthetic collection locally and run the benchmarks against it.
+
+    Arguments:
+        data        (str|None)      : Directory with a collection to serve; generated
+                                      into a temporary directory if None
+        names       (list|None)     : Benchmarks to run; default: None (all)
+        repeat      (int)           : Number of timed runs of each; default: 3
+        max_workers (int)           : Concurrency of bulk operations; default: 8
+        latency     (float)         : Seconds the server adds to every response;
+                                      default: 0.0
+        size        (dict|None)     : Keyword arguments of synthetic.generate()
+        progress    (Callable|None) : Called with each result as it is finished
+
+    Raises:
+        ValueError : If an unknown benchmark is requested
+
+    Returns:
+        (dict) : Environment, collection size and results (JSON-serializable)
+    '''
+    names = list(BENCHMARKS) if names is None else names
+    unknown = set(names) - set(BENCHMARKS)
+    if len(unknown) > 0:
+        raise ValueError(f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+    with tempfile.TemporaryDirectory() as tmp:
+        collection = None
+        if data is None:
+            data = tmp
+            collection = generate(tmp, **(size or dict()))
+        server = Server(data, latency=latency)
+        base_url = server.start()
+        try:
+            results = list()
+            for name in names:
+                results.append(measure(name, base_url, server, repeat, max_workers))
+                if progress is not None:
+                    progress(results[-1])
+        finally:
+            server.shutdown()
+            server.server_close()
+    return {
+        'timestamp'     : datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment'   : _environment(),
+        'config'        : {
+            'repeat': repeat, 'max_workers': max_workers, 'latency': latency, 'size': size,
+        },
+        'collection'    : collection,
+        'benchmarks'    : results,
+        'max_rss_bytes' : _max_rss(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark poetree against a local synthetic stand-in of PoeTree API'
+    )
+    parser.add_argument('--only', help='Comma-separated benchmarks to run: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--data', help='Serve this snapshot directory instead of generating one')
+    parser.add_argument('--corpora', type=int, default=2)
+    parser.add_argument('--authors', type=int, default=20, help='Authors per corpus')
+    parser.add_argument('--sources', type=int, default=2, help='Sources per author')
+    parser.add_argument('--poems', type=int, default=10, help='Poems per author')
+    parser.add_argument('--lines', type=int, default=16, help='Lines per poem')
+    parser.add_argument('--words', type=int, default=6, help='Words per line')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--out', help='Write results to this JSON file (default: stdout)')
+    args = parser.parse_args()
+
+    def progress(result):
+        print(
+            f'{result["name"]:<16} {result["seconds_median"]:8.3f} s  '
+            f'{result["requests"]:6d} requests  {(result["peak_bytes"] or 0) / 2**20:8.1f} MiB peak',
+            file=sys.stderr,
+        )
+
+    results = run_benchmarks(
+        data        = args.data,
+        names       = args.only.split(',') if args.only else None,
+        repeat      = args.repeat,
+        max_workers = args.workers,
+        latency     = args.latency,
+        size        = None if args.data else {
+            'corpora' : args.corpora,
+            'authors' : args.authors,
+            'sources' : args.sources,
+            'poems'   : args.poems,
+            'lines'   : args.lines,
+            'words'   : args.words,
+            'seed'    : args.seed,
+        },
+        progress    = progress,
+    )
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
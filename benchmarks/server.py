@@ -0,0 +1,120 @@
+import argparse
+import gzip
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qsl
+from ..snapshot import Snapshot
+
+
+class Server(ThreadingHTTPServer):
+    '''
+    Local stand-in for PoeTree API serving a snapshot directory (mirrored
+    or generated by benchmarks.synthetic) over HTTP from the same endpoints,
+    e.g. http://127.0.0.1:8000/api/authors?corpus=cs. Optionally adds
+    latency to every response and gzips bodies like the real server.
+    '''
+
+    daemon_threads = True
+
+    def __init__(
+            self,
+            path     : str,
+            host     : str   = '127.0.0.1',
+            port     : int   = 0,
+            latency  : float = 0.0,
+            compress : bool  = True,
+        ):
+        '''
+        Arguments:
+            path     (str)   : Snapshot directory
+            host     (str)   : Interface to listen on; default: '127.0.0.1'
+            port     (int)   : Port to listen on; default: 0 (any free port)
+            latency  (float) : Seconds added to every response; default: 0.0
+            compress (bool)  : Gzip responses if the client accepts it; default: True
+        '''
+        super().__init__((host, port), Handler)
+        self.snapshot = Snapshot(path)
+        self.latency = latency
+        self.compress = compress
+        self.requests = 0
+        self._lock = threading.Lock()
+
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/api'
+
+
+    def start(self) -> str:
+        '''
+        Serve in a background thread.
+
+        Returns:
+            (str) : Base URL of the API
+        '''
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.base_url
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        params = dict(parse_qsl(url.query))
+        with self.server._lock:
+            self.server.requests += 1
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        if endpoint not in Snapshot.ENDPOINTS:
+            return self._send(404, {'error': f'Unknown method {endpoint}'})
+        try:
+            response = self.server.snapshot.request(endpoint, **params)
+        except (ValueError, TypeError) as e:
+            return self._send(400, {'error': str(e)})
+        except Exception as e:
+            return self._send(404, {'error': str(e)})
+        self._send(200, response)
+
+
+    def _send(self, status:int, response):
+        body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve a PoeTree snapshot (or a synthetic collection) over HTTP'
+    )
+    parser.add_argument('path', help='Snapshot directory')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    args = parser.parse_args()
+    server = Server(args.path, args.host, args.port, args.latency)
+    print(f'Serving {args.path} at {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import os
+import random
+import zlib
+from typing import Iterator
+from ..mirror import write_jsonl
+
+LANGS = ('cs', 'de', 'en', 'es', 'fr', 'it', 'pt', 'ru', 'sk', 'sl', 'hu', 'nl', 'pl', 'la', 'fi')
+COUNTRIES = ('cz', 'sk', 'at', 'de', 'gb', 'us', 'es', 'fr', 'it', 'pt', 'br', 'ru')
+SYLLABLES = (
+    'ka', 'lo', 'ne', 'mi', 'ra', 'to', 've', 'sa', 'du', 'pre', 'st', 'ho',
+    'ja', 'ze', 'li', 'mor', 'ten', 'bal', 'vi', 'na', 'pa', 'ro', 'der', 'ci',
+)
+# part-of-speech tag: relative frequency, relations it attaches by, features
+UPOS = {
+    'NOUN'  : (25, ('nsubj', 'obj', 'obl', 'nmod'), ('Case', 'Gender', 'Number')),
+    'VERB'  : (14, ('conj', 'advcl', 'xcomp'), ('Mood', 'Number', 'Person', 'Tense')),
+    'ADJ'   : (10, ('amod',), ('Case', 'Degree', 'Gender', 'Number')),
+    'ADP'   : (9, ('case',), ('Case',)),
+    'PRON'  : (8, ('nsubj', 'obj'), ('Case', 'Number', 'Person')),
+    'ADV'   : (7, ('advmod',), ()),
+    'DET'   : (6, ('det',), ('Gender', 'Number')),
+    'CCONJ' : (5, ('cc',), ()),
+    'PROPN' : (2, ('nsubj', 'flat'), ('Case', 'Number')),
+}
+FEATS = {
+    'Case'   : ('Nom', 'Gen', 'Dat', 'Acc', 'Loc', 'Ins'),
+    'Degree' : ('Pos', 'Cmp'),
+    'Gender' : ('Masc', 'Fem', 'Neut'),
+    'Mood'   : ('Ind', 'Imp'),
+    'Number' : ('Sing', 'Plur'),
+    'Person' : ('1', '2', '3'),
+    'Tense'  : ('Pres', 'Past'),
+}
+
+
+class Generator:
+    '''
+    Deterministic generator of a synthetic PoeTree corpus: authors with
+    life dates and identifiers, sources, poems and UD-annotated bodies with
+    Zipf-distributed vocabulary and well-formed dependency trees.
+    '''
+
+    def __init__(self, seed:int=0, vocabulary:int=5000):
+        '''
+        Arguments:
+            seed       (int) : Random seed; default: 0
+            vocabulary (int) : Number of distinct lemmas; default: 5000
+        '''
+        self.rng = random.Random(seed)
+        self.lemmas = list()
+        for i in range(vocabulary):
+            n = self.rng.choice((1, 2, 2, 3, 3, 4))
+            lemma = ''.join(self.rng.choice(SYLLABLES) for _ in range(n))
+            self.lemmas.append((lemma, self._pick_upos()))
+        self.weights = list()
+        total = 0.0
+        for rank in range(vocabulary):
+            total += 1 / (rank + 1)
+            self.weights.append(total)
+        self.next_line = 1
+        self.next_word = 1
+
+
+    def _pick_upos(self) -> str:
+        return self.rng.choices(list(UPOS), weights=[v[0] for v in UPOS.values()])[0]
+
+
+    def _feats(self, upos:str) -> str:
+        names = UPOS[upos][2] if upos in UPOS else ()
+        if len(names) == 0:
+            return '_'
+        return '|'.join(f'{name}={self.rng.choice(FEATS[name])}' for name in names)
+
+
+    def _form(self, lemma:str, feats:str) -> str:
+        # inflect by feature values so that forms outnumber lemmas
+        if feats == '_':
+            return lemma
+        return lemma + 'aeiouy'[zlib.crc32(feats.encode()) % 6] * (1 + len(feats) % 2)
+
+
+    def line(self, number:int, stanza:int, id_sentence:int, length:int) -> dict:
+        '''
+        One line (= one sentence) of [length] words ending with punctuation
+        '''
+        picks = self.rng.choices(self.lemmas, cum_weights=self.weights, k=length)
+        picks.append((self.rng.choice(',.;!?'), 'PUNCT'))
+        words = list()
+        for i, (lemma, upos) in enumerate(picks):
+            feats = self._feats(upos)
+            words.append({
+                'id_'         : self.next_word,
+                'id'          : i + 1,
+                'id_sentence' : id_sentence,
+                'head'        : None,
+                'deprel'      : None,
+                'form'        : self._form(lemma, feats),
+                'lemma'       : lemma,
+                'upos'        : upos,
+                'xpos'        : ('Z:' if upos == 'PUNCT' else upos[:2]) + '-' * 13,
+                'feats'       : feats,
+            })
+            self.next_word += 1
+        # attach every word to one placed before it in a random order, so
+        # that the result is a tree rooted in a verb (if there is one)
+        verbs = [w for w in words[:-1] if w['upos'] == 'VERB']
+        root = verbs[0] if len(verbs) > 0 else words[0]
+        root['head'], root['deprel'] = 0, 'root'
+        placed = [root]
+        rest = [w for w in words[:-1] if w is not root]
+        self.rng.shuffle(rest)
+        for w in rest:
+            w['head'] = self.rng.choice(placed)['id']
+            w['deprel'] = self.rng.choice(UPOS[w['upos']][1])
+            placed.append(w)
+        words[-1]['head'], words[-1]['deprel'] = root['id'], 'punct'
+        line = {
+            'id_'       : self.next_line,
+            'id'        : number,
+            'id_stanza' : stanza,
+            'text'      : ' '.join(w['form'] for w in words[:-1]) + words[-1]['form'],
+            'part'      : False,
+            'words'     : words,
+        }
+        self.next_line += 1
+        return line
+
+
+    def body(self, lines:int, words:int) -> list:
+        '''
+        Body of a poem: [lines] lines in quatrains, [words] words per line
+        on average
+        '''
+        return [
+            self.line(i, 1 + i // 4, i + 1, max(1, int(self.rng.gauss(words, words / 4))))
+            for i in range(lines)
+        ]
+
+
+def generate(
+        out_dir : str,
+        corpora : int = 2,
+        authors : int = 20,
+        sources : int = 2,
+        poems   : int = 10,
+        lines   : int = 16,
+        words   : int = 6,
+        seed    : int = 0,
+    ) -> dict:
+    '''
+    Write a synthetic collection in the snapshot layout (see mirror.mirror)
+    so that it can be served by benchmarks.server or opened as a file://
+    base URL.
+
+    Arguments:
+        out_dir (str) : Target directory
+        corpora (int) : Number of corpora; default: 2
+        authors (int) : Authors per corpus; default: 20
+        sources (int) : Sources per author; default: 2
+        poems   (int) : Poems per author; default: 10
+        lines   (int) : Lines per poem on average; default: 16
+        words   (int) : Words per line on average; default: 6
+        seed    (int) : Random seed; default: 0
+
+    Raises:
+        ValueError : If more corpora are requested than language codes exist
+
+    Returns:
+        (dict) : Sizes of the generated collection
+    '''
+    if corpora > len(LANGS):
+        raise ValueError(f'At most {len(LANGS)} corpora can be generated')
+    generator = Generator(seed)
+    rng = generator.rng
+    os.makedirs(out_dir, exist_ok=True)
+    records = list()
+    totals = {'corpora': corpora, 'authors': 0, 'sources': 0, 'poems': 0, 'lines': 0}
+    for lang in LANGS[:corpora]:
+        os.makedirs(os.path.join(out_dir, lang), exist_ok=True)
+        author_records, source_records, poem_records = list(), list(), list()
+        n_lines = 0
+        for a in range(1, authors + 1):
+            born = rng.randint(1500, 1900)
+            author_records.append({
+                'id_'     : a,
+                'name'    : f'{generator.lemmas[a][0].title()}, {generator.lemmas[-a][0].title()}',
+                'viaf'    : str(rng.randint(10**6, 10**9)),
+                'wiki'    : f'Q{rng.randint(10**3, 10**8)}',
+                'country' : rng.choice(COUNTRIES),
+                'born'    : born,
+                'died'    : born + rng.randint(20, 90),
+                'n_poems' : poems,
+                'corpus'  : lang,
+            })
+            for s in range(sources):
+                source_records.append({
+                    'id_'       : (a - 1) * sources + s + 1,
+                    'title'     : ' '.join(rng.choice(generator.lemmas)[0] for _ in range(3)).capitalize(),
+                    'published' : born + rng.randint(18, 20),
+                    'id_author' : a,
+                    'corpus'    : lang,
+                })
+            for p in range(poems):
+                poem_records.append({
+                    'id_'       : (a - 1) * poems + p + 1,
+                    'title'     : ' '.join(rng.choice(generator.lemmas)[0] for _ in range(2)).capitalize(),
+                    'id_author' : a,
+                    'id_source' : (a - 1) * sources + rng.randrange(sources) + 1 if sources > 0 else None,
+                    'corpus'    : lang,
+                })
+
+        def bodies() -> Iterator[dict]:
+            nonlocal n_lines
+            for poem in poem_records:
+                body = generator.body(max(1, int(rng.gauss(lines, lines / 4))), words)
+                n_lines += len(body)
+                yield {**poem, 'body': body}
+
+        write_jsonl(os.path.join(out_dir, lang, 'bodies.jsonl'), bodies())
+        write_jsonl(os.path.join(out_dir, lang, 'authors.jsonl'), author_records)
+        write_jsonl(os.path.join(out_dir, lang, 'sources.jsonl'), source_records)
+        write_jsonl(os.path.join(out_dir, lang, 'poems.jsonl'), poem_records)
+        records.append({
+            'corpus'    : lang,
+            'desc'      : f'Synthetic corpus generated with seed {seed}',
+            'n_authors' : authors,
+            'n_poems'   : len(poem_records),
+            'n_lines'   : n_lines,
+        })
+        totals['authors'] += authors
+        totals['sources'] += len(source_records)
+        totals['poems'] += len(poem_records)
+        totals['lines'] += n_lines
+    write_jsonl(os.path.join(out_dir, 'corpora.jsonl'), records)
+    return totals
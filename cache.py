@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Union
+
+
+class CacheMiss(Exception):
+    '''
+    Raised in offline mode when a response is not in the cache
+    '''
+
+
+class Cache:
+    '''
+    Persistent on-disk cache of API responses stored in a SQLite database.
+    Responses are zlib-compressed and keyed by base URL, endpoint and
+    normalized URL parameters. Several threads and processes may share one
+    database file (WAL journal). Entries expire after [ttl] seconds (but are
+    still served in offline mode, expired entries are deleted only when new
+    ones are stored) and the least recently used ones are evicted once the
+    total size of stored responses exceeds [max_size] bytes.
+    '''
+
+    def __init__(
+            self,
+            path     : str,
+            ttl      : Union[float,None] = None,
+            max_size : Union[int,None]   = None,
+            offline  : bool              = False,
+            level    : int               = 6,
+        ):
+        '''
+        Open (and create if needed) the cache database.
+
+        Arguments:
+            path     (str)        : Path of the SQLite database file
+            ttl      (float|None) : Time to live of an entry in seconds; default: None
+                                    (entries never expire)
+            max_size (int|None)   : Max. total size of compressed responses in bytes;
+                                    default: None (unlimited)
+            offline  (bool)       : Serve responses only from the cache (expired ones
+                                    included), raise CacheMiss instead of sending a
+                                    request; default: False
+            level    (int)        : zlib compression level; default: 6
+
+        Returns:
+            None
+        '''
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self.level = level
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as db:
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, data BLOB, size INTEGER, '
+                'created REAL, accessed REAL)'
+            )
+            db.execute(
+                'CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)'
+            )
+            db.execute(
+                'CREATE INDEX IF NOT EXISTS responses_created ON responses (created)'
+            )
+            db.execute('CREATE TABLE IF NOT EXISTS meta (total INTEGER)')
+            if db.execute('SELECT COUNT(*) FROM meta').fetchone()[0] == 0:
+                db.execute('INSERT INTO meta VALUES (0)')
+
+
+    def _connection(self) -> sqlite3.Connection:
+        '''
+        Return connection of the current thread (SQLite connections cannot
+        be shared across threads).
+        '''
+        if getattr(self._local, 'db', None) is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = _Transaction(db)
+        return self._local.db
+
+
+    @staticmethod
+    def key(base_url:str, endpoint:str, params:dict) -> str:
+        '''
+        Build cache key from base URL, endpoint and URL parameters. Parameters
+        are sorted and stringified so that e.g. id_poem=1 and id_poem='1'
+        share the same entry.
+
+        Arguments:
+            base_url (str)  : API base URL
+            endpoint (str)  : API method name
+            params   (dict) : URL parameters
+
+        Returns:
+            (str) : Cache key
+        '''
+        normalized = json.dumps([
+            base_url.rstrip('/'),
+            endpoint,
+            sorted((str(k), str(v)) for k, v in params.items()),
+        ])
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+    def get(self, key:str) -> Union[bytes,None]:
+        '''
+        Return cached response or None if it is missing or expired (expired
+        responses are returned in offline mode, as they cannot be fetched
+        again). Reading never deletes an entry and takes no write lock
+        unless recency of use is tracked for eviction (max_size).
+
+        Arguments:
+            key (str) : Cache key
+
+        Returns:
+            (bytes|None) : Response body
+        '''
+        now = time.time()
+        db = self._connection().db
+        row = db.execute(
+            'SELECT data, created FROM responses WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        data, created = row
+        if self.ttl is not None and created + self.ttl < now and not self.offline:
+            return None
+        if self.max_size is not None:
+            db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+        return zlib.decompress(data)
+
+
+    def set(self, key:str, data:bytes):
+        '''
+        Store response, deleting expired entries and evicting least recently
+        used ones if the cache grows over max_size.
+
+        Arguments:
+            key  (str)   : Cache key
+            data (bytes) : Response body
+
+        Returns:
+            None
+        '''
+        now = time.time()
+        compressed = zlib.compress(data, self.level)
+        with self._connection() as db:
+            row = db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                db.execute('UPDATE meta SET total = total - ?', (row[0],))
+            db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                (key, compressed, len(compressed), now, now)
+            )
+            db.execute('UPDATE meta SET total = total + ?', (len(compressed),))
+            if self.ttl is not None and not self.offline:
+                self._expire(db, now)
+            if self.max_size is not None:
+                self._evict(db)
+
+
+    def _expire(self, db:sqlite3.Connection, now:float):
+        '''
+        Delete entries older than ttl.
+        '''
+        created = now - self.ttl
+        size = db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses WHERE created < ?', (created,)
+        ).fetchone()[0]
+        if size > 0:
+            db.execute('DELETE FROM responses WHERE created < ?', (created,))
+            db.execute('UPDATE meta SET total = total - ?', (size,))
+
+
+    def _evict(self, db:sqlite3.Connection):
+        '''
+        Delete least recently used entries until the total size is within
+        max_size.
+        '''
+        total = db.execute('SELECT total FROM meta').fetchone()[0]
+        if total <= self.max_size:
+            return
+        while total > self.max_size:
+            rows = db.execute(
+                'SELECT key, size FROM responses ORDER BY accessed LIMIT 64'
+            ).fetchall()
+            if len(rows) == 0:
+                break
+            for key, size in rows:
+                db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                total -= size
+                if total <= self.max_size:
+                    break
+        db.execute('UPDATE meta SET total = ?', (max(total, 0),))
+
+
+    def clear(self):
+        '''
+        Delete all entries.
+        '''
+        with self._connection() as db:
+            db.execute('DELETE FROM responses')
+            db.execute('UPDATE meta SET total = 0')
+
+
+class _Transaction:
+    '''
+    Wrap SQLite connection so that "with" runs the block in an immediate
+    transaction (taking the write lock up front avoids deadlocks between
+    processes upgrading read locks).
+    '''
+
+    def __init__(self, db:sqlite3.Connection):
+        self.db = db
+
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+
+    def __exit__(self, exc_type, *args):
+        self.db.execute('ROLLBACK' if exc_type is not None else 'COMMIT')
@@ -0,0 +1,212 @@
+import argparse
+import sys
+import threading
+import time
+from typing import Union
+from .config import BASE_URL
+from .transport import Transport
+from .mirror import mirror
+from .sync import sync
+
+
+class Progress:
+    '''
+    Progress and throughput of a download: poems stored per corpus, number
+    of requests and downloaded bytes (counted by hooks of the transport).
+    Reports to stderr at most every [interval] seconds, on one rewritten
+    line if stderr is a terminal.
+    '''
+
+    def __init__(self, transport:Transport, interval:float=1.0, quiet:bool=False):
+        self.interval = interval
+        self.quiet = quiet
+        self.tty = sys.stderr.isatty()
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.bytes = 0
+        self.poems = 0
+        self.lang = None
+        self.done = 0
+        self.total = 0
+        self._reported = 0.0
+        self._lock = threading.Lock()
+        transport.hooks.on('after_response', self._response)
+
+
+    def _response(self, size:Union[int,None], **event):
+        with self._lock:
+            self.requests += 1
+            self.bytes += size or 0
+
+
+    def __call__(self, lang:str, done:int, total:int):
+        '''
+        Progress callback of mirror() and sync(), called after each poem
+        '''
+        with self._lock:
+            if lang != self.lang or done < self.done:
+                # a new corpus, or a new pass over the same one (sync)
+                self.lang, self.done = lang, done - 1
+            self.poems += done - self.done
+            self.done, self.total = done, total
+        now = time.perf_counter()
+        if now - self._reported >= self.interval or done == total:
+            self._reported = now
+            self.report(final=False)
+
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            'elapsed'    : elapsed,
+            'requests'   : self.requests,
+            'bytes'      : self.bytes,
+            'poems'      : self.poems,
+            'poems_rate' : self.poems / elapsed if elapsed > 0 else 0.0,
+            'bytes_rate' : self.bytes / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+    def report(self, final:bool):
+        if self.quiet and not final:
+            return
+        s = self.stats()
+        line = (
+            f'{s["poems"]} poems, {s["requests"]} requests, {s["bytes"] / 2**20:.1f} MiB '
+            f'in {s["elapsed"]:.0f} s ({s["poems_rate"]:.1f} poems/s, '
+            f'{s["bytes_rate"] / 2**20:.2f} MiB/s)'
+        )
+        if not final and self.lang is not None:
+            line = f'{self.lang}: {self.done}/{self.total} | {line}'
+        if self.tty and not final:
+            print(f'\r\033[K{line}', end='', file=sys.stderr, flush=True)
+        else:
+            print(('\r\033[K' if self.tty else '') + line, file=sys.stderr, flush=True)
+
+
+def dump(args:argparse.Namespace) -> int:
+    '''
+    Download selected corpora into [args.out] (see mirror.mirror)
+
+    Returns:
+        (int) : Exit status
+    '''
+    transport = Transport(pool_maxsize=args.workers)
+    progress = Progress(transport, quiet=args.quiet)
+    try:
+        errors = mirror(
+            args.out,
+            corpora     = args.corpus.split(',') if args.corpus else None,
+            base_url    = args.base_url,
+            transport   = transport,
+            max_workers = args.workers,
+            progress    = progress,
+            authors     = {
+                'country'     : args.authors_country,
+                'born_after'  : args.authors_born_after,
+                'born_before' : args.authors_born_before,
+                'died_after'  : args.authors_died_after,
+                'died_before' : args.authors_died_before,
+            },
+            bodies      = args.bodies,
+        )
+    except KeyboardInterrupt:
+        progress.report(final=True)
+        print('Interrupted, run the same command again to resume', file=sys.stderr)
+        return 130
+    finally:
+        transport.close()
+    progress.report(final=True)
+    failed = sum(len(e) for e in errors.values())
+    for lang, e in errors.items():
+        if len(e) > 0:
+            print(f'{lang}: {len(e)} poems failed (see {lang}/errors.jsonl)', file=sys.stderr)
+    if failed > 0:
+        print('Run the same command again to retry failed poems', file=sys.stderr)
+        return 1
+    return 0
+
+
+def update(args:argparse.Namespace) -> int:
+    '''
+    Refresh a snapshot in [args.out] with the changes upstream (see sync.sync)
+
+    Returns:
+        (int) : Exit status
+    '''
+    transport = Transport(pool_maxsize=args.workers)
+    progress = Progress(transport, quiet=args.quiet)
+    try:
+        reports = sync(
+            args.out,
+            corpora     = args.corpus.split(',') if args.corpus else None,
+            base_url    = args.base_url,
+            transport   = transport,
+            max_workers = args.workers,
+            progress    = progress,
+            bodies      = not args.no_bodies,
+        )
+    except KeyboardInterrupt:
+        progress.report(final=True)
+        print('Interrupted, run the same command again to resume', file=sys.stderr)
+        return 130
+    finally:
+        transport.close()
+    progress.report(final=True)
+    failed = 0
+    for lang, report in reports.items():
+        if report['authors'] is None:
+            print(f'{lang}: up to date', file=sys.stderr)
+            continue
+        changes = ', '.join(
+            f'{target} +{report[target]["added"]} ~{report[target]["changed"]} -{report[target]["removed"]}'
+            for target in ('authors', 'sources', 'poems')
+        )
+        print(f'{lang}: {changes}, {report["bodies"]} bodies fetched', file=sys.stderr)
+        if len(report['errors']) > 0:
+            failed += len(report['errors'])
+            print(f'{lang}: {len(report["errors"])} poems failed', file=sys.stderr)
+    if failed > 0:
+        print('Run the same command again to retry failed poems', file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv:Union[list,None]=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m poetree', description='PoeTree client')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser(
+        'dump', help='download corpora into a local snapshot (resumable)',
+        description='Download metadata (and bodies) of PoeTree corpora into a local '
+                    'snapshot directory. Running the same command again resumes an '
+                    'interrupted download and retries failed poems.',
+    )
+    p.add_argument('--out', required=True, help='snapshot directory')
+    p.add_argument('--corpus', help='comma-separated ISO codes (default: all corpora)')
+    p.add_argument('--authors-country', help='comma-separated country codes of authors')
+    p.add_argument('--authors-born-after', type=int, metavar='YEAR')
+    p.add_argument('--authors-born-before', type=int, metavar='YEAR')
+    p.add_argument('--authors-died-after', type=int, metavar='YEAR')
+    p.add_argument('--authors-died-before', type=int, metavar='YEAR')
+    p.add_argument('--bodies', action='store_true', help='download bodies of the poems')
+    p.add_argument('--workers', type=int, default=8, help='max. concurrent requests (default: 8)')
+    p.add_argument('--base-url', default=BASE_URL, help='API base URL')
+    p.add_argument('--quiet', action='store_true', help='report the summary only')
+    p.set_defaults(run=dump)
+
+    p = commands.add_parser(
+        'sync', help='refresh a snapshot with the changes upstream',
+        description='Download only new and changed authors, sources and poems into a '
+                    'snapshot written by dump, recording their hashes in manifest.json.',
+    )
+    p.add_argument('--out', required=True, help='snapshot directory')
+    p.add_argument('--corpus', help='comma-separated ISO codes (default: corpora in the snapshot)')
+    p.add_argument('--no-bodies', action='store_true', help='update metadata only')
+    p.add_argument('--workers', type=int, default=8, help='max. concurrent requests (default: 8)')
+    p.add_argument('--base-url', default=BASE_URL, help='API base URL')
+    p.add_argument('--quiet', action='store_true', help='report the summary only')
+    p.set_defaults(run=update)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
@@ -0,0 +1,276 @@
+from typing import Union
+import numpy as np
+
+STRING_FIELDS = ('form', 'lemma', 'upos', 'xpos', 'feats', 'deprel')
+INT_FIELDS = ('id_', 'id', 'head', 'id_sentence')
+
+
+class Tokens:
+    '''
+    Columnar representation of a poem body. Every token attribute is stored
+    as a NumPy array of the same length: integer fields (id_, id, head,
+    id_sentence) as int32 (-1 where missing), string fields (form, lemma,
+    upos, xpos, feats, deprel) dictionary-encoded as int32 codes into
+    self.vocab[field]. Lines are delimited by self.line_offsets (token
+    positions, one more than the number of lines), stanzas and sentences
+    by self.stanza_offsets (line positions) and self.sentence_offsets
+    (token positions).
+    '''
+
+    def __init__(
+            self,
+            columns          : dict,
+            vocab            : dict,
+            line_offsets     : np.ndarray,
+            line_id          : np.ndarray,
+            line_stanza      : np.ndarray,
+            line_text        : list,
+            stanza_offsets   : Union[np.ndarray,None] = None,
+            sentence_offsets : Union[np.ndarray,None] = None,
+        ):
+        '''
+        Arguments:
+            columns          (dict)            : Arrays keyed by field name
+            vocab            (dict)            : Lists of strings keyed by string field name
+            line_offsets     (np.ndarray)      : Position of the first token of each line
+                                                 (plus total number of tokens)
+            line_id          (np.ndarray)      : Id of each line
+            line_stanza      (np.ndarray)      : Id of stanza of each line
+            line_text        (list)            : Text of each line
+            stanza_offsets   (np.ndarray|None) : Stanza boundaries (see self.stanza_offsets);
+                                                 derived from line_stanza if None
+            sentence_offsets (np.ndarray|None) : Sentence boundaries (see self.sentence_offsets);
+                                                 derived from id_sentence if None
+        '''
+        self.columns = columns
+        self.vocab = vocab
+        self.line_offsets = line_offsets
+        self.line_id = line_id
+        self.line_stanza = line_stanza
+        self.line_text = line_text
+        self._stanza_offsets = stanza_offsets
+        self._sentence_offsets = sentence_offsets
+        self._index = dict()
+
+
+    @classmethod
+    def from_body(
+            cls,
+            body  : list,
+            vocab : Union[dict,None] = None,
+            codes : Union[dict,None] = None,
+        ) -> 'Tokens':
+        '''
+        Build columnar representation from body as returned by Poem.get_body()
+
+        Arguments:
+            body  (list)      : List of line dicts holding lists of word dicts
+            vocab (dict|None) : Lists of strings keyed by field name to encode
+                                into; extended in place with unseen values, so
+                                that several poems may share one vocabulary;
+                                default: None (new vocabulary)
+            codes (dict|None) : Dicts of codes of the values of [vocab] keyed by
+                                field name, extended in place together with it
+                                (saves rebuilding them for every poem encoded
+                                into one vocabulary); default: None
+
+        Returns:
+            (Tokens) : Columnar representation
+        '''
+        if vocab is None:
+            vocab = {f: list() for f in STRING_FIELDS}
+        if codes is None:
+            codes = {f: {v: i for i, v in enumerate(vocab[f])} for f in STRING_FIELDS}
+        ints = {f: list() for f in INT_FIELDS}
+        strings = {f: list() for f in STRING_FIELDS}
+        line_offsets = [0]
+        for line in body:
+            for word in line['words']:
+                for f in INT_FIELDS:
+                    v = word.get(f)
+                    ints[f].append(-1 if v is None else v)
+                for f in STRING_FIELDS:
+                    v = word.get(f) or ''
+                    code = codes[f].get(v)
+                    if code is None:
+                        code = codes[f][v] = len(vocab[f])
+                        vocab[f].append(v)
+                    strings[f].append(code)
+            line_offsets.append(len(ints['id_']))
+        columns = {f: np.array(ints[f], dtype=np.int32) for f in INT_FIELDS}
+        columns.update({f: np.array(strings[f], dtype=np.int32) for f in STRING_FIELDS})
+        return cls(
+            columns,
+            vocab,
+            np.array(line_offsets, dtype=np.int64),
+            np.array([l.get('id', -1) for l in body], dtype=np.int32),
+            np.array([l.get('id_stanza', -1) for l in body], dtype=np.int32),
+            [l.get('text') for l in body],
+        )
+
+
+    @classmethod
+    def concat(cls, parts:list) -> 'Tokens':
+        '''
+        Concatenate columnar bodies of several poems into one, re-encoding
+        string fields into a shared vocabulary. Tokens of the parts follow
+        one another in the order of [parts]; stanzas and sentences never
+        span two parts.
+
+        Arguments:
+            parts (list) : Tokens instances
+
+        Returns:
+            (Tokens) : Columnar representation of all the parts
+        '''
+        vocab = {f: list() for f in STRING_FIELDS}
+        codes = {f: dict() for f in STRING_FIELDS}
+        columns = {f: list() for f in INT_FIELDS + STRING_FIELDS}
+        for part in parts:
+            for f in INT_FIELDS:
+                columns[f].append(part.columns[f])
+            for f in STRING_FIELDS:
+                remap = np.empty(len(part.vocab[f]), dtype=np.int32)
+                for i, v in enumerate(part.vocab[f]):
+                    code = codes[f].get(v)
+                    if code is None:
+                        code = codes[f][v] = len(vocab[f])
+                        vocab[f].append(v)
+                    remap[i] = code
+                columns[f].append(remap[part.columns[f]])
+        line_offsets = [np.zeros(1, dtype=np.int64)]
+        stanza_offsets = [np.zeros(1, dtype=np.int64)]
+        sentence_offsets = [np.zeros(1, dtype=np.int64)]
+        start, start_line = 0, 0
+        for part in parts:
+            line_offsets.append(part.line_offsets[1:] + start)
+            stanza_offsets.append(part.stanza_offsets[1:] + start_line)
+            sentence_offsets.append(part.sentence_offsets[1:] + start)
+            start += len(part)
+            start_line += part.n_lines
+        return cls(
+            {f: np.concatenate(c) if len(c) > 0 else np.empty(0, np.int32) for f, c in columns.items()},
+            vocab,
+            np.concatenate(line_offsets),
+            np.concatenate([p.line_id for p in parts] or [np.empty(0, np.int32)]),
+            np.concatenate([p.line_stanza for p in parts] or [np.empty(0, np.int32)]),
+            [text for p in parts for text in p.line_text],
+            np.unique(np.concatenate(stanza_offsets)),
+            np.unique(np.concatenate(sentence_offsets)),
+        )
+
+
+    def __len__(self) -> int:
+        return int(self.line_offsets[-1])
+
+
+    def __getitem__(self, field:str) -> np.ndarray:
+        return self.columns[field]
+
+
+    @property
+    def n_lines(self) -> int:
+        return len(self.line_offsets) - 1
+
+
+    @property
+    def token_line(self) -> np.ndarray:
+        '''
+        Index of the line of each token
+        '''
+        return np.repeat(
+            np.arange(self.n_lines, dtype=np.int32), np.diff(self.line_offsets)
+        )
+
+
+    @property
+    def stanza_offsets(self) -> np.ndarray:
+        '''
+        Position of the first line of each stanza (plus number of lines)
+        '''
+        if self._stanza_offsets is not None:
+            return self._stanza_offsets
+        change = np.flatnonzero(np.diff(self.line_stanza)) + 1
+        return np.concatenate(([0], change, [self.n_lines])).astype(np.int64)
+
+
+    @property
+    def sentence_offsets(self) -> np.ndarray:
+        '''
+        Position of the first token of each sentence (plus number of tokens)
+        '''
+        if self._sentence_offsets is not None:
+            return self._sentence_offsets
+        change = np.flatnonzero(np.diff(self.columns['id_sentence'])) + 1
+        return np.concatenate(([0], change, [len(self)])).astype(np.int64)
+
+
+    def code(self, field:str, value:str) -> int:
+        '''
+        Code of a string value in [field] (-1 if it does not occur)
+
+        Arguments:
+            field (str) : String field name
+            value (str) : Value to look up
+
+        Returns:
+            (int) : Code
+        '''
+        lookup = getattr(self.vocab[field], 'code', None)
+        if lookup is not None:
+            # vocabularies of a TokenStore keep their own lookup table
+            return lookup(value)
+        if field not in self._index or len(self._index[field]) != len(self.vocab[field]):
+            self._index[field] = {v: i for i, v in enumerate(self.vocab[field])}
+        return self._index[field].get(value, -1)
+
+
+    def mask(self, **conditions) -> np.ndarray:
+        '''
+        Boolean mask of tokens matching all conditions, e.g.
+        mask(upos='NOUN', deprel='nsubj'). A condition may also be a list of
+        accepted values.
+
+        Returns:
+            (np.ndarray) : Boolean array of the same length as the columns
+        '''
+        result = np.ones(len(self), dtype=bool)
+        for field, value in conditions.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if field in STRING_FIELDS:
+                values = [self.code(field, v) for v in values]
+            result &= np.isin(self.columns[field], values)
+        return result
+
+
+    def decode(self, field:str) -> np.ndarray:
+        '''
+        Decoded values of a string field
+
+        Arguments:
+            field (str) : String field name
+
+        Returns:
+            (np.ndarray) : Array of strings (object dtype)
+        '''
+        values, inverse = np.unique(self.columns[field], return_inverse=True)
+        vocab = self.vocab[field]
+        return np.array([vocab[int(v)] for v in values], dtype=object)[inverse]
+
+
+    def count(self, field:str, mask:Union[np.ndarray,None]=None) -> dict:
+        '''
+        Frequencies of values of a string field, optionally restricted
+        to tokens selected by [mask]
+
+        Arguments:
+            field (str)             : String field name
+            mask  (np.ndarray|None) : Boolean mask of tokens; default: None
+
+        Returns:
+            (dict) : Counts keyed by value, most frequent first
+        '''
+        codes = self.columns[field] if mask is None else self.columns[field][mask]
+        counts = np.bincount(codes, minlength=len(self.vocab[field]))
+        order = np.argsort(-counts, kind='stable')
+        return {self.vocab[field][i]: int(counts[i]) for i in order if counts[i] > 0}
@@ -1,21 +1,27 @@
-from typing import Union
-import pandas as pd
+from typing import Union, Iterator, TYPE_CHECKING
 from .config import BASE_URL
-from .glob import make_request, metadata, get_content
+from .transport import BaseTransport
+from .glob import IndexedEntity, make_request, metadata, get_content, iter_content
 from .author import Author
 from .source import Source
+if TYPE_CHECKING:
+    import pandas as pd
 
 
-class Corpus:
+class Corpus(IndexedEntity):
     '''
     Class corresponding to a particular corpus.
     '''
 
+    __slots__ = ()
+    QUERY_TARGETS = ('authors', 'sources')
+
     def __init__(
             self, 
-            lang     : Union[str,None]  = None,
-            base_url : str              = BASE_URL, 
-            metadata : Union[dict,None] = None 
+            lang      : Union[str,None]           = None,
+            base_url  : str                       = BASE_URL, 
+            metadata  : Union[dict,None]          = None,
+            transport : Union[BaseTransport,None] = None
         ):
         '''
         Store corpus metadata (if initialized by Poetree instance) or get them 
@@ -23,9 +29,11 @@ class Corpus:
         that will hold lists of Author and Source instances.
         
         Arguments:
-            lang     (str|None)  : ISO code of the corpus, required if initialized directly 
-            base_url (str)       : API base URL (default: set in config.py)
-            metadata (dict|None) : Corpus metadata passed when initialized by Poetree instance
+            lang      (str|None)       : ISO code of the corpus, required if initialized directly 
+            base_url  (str)            : API base URL (default: set in config.py)
+            metadata  (dict|None)      : Corpus metadata passed when initialized by Poetree instance
+            transport (Transport|None) : Transport to send requests with (default: 
+                                         process-wide shared transport)
         
         Raises:
             ValueError : If neither [metadata] nor [lang] is passed
@@ -34,7 +42,9 @@ class Corpus:
             None       
         '''
         self.base_url = base_url
+        self.transport = transport
         self.content_ = dict()
+        self.indexes_ = dict()
         if metadata is not None:
             self.metadata_ = metadata
         elif lang is not None:
@@ -44,12 +54,13 @@ class Corpus:
                 'Argument [lang] is required when initializing ' +
                 f'{__class__.__name__} instance directly'
             )
-        for k, v in self.metadata_.items(): setattr(self, k, v)
+        self._register('corpus')
 
 
     def _get_corpus_metadata(self, lang:str):
         '''
-        Get metadata on corpus and store them in self.metadata_
+        Get metadata on corpus (unless loaded already through the same 
+        transport) and store them in self.metadata_
         
         Arguments:
             lang (str) : Language of the corpus (ISO code)
@@ -57,8 +68,13 @@ class Corpus:
         Returns:
             None      
         '''
-        self.metadata_ = make_request(self.base_url, 'corpus', corpus=lang)
-        self.metadata_['corpus'] = lang
+        if self._resolve('corpus', lang, 'id_', lang):
+            return
+        response = make_request(
+            self.base_url, 'corpus', self.transport, corpus=lang
+        )
+        # the response may be shared with concurrent callers
+        self.metadata_ = {**response, 'corpus': lang}
 
 
     def get_authors(self, **kwargs) -> list:
@@ -80,12 +96,30 @@ class Corpus:
         Returns:
             (list) : List holding instances of Author     
         '''
-        if 'country' in kwargs and not isinstance(kwargs['country'], list):
+        if 'country' in kwargs and isinstance(kwargs['country'], list):
             kwargs['country'] = ','.join(kwargs['country'])
         self.content_['authors'] = get_content(
-            self.base_url, 'authors', Author, corpus=self.metadata_['corpus'], **kwargs
+            self.base_url, 'authors', Author, self.transport,
+            corpus=self.metadata_['corpus'], **kwargs
         )
         return self.content_['authors']
+
+
+    def iter_authors(self, **kwargs) -> Iterator:
+        '''
+        Lazy variant of get_authors(): yield Author instances one by one
+        without storing them in self.content_. Accepts the same keyword
+        arguments as get_authors().
+        
+        Returns:
+            (Iterator) : Author instances     
+        '''
+        if 'country' in kwargs and isinstance(kwargs['country'], list):
+            kwargs['country'] = ','.join(kwargs['country'])
+        return iter_content(
+            self.base_url, 'authors', Author, self.transport,
+            corpus=self.metadata_['corpus'], **kwargs
+        )
     
 
     def get_sources(self, **kwargs) -> list:
@@ -107,18 +141,34 @@ class Corpus:
             (list) : List holding instances of Source      
         '''
         self.content_['sources'] = get_content(
-            self.base_url, 'sources', Source, corpus=self.metadata_['corpus'], **kwargs
+            self.base_url, 'sources', Source, self.transport,
+            corpus=self.metadata_['corpus'], **kwargs
         )
         return self.content_['sources']
 
 
+    def iter_sources(self, **kwargs) -> Iterator:
+        '''
+        Lazy variant of get_sources(): yield Source instances one by one
+        without storing them in self.content_. Accepts the same keyword
+        arguments as get_sources().
+        
+        Returns:
+            (Iterator) : Source instances      
+        '''
+        return iter_content(
+            self.base_url, 'sources', Source, self.transport,
+            corpus=self.metadata_['corpus'], **kwargs
+        )
+
+
     def metadata(
             self, 
             target  : str             = 'self',
             output  : str             = 'list', 
             sortby  : Union[str,list] = None, 
             reverse : bool            = False
-        ) -> Union[list, pd.DataFrame, None]:
+        ) -> Union[list, 'pd.DataFrame', None]:
         '''
         Returns targt metadata either as a formatted table (tabular=True)
         or as a list as received from API (tabular=False). The list may be
@@ -0,0 +1,122 @@
+import codecs
+import json
+from typing import Union, Iterator
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data:Union[bytes,str]) -> Union[dict,list]:
+    '''
+    Decode JSON document, using orjson if it is installed and the standard
+    library json otherwise.
+
+    Arguments:
+        data (bytes|str) : JSON document
+
+    Returns:
+        (dict|list) : Decoded document
+    '''
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(data:Union[dict,list]) -> bytes:
+    '''
+    Encode JSON document to UTF-8, using orjson if it is installed.
+
+    Arguments:
+        data (dict|list) : Document
+
+    Returns:
+        (bytes) : Encoded document
+    '''
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+def iter_array(chunks:Iterator[bytes]) -> Iterator:
+    '''
+    Incrementally decode a JSON array received in chunks of bytes, yielding
+    its elements as soon as they are complete. Only the unparsed remainder
+    is held in memory, never the whole document.
+
+    Arguments:
+        chunks (Iterator[bytes]) : Consecutive parts of the document
+
+    Raises:
+        ValueError : If the document is not a valid JSON array
+
+    Returns:
+        (Iterator) : Decoded elements of the array
+    '''
+    text = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ''
+    position = 0
+    state = 'start'
+    finished = False
+
+    def more() -> bool:
+        nonlocal buffer, position, finished
+        if finished:
+            return False
+        for chunk in chunks:
+            if chunk:
+                buffer = buffer[position:] + text.decode(chunk)
+                position = 0
+                return True
+        buffer = buffer[position:] + text.decode(b'', final=True)
+        position = 0
+        finished = True
+        return False
+
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        if position == len(buffer):
+            if not more():
+                if state == 'end':
+                    return
+                raise ValueError('Truncated JSON array')
+            continue
+        char = buffer[position]
+        if state == 'start':
+            if char != '[':
+                raise ValueError('JSON document is not an array')
+            position += 1
+            state = 'first'
+        elif state == 'end':
+            raise ValueError('Extra data after JSON array')
+        elif char == ']' and state in ('first', 'next'):
+            position += 1
+            state = 'end'
+        elif state == 'next':
+            if char != ',':
+                raise ValueError(f'Expected "," in JSON array, got "{char}"')
+            position += 1
+            state = 'element'
+        else:
+            try:
+                element, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                element, end = None, None
+            # a number cut by the end of a chunk (e.g. "3." of "3.5") decodes
+            # fine, so an element is taken only once it is followed by a delimiter
+            complete = end is not None and (
+                finished or (end < len(buffer) and buffer[end] in _DELIMITERS)
+            )
+            if not complete:
+                if not more() and end is None:
+                    raise ValueError('Invalid JSON array')
+                continue
+            position = end
+            state = 'next'
+            yield element
@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union
+import pandas as pd
+from .transport import BaseTransport
+from .glob import make_request
+
+LEVELS = ('corpora', 'authors', 'sources', 'poems')
+PREFIXES = {'corpora': 'corpus_', 'authors': 'author_', 'sources': 'source_'}
+CATEGORICAL = ('corpus', 'country')
+
+
+def typed(df:pd.DataFrame) -> pd.DataFrame:
+    '''
+    Convert columns of a metadata frame to compact dtypes: integer columns
+    with missing values (years, counts, ids) to nullable Int64, repeated
+    strings (corpus, country and any column with few distinct values) to
+    categorical.
+
+    Arguments:
+        df (pd.DataFrame) : Frame built from API records
+
+    Returns:
+        (pd.DataFrame) : The same frame with converted columns
+    '''
+    for column in df.columns:
+        values = df[column]
+        non_null = values.dropna()
+        if len(non_null) == 0 or pd.api.types.is_bool_dtype(values):
+            continue
+        if values.dtype.kind in 'iu':
+            df[column] = values.astype('Int64')
+        elif values.dtype.kind == 'f':
+            if (non_null % 1 == 0).all():
+                df[column] = values.astype('Int64')
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            types = non_null.map(type)
+            if types.isin([int]).all():
+                df[column] = values.astype('Int64')
+            elif types.isin([str]).all() and (
+                column in CATEGORICAL or non_null.nunique() <= len(non_null) / 2
+            ):
+                df[column] = values.astype('category')
+    return df
+
+
+def _records(
+        base_url    : str,
+        transport   : Union[BaseTransport,None],
+        level       : str,
+        corpora     : list,
+        authors     : Union[pd.DataFrame,None],
+        max_workers : int,
+    ) -> list:
+    '''
+    Raw records of a level for the selected corpora, each with the
+    [corpus] key set
+    '''
+    if level == 'poems':
+        queries = [
+            (lang, {'corpus': lang, 'id_author': int(id_)})
+            for lang, id_ in zip(authors['corpus'], authors['id_'])
+        ]
+    else:
+        queries = [(lang, {'corpus': lang}) for lang in corpora]
+    def fetch(query):
+        lang, params = query
+        # the response may be shared with concurrent callers
+        return [{**r, 'corpus': lang} for r in make_request(base_url, level, transport, **params)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return [r for response in executor.map(fetch, queries) for r in response]
+
+
+def metadata_frame(
+        base_url    : str,
+        transport   : Union[BaseTransport,None] = None,
+        levels      : Union[list,None]          = None,
+        corpora     : Union[list,None]          = None,
+        max_workers : int                       = 8,
+    ) -> pd.DataFrame:
+    '''
+    Build one typed DataFrame of metadata across several levels of the
+    collection straight from raw API responses (no Corpus/Author/...
+    instances are created). Rows correspond to the deepest requested level,
+    columns of the upper levels are joined to them and prefixed with the
+    level name (corpus_, author_, source_).
+
+    Arguments:
+        base_url    (str)            : API base URL
+        transport   (Transport|None) : Transport to send requests with
+        levels      (list|None)      : Levels to include, any of 'corpora', 'authors',
+                                       'sources', 'poems'; default: None (all)
+        corpora     (list|None)      : ISO codes of corpora to include; default: None (all)
+        max_workers (int)            : Max. number of concurrent requests; default: 8
+
+    Raises:
+        ValueError : If an unknown level is requested
+
+    Returns:
+        (pd.DataFrame) : Joined metadata
+    '''
+    levels = list(LEVELS) if levels is None else list(levels)
+    unknown = set(levels) - set(LEVELS)
+    if len(unknown) > 0:
+        raise ValueError(f'Unknown levels: {", ".join(sorted(unknown))}')
+    levels = [l for l in LEVELS if l in levels]
+
+    frames = dict()
+    frames['corpora'] = pd.DataFrame(make_request(base_url, 'corpora', transport))
+    if corpora is not None:
+        frames['corpora'] = frames['corpora'][frames['corpora']['corpus'].isin(corpora)]
+    langs = list(frames['corpora']['corpus'])
+    if 'authors' in levels or 'poems' in levels:
+        frames['authors'] = pd.DataFrame(
+            _records(base_url, transport, 'authors', langs, None, max_workers)
+        )
+    for level in ('sources', 'poems'):
+        if level in levels:
+            frames[level] = pd.DataFrame(_records(
+                base_url, transport, level, langs, frames.get('authors'), max_workers
+            ))
+
+    df = typed(frames[levels[-1]].reset_index(drop=True))
+    for level in reversed(levels[:-1]):
+        upper = typed(frames[level].reset_index(drop=True))
+        key, upper_key = {
+            'corpora' : ('corpus', 'corpus'),
+            'authors' : ('id_author', 'id_'),
+            'sources' : ('id_source', 'id_'),
+        }[level]
+        upper = upper.rename(columns={
+            c: PREFIXES[level] + c.rstrip('_') if c not in ('corpus', upper_key)
+            else c for c in upper.columns
+        })
+        if key not in df.columns:
+            continue
+        if upper_key == 'id_':
+            upper = upper.rename(columns={'id_': key})
+            on = ['corpus', key]
+        else:
+            on = ['corpus']
+        for column in on:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype(str)
+            if isinstance(upper[column].dtype, pd.CategoricalDtype):
+                upper[column] = upper[column].astype(str)
+        df = df.merge(upper, how='left', on=on)
+    if 'corpus' in df.columns:
+        df['corpus'] = df['corpus'].astype('category')
+    return df
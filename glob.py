@@ -1,71 +1,445 @@
-import requests
-import json
-from typing import Union, Any
-from tabulate import tabulate
-import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Union, Any, Callable, Iterator, TYPE_CHECKING
+from urllib.parse import urljoin
+from .transport import BaseTransport, get_default_transport
+from .identity import IdentityMap
+from .cache import CacheMiss
+from .snapshot import Snapshot, get_snapshot
+from .query import Index
+from .decode import loads, iter_array
+if TYPE_CHECKING:
+    import pandas as pd
+
+# end of a stream of decoded items (which may be None)
+_END = object()
+
+class Entity:
+    '''
+    Base class of Corpus, Author, Source and Poem. Metadata are stored once,
+    in self.metadata_, and exposed as read-only attributes on access 
+    (corpus.n_poems is corpus.metadata_['n_poems']). Instances have no 
+    per-instance __dict__, only the slots below.
+    '''
+
+    __slots__ = ('base_url', 'transport', 'content_', 'metadata_', '__weakref__')
+
+    def __getattr__(self, name:str) -> Any:
+        '''
+        Called only if regular lookup fails: look the name up in metadata.
+        '''
+        try:
+            return object.__getattribute__(self, 'metadata_')[name]
+        except (AttributeError, KeyError):
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            ) from None
+
+
+    def _identity(self) -> Union[IdentityMap,None]:
+        '''
+        Identity map of the transport of the instance (None if disabled)
+        '''
+        return getattr(_shared(self.base_url, self.transport), 'identity', None)
+
+
+    def _resolve(self, type_:str, lang:str, key:str, value:Union[int,str]) -> bool:
+        '''
+        Look the entity up in the identity map. If it has been loaded already,
+        share its metadata and content instead of sending a request.
+
+        Arguments:
+            type_ (str)     : 'corpus', 'author', 'source' or 'poem'
+            lang  (str)     : ISO code of the corpus
+            key   (str)     : Identifier name (id_, wiki, viaf, id_poem)
+            value (int|str) : Identifier value
+
+        Returns:
+            (bool) : Whether the entity was found
+        '''
+        identity = self._identity()
+        canonical = None if identity is None else identity.find(lang, type_, key, value)
+        if canonical is None:
+            return False
+        self.metadata_ = canonical.metadata_
+        self.content_ = canonical.content_
+        return True
+
+
+    def _register(self, type_:str, aliases:Union[dict,None]=None):
+        '''
+        Register the entity in the identity map. If an instance of the same
+        entity is registered already, share its content (fetched children,
+        body), so that it is loaded only once.
+
+        Arguments:
+            type_   (str)       : 'corpus', 'author', 'source' or 'poem'
+            aliases (dict|None) : Further identifiers of the entity (see
+                                  IdentityMap.add); default: None
+
+        Returns:
+            None
+        '''
+        identity = self._identity()
+        if identity is not None:
+            canonical = identity.add(self, type_, aliases)
+            if canonical is not self:
+                self.content_ = canonical.content_
+
+
+    def __dir__(self) -> list:
+        metadata = getattr(self, 'metadata_', dict())
+        return sorted(set(super().__dir__()) | set(metadata))
+
+
+class IndexedEntity(Entity):
+    '''
+    Base class of entities whose fetched children can be filtered locally
+    (Corpus, Author, Source): indexes of the children are kept in
+    self.indexes_, subclasses list the children in QUERY_TARGETS.
+    '''
+
+    __slots__ = ('indexes_',)
+    # children filtered by query(), the first one by default
+    QUERY_TARGETS = ()
+
+    def query(self, target:Union[str,None]=None, **kwargs) -> list:
+        '''
+        Filter already fetched children locally, without sending a request.
+        Accepts the keyword arguments of their get_[target]() in any
+        combination (see query.Index), e.g.
+        corpus.query(country='cz,sk', born_after=1800, died_before=1900).
+        The target is fetched first if it has not been yet.
+
+        Arguments:
+            target (str|None) : What to filter, one of QUERY_TARGETS of the class
+                                ('authors' or 'sources' of a corpus, 'poems' or
+                                'sources' of an author, 'poems' of a source);
+                                default: None (the first of them)
+
+        Raises:
+            ValueError : If [target] cannot be filtered
+
+        Returns:
+            (list) : Matching instances
+        '''
+        if target is None:
+            target = self.QUERY_TARGETS[0]
+        if target not in self.QUERY_TARGETS:
+            raise ValueError(
+                f'Unknown [target]: {target} (expected one of {", ".join(self.QUERY_TARGETS)})'
+            )
+        if target not in self.content_:
+            getattr(self, f'get_{target}')()
+        items = self.content_[target]
+        if target not in self.indexes_ or self.indexes_[target].items is not items:
+            self.indexes_[target] = Index(items)
+        return self.indexes_[target].filter(**kwargs)
+
+
+def _shared(base_url:str, transport:Union[BaseTransport,None]) -> Union[BaseTransport,Snapshot]:
+    '''
+    Holder of the identity map and hooks of instances created with
+    [transport]: the transport itself, the snapshot of a file:// URL (so
+    that no HTTP transport is created for it) or the default transport
+    '''
+    if transport is not None:
+        return transport
+    if base_url.startswith('file://'):
+        return get_snapshot(base_url)
+    return get_default_transport()
+
 
 def make_request(
-        base_url : str, 
-        endpoint : str, 
+        base_url  : str, 
+        endpoint  : str, 
+        transport : Union[BaseTransport,None] = None,
         **kwargs
     ) -> Union[dict,list]:
     '''
     Send request to PoeTree API. Returns the decoded JSON response.
     We catch two types of errors: (1) Server response with a status
-    code other than 200, (2) invalid JSON response.
+    code other than 200, (2) invalid JSON response. If the transport
+    has a cache, responses are served from and stored to it. Requests
+    to a file:// base URL are answered from a local snapshot. Concurrent
+    identical requests (same URL and parameters) are sent only once and
+    share the decoded response.
     
     Arguments:
-        url      (string) : API method name
-        **kwargs (dict)   : URL parameters
+        url       (string)         : API method name
+        transport (Transport|None) : Transport to send the request with
+                                     (default: process-wide shared transport)
+        **kwargs  (dict)           : URL parameters
 
     Returns:
         response (dict|list) : response JSON decoded
     '''
+    if base_url.startswith('file://'):
+        return get_snapshot(base_url).request(endpoint, **kwargs)
     if not base_url.endswith('/'):
         base_url += '/'
-    url = requests.compat.urljoin(base_url, endpoint)
-    response = requests.get(url, kwargs)
+    if transport is None:
+        transport = get_default_transport()
+    key = (base_url, endpoint, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+    return transport.inflight.do(
+        key, lambda: _send(base_url, endpoint, transport, kwargs)
+    )
+
+
+def _send(
+        base_url  : str, 
+        endpoint  : str, 
+        transport : BaseTransport,
+        params    : dict
+    ) -> Union[dict,list]:
+    '''
+    Body of make_request(): get the response from the cache or the server
+    and decode it. Concurrent identical requests share one call of this
+    function (see singleflight.SingleFlight), so its result must not be
+    modified by one caller in a way others would not expect.
+    '''
+    url = urljoin(base_url, endpoint)
+    cache = transport.cache
+    if cache is not None:
+        key = cache.key(base_url, endpoint, params)
+        cached = cache.get(key)
+        transport.hooks.emit('cache', endpoint=endpoint, params=params, hit=cached is not None)
+        if cached is not None:
+            return _decode(transport, endpoint, cached)
+        if cache.offline:
+            raise CacheMiss(f'Response not cached (offline mode): {endpoint} {params}')
+    response = transport.get(url, params)
     if response.status_code == 200:
         try:
-            return json.loads(response.text)
+            decoded = _decode(transport, endpoint, response.content)
         except:
             raise Exception(f'Invalid JSON response')
+        if cache is not None:
+            cache.set(key, response.content)
+        return decoded
     else:
         raise Exception(f'Server responded with status code {response.status_code}: {response.reason}')
 
 
+def _decode(transport:BaseTransport, endpoint:str, data:bytes) -> Union[dict,list]:
+    '''
+    Decode JSON response, reporting the time spent to the transport's hooks
+    '''
+    started = time.perf_counter()
+    decoded = loads(data)
+    transport.hooks.emit(
+        'decode', endpoint=endpoint, elapsed=time.perf_counter() - started, size=len(data)
+    )
+    return decoded
+
+
+def iter_request(
+        base_url  : str, 
+        endpoint  : str, 
+        transport : Union[BaseTransport,None] = None,
+        **kwargs
+    ) -> Iterator:
+    '''
+    Send request to PoeTree API whose response is a list and yield its 
+    items as they are decoded from the incoming stream, without holding 
+    the whole response in memory. Responses served from a cache or a local
+    snapshot are decoded at once by make_request().
+    
+    Arguments:
+        url       (string)         : API method name
+        transport (Transport|None) : Transport to send the request with
+                                     (default: process-wide shared transport)
+        **kwargs  (dict)           : URL parameters
+
+    Returns:
+        (Iterator) : Items of the decoded response
+    '''
+    local = base_url.startswith('file://')
+    if transport is None and not local:
+        transport = get_default_transport()
+    if local or transport.cache is not None:
+        # the list may be shared with concurrent callers (single-flight),
+        # so it is only read, never consumed
+        for item in make_request(base_url, endpoint, transport, **kwargs):
+            yield item
+        return
+    if not base_url.endswith('/'):
+        base_url += '/'
+    url = urljoin(base_url, endpoint)
+    response = transport.get(url, kwargs, stream=True)
+    size, waited, elapsed = 0, 0.0, 0.0
+
+    def read() -> Iterator[bytes]:
+        # time spent waiting for the network is not decoding
+        nonlocal size, waited
+        chunks = response.iter_content(chunk_size=65536)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            waited += time.perf_counter() - started
+            if chunk is None:
+                return
+            size += len(chunk)
+            yield chunk
+
+    try:
+        if response.status_code != 200:
+            raise Exception(f'Server responded with status code {response.status_code}: {response.reason}')
+        try:
+            items = iter_array(read())
+            while True:
+                started = time.perf_counter()
+                item = next(items, _END)
+                elapsed += time.perf_counter() - started
+                if item is _END:
+                    break
+                yield item
+        except ValueError:
+            raise Exception(f'Invalid JSON response')
+        finally:
+            transport.hooks.emit('decode', endpoint=endpoint, elapsed=elapsed - waited, size=size)
+    finally:
+        response.close()
+
+
 def get_content(
-        base_url : str,
-        endpoint : str,
-        class_   : Any,
+        base_url  : str,
+        endpoint  : str,
+        class_    : Any,
+        transport : Union[BaseTransport,None] = None,
         **kwargs
     ) -> list:
     '''
     Get metadata on subordinate elements (Poetree->Corpus->Author/Source->Poem).
+    The response is decoded at once and concurrent identical requests are
+    coalesced (see make_request); iter_content() streams it instead.
     
     Params:
-        None
+        transport (Transport|None) : Transport shared with the created instances
     
     Returns:
         (list) : List holding instances of subordinate class       
     '''
-    response = make_request(base_url, endpoint, **kwargs)
+    hooks = _shared(base_url, transport).hooks
+    response = make_request(base_url, endpoint, transport, **kwargs)
+    started = time.perf_counter()
     content = list()
     for r in response:
         if endpoint != 'corpora':
-            r['corpus'] = kwargs['corpus']
-        content.append(
-            class_(base_url=base_url, metadata=r)
-        )
-    return content 
+            # the response may be shared with concurrent callers
+            r = {**r, 'corpus': kwargs['corpus']}
+        content.append(class_(base_url=base_url, transport=transport, metadata=r))
+    hooks.emit('construct', endpoint=endpoint, count=len(content), elapsed=time.perf_counter() - started)
+    return content
+
+
+def iter_content(
+        base_url  : str,
+        endpoint  : str,
+        class_    : Any,
+        transport : Union[BaseTransport,None] = None,
+        **kwargs
+    ) -> Iterator:
+    '''
+    Lazy variant of get_content(): yield instances of subordinate class one
+    by one, as the response is being decoded, instead of building the whole
+    list.
+    
+    Params:
+        transport (Transport|None) : Transport shared with the created instances
+    
+    Returns:
+        (Iterator) : Instances of subordinate class       
+    '''
+    hooks = _shared(base_url, transport).hooks
+    count, elapsed = 0, 0.0
+    try:
+        for r in iter_request(base_url, endpoint, transport, **kwargs):
+            if endpoint != 'corpora':
+                r = {**r, 'corpus': kwargs['corpus']}
+            started = time.perf_counter()
+            instance = class_(base_url=base_url, transport=transport, metadata=r)
+            elapsed += time.perf_counter() - started
+            count += 1
+            yield instance
+    finally:
+        hooks.emit('construct', endpoint=endpoint, count=count, elapsed=elapsed)
     
 
+def fetch_bodies(
+        poems       : list,
+        max_workers : int = 8,
+        **kwargs
+    ) -> dict:
+    '''
+    Fetch bodies of many poems concurrently (at most [max_workers] requests
+    at once) and store them in each Poem.content_. Poems whose body has 
+    already been fetched are skipped. A failed poem does not abort the batch,
+    its error is reported in the returned dict instead.
+    
+    Arguments:
+        poems       (list) : Poem instances
+        max_workers (int)  : Max. number of concurrent requests; default: 8
+        **kwargs    (dict) : URL parameters passed to Poem.get_body()
+
+    Returns:
+        (dict) : Exceptions keyed by Poem instances that failed; empty if
+                 all bodies were fetched
+    '''
+    errors = dict()
+    pending = [p for p in poems if len(p.content_) == 0]
+    if len(pending) == 0:
+        return errors
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(p.get_body, **kwargs): p for p in pending}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                errors[futures[future]] = e
+    return errors
+
+
+def construct_many(
+        build       : Callable,
+        values      : list,
+        max_workers : int = 8,
+    ) -> tuple:
+    '''
+    Construct many instances concurrently (at most [max_workers] requests
+    at once), one per identifier. A failed identifier does not abort the
+    batch, its error is reported in the returned dict instead.
+
+    Arguments:
+        build       (Callable) : Called as build(value), returns an instance
+        values      (list)     : Identifiers
+        max_workers (int)      : Max. number of concurrent requests; default: 8
+
+    Returns:
+        (tuple) : List of instances in the order of [values] (None where
+                  construction failed) and dict of exceptions keyed by the
+                  identifiers that failed
+    '''
+    instances, errors = [None] * len(values), dict()
+    if len(values) == 0:
+        return instances, errors
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(build, value): i for i, value in enumerate(values)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                instances[i] = future.result()
+            except Exception as e:
+                errors[values[i]] = e
+    return instances, errors
+
+
 def metadata(
         instances : list, 
         output    : str             = 'list', 
         sortby    : Union[str,None] = None,
         reverse   : bool            = False,
-    ) -> Union[list, pd.DataFrame, None]:
+    ) -> Union[list, 'pd.DataFrame', None]:
     '''
     Takes a list of instances (corpora, authors, sources...) and returns
     their metadata (values stored in self.data_). Metadata are returned either
@@ -93,8 +467,10 @@ def metadata(
     if output == 'list':
         return [x.metadata_ for x in instances]
     if output == 'pandas':
+        import pandas as pd
         return pd.DataFrame([x.metadata_ for x in instances])
     if output == 'print':
+        from tabulate import tabulate
         header = instances[0].metadata_.keys()
         body = [list([val if val else '' for val in x.metadata_.values()]) for x in instances]
         print(tabulate(body, header, maxcolwidths=[50]*len(header)))
@@ -0,0 +1,64 @@
+from typing import Callable, Union
+
+EVENTS = (
+    'before_request',   # url, endpoint, params, attempt
+    'after_response',   # url, endpoint, params, attempt, status, elapsed, size
+    'on_error',         # url, endpoint, params, attempt, error, elapsed
+    'cache',            # endpoint, params, hit
+    'decode',           # endpoint, elapsed, size
+    'construct',        # endpoint, count, elapsed
+)
+
+
+class Hooks:
+    '''
+    Event handlers of a transport. Handlers are called synchronously with
+    keyword arguments describing the event (see EVENTS), from the thread
+    (or task) that sent the request; exceptions raised by a handler are
+    passed on to the caller.
+
+        transport.hooks.on('after_response', lambda **e: print(e['url'], e['elapsed']))
+    '''
+
+    def __init__(self):
+        self._handlers = {event: list() for event in EVENTS}
+
+
+    def on(self, event:str, handler:Union[Callable,None]=None) -> Callable:
+        '''
+        Register handler of an event. Without [handler] returns a decorator.
+
+        Arguments:
+            event   (str)           : Event name, one of EVENTS
+            handler (Callable|None) : Function accepting keyword arguments
+
+        Raises:
+            ValueError : If the event is unknown
+
+        Returns:
+            (Callable) : The handler (or the decorator)
+        '''
+        if event not in self._handlers:
+            raise ValueError(f'Unknown event [{event}], use one of: {", ".join(EVENTS)}')
+        if handler is None:
+            return lambda handler: self.on(event, handler)
+        # handlers are replaced rather than appended to, so that emit()
+        # running in another thread iterates over an unchanging list
+        self._handlers[event] = self._handlers[event] + [handler]
+        return handler
+
+
+    def off(self, event:str, handler:Callable):
+        '''
+        Unregister handler of an event (no-op if it is not registered).
+        '''
+        self._handlers[event] = [h for h in self._handlers.get(event, ()) if h is not handler]
+
+
+    def emit(self, event:str, **info):
+        '''
+        Call all handlers of an event
+        '''
+        for handler in self._handlers[event]:
+            handler(**info)
+
@@ -0,0 +1,107 @@
+import threading
+import weakref
+from typing import Union, Any
+
+
+class IdentityMap:
+    '''
+    Registry of loaded entities (Corpus, Author, Source, Poem) keyed by
+    (corpus, type, id), kept by a transport. Entities are held by weak
+    references, so the map never keeps anything alive on its own. Secondary
+    indexes resolve authors by wiki/viaf id and sources by id of a poem
+    they contain.
+    '''
+
+    def __init__(self):
+        self._entities = weakref.WeakValueDictionary()
+        self._aliases = dict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+
+    def get(self, corpus:str, type_:str, id_:Union[int,str]) -> Any:
+        '''
+        Return registered entity or None
+
+        Arguments:
+            corpus (str)     : ISO code of the corpus
+            type_  (str)     : 'corpus', 'author', 'source' or 'poem'
+            id_    (int|str) : Id(DB) of the entity (ISO code for corpora)
+
+        Returns:
+            (Entity|None) : Registered entity
+        '''
+        return self._entities.get((corpus, type_, str(id_)))
+
+
+    def find(self, corpus:str, type_:str, key:str, value:Union[int,str]) -> Any:
+        '''
+        Return registered entity by any of its identifiers: id_ for all
+        types, wiki/viaf for authors, id_poem for sources.
+
+        Arguments:
+            corpus (str)     : ISO code of the corpus
+            type_  (str)     : 'corpus', 'author', 'source' or 'poem'
+            key    (str)     : Identifier name
+            value  (int|str) : Identifier value
+
+        Returns:
+            (Entity|None) : Registered entity
+        '''
+        if key == 'id_':
+            return self.get(corpus, type_, value)
+        if type_ == 'source' and key == 'id_poem':
+            poem = self.get(corpus, 'poem', value)
+            if poem is not None and poem.metadata_.get('id_source') is not None:
+                # remembered, the poem need not stay loaded
+                with self._lock:
+                    self._aliases[(corpus, type_, key, str(value))] = poem.metadata_['id_source']
+        id_ = self._aliases.get((corpus, type_, key, str(value)))
+        return None if id_ is None else self.get(corpus, type_, id_)
+
+
+    def add(self, entity:Any, type_:str, aliases:Union[dict,None]=None) -> Any:
+        '''
+        Register entity unless an entity with the same key is registered
+        already; return the registered one.
+
+        Arguments:
+            entity  (Entity)    : Entity with metadata_ loaded
+            type_   (str)       : 'corpus', 'author', 'source' or 'poem'
+            aliases (dict|None) : Further identifiers of the entity by name, e.g.
+                                  {'id_poem': 1204} for a source looked up by a
+                                  poem; default: None
+
+        Returns:
+            (Entity) : Registered (canonical) entity
+        '''
+        metadata = entity.metadata_
+        corpus = metadata.get('corpus')
+        id_ = corpus if type_ == 'corpus' else metadata.get('id_')
+        if corpus is None or id_ is None:
+            return entity
+        key = (corpus, type_, str(id_))
+        with self._lock:
+            canonical = self._entities.get(key)
+            if canonical is None:
+                canonical = self._entities[key] = entity
+            if type_ == 'author':
+                for alias in ('wiki', 'viaf'):
+                    if metadata.get(alias) is not None:
+                        self._aliases[(corpus, type_, alias, str(metadata[alias]))] = id_
+            for alias, value in (aliases or dict()).items():
+                if value is not None:
+                    self._aliases[(corpus, type_, alias, str(value))] = id_
+        return canonical
+
+
+    def clear(self):
+        '''
+        Forget all registered entities.
+        '''
+        with self._lock:
+            self._entities.clear()
+            self._aliases.clear()
@@ -1,9 +1,10 @@
-from typing import Union
-import pandas as pd
-from tabulate import tabulate
+from typing import Union, Iterator, TYPE_CHECKING
 from .config import BASE_URL
-from .glob import make_request, metadata, get_content
+from .transport import BaseTransport
+from .glob import make_request, metadata, get_content, iter_content
 from .corpus import Corpus
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class Poetree:
@@ -11,18 +12,25 @@ class Poetree:
     Class corresponding to entire PoeTree collection
     '''
 
-    def __init__(self, base_url:str=BASE_URL):
+    def __init__(
+            self, 
+            base_url  : str                       = BASE_URL,
+            transport : Union[BaseTransport,None] = None
+        ):
         '''
         Set API base URL. Create empty dict self.content_ that will 
         hold a list of Corpus instances.
         
         Params:
-            base_url (str) : API base URL (default: set in config.py)
+            base_url  (str)            : API base URL (default: set in config.py)
+            transport (Transport|None) : Transport shared by all instances created from
+                                         this one (default: process-wide shared transport)
         
         Returns:
             None
         '''
         self.base_url = base_url
+        self.transport = transport
         self.content_  = dict()
 
 
@@ -38,9 +46,80 @@ class Poetree:
             (list) : List holding instances of Author       
         '''
 
-        self.content_['corpora'] = get_content(self.base_url, 'corpora', Corpus)
+        self.content_['corpora'] = get_content(
+            self.base_url, 'corpora', Corpus, self.transport
+        )
         return self.content_['corpora']
-    
+
+
+    def iter_corpora(self) -> Iterator:
+        '''
+        Lazy variant of get_corpora(): yield Corpus instances one by one 
+        without storing them in self.content_.
+        
+        Params:
+            None
+        
+        Returns:
+            (Iterator) : Corpus instances       
+        '''
+        return iter_content(self.base_url, 'corpora', Corpus, self.transport)
+
+
+    def iter_poems(
+            self, 
+            with_bodies : bool             = True,
+            corpora     : Union[list,None] = None
+        ) -> Iterator:
+        '''
+        Walk the whole collection (corpora -> authors -> poems) and yield 
+        Poem instances one by one, optionally with their bodies fetched.
+        Nothing is stored in content_ of any instance along the way, so 
+        memory use does not grow with the number of poems walked.
+        
+        Params:
+            with_bodies (bool)      : Fetch body of each poem before yielding it;
+                                      default: True
+            corpora     (list|None) : ISO codes of corpora to walk; default: None (all)
+        
+        Returns:
+            (Iterator) : Poem instances       
+        '''
+        for corpus in self.iter_corpora():
+            if corpora is not None and corpus.corpus not in corpora:
+                continue
+            for author in corpus.iter_authors():
+                for poem in author.iter_poems():
+                    if with_bodies:
+                        poem.get_body()
+                    yield poem
+
+
+    def metadata_frame(
+            self,
+            levels      : Union[list,None] = None,
+            corpora     : Union[list,None] = None,
+            max_workers : int              = 8
+        ) -> 'pd.DataFrame':
+        '''
+        Returns metadata of several levels of the collection joined into one
+        typed DataFrame (see frames.metadata_frame). Rows correspond to the
+        deepest level requested, e.g. levels=['corpora','authors','poems'] 
+        gives one row per poem with its author's and corpus' metadata. The 
+        frame is built straight from API responses, no instances are created.
+        
+        Params:
+            levels      (list|None) : Any of 'corpora', 'authors', 'sources', 'poems';
+                                      default: None (all)
+            corpora     (list|None) : ISO codes of corpora to include; default: None (all)
+            max_workers (int)       : Max. number of concurrent requests; default: 8
+            
+        Returns:
+            (pd.DataFrame) : metadata
+        '''
+        from .frames import metadata_frame
+        return metadata_frame(self.base_url, self.transport, levels, corpora, max_workers)
+
 
     def metadata(
             self, 
@@ -48,7 +127,7 @@ class Poetree:
             output  : str             = 'list', 
             sortby  : Union[str,list] = None, 
             reverse : bool            = False
-        ) -> Union[list, pd.DataFrame, None]:
+        ) -> Union[list, 'pd.DataFrame', None]:
         '''
         Returns metadata of selected target either as a formatted table (tabular=True)
         or as a list as received from API (tabular=False). The list may be
@@ -0,0 +1,234 @@
+import bisect
+import threading
+from typing import Any
+from .hooks import EVENTS
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (1e2, 1e3, 1e4, 1e5, 1e6, 1e7)
+
+
+class Histogram:
+    '''
+    Histogram with fixed upper bounds of buckets and an implicit unbounded
+    last one. Counts are kept per bucket, not cumulative.
+    '''
+
+    def __init__(self, buckets:tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+    def observe(self, value:float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+    def as_dict(self) -> dict:
+        return {
+            'count'   : self.count,
+            'sum'     : self.sum,
+            'buckets' : dict(zip([*self.buckets, float('inf')], self.counts)),
+        }
+
+
+class Metrics:
+    '''
+    Collector of request metrics fed by the hooks of one or more
+    transports: per-endpoint counts of responses (by status), errors,
+    retries and cache hits/misses, histograms of latency, response size and
+    decoding time, and time spent constructing Corpus/Author/Source/Poem
+    instances. Tells apart runs bound by the network (latency), by decoding
+    and by object construction.
+
+        metrics = Metrics().attach(transport)
+        ...
+        print(metrics.to_prometheus())
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._transports = list()
+        self.reset()
+
+
+    def reset(self):
+        '''
+        Drop all recorded values.
+        '''
+        with self._lock:
+            self.requests = dict()
+            self.errors = dict()
+            self.retries = dict()
+            self.cache = dict()
+            self.latency = dict()
+            self.size = dict()
+            self.decode = dict()
+            self.construct = dict()
+
+
+    def attach(self, transport:Any) -> 'Metrics':
+        '''
+        Start recording requests sent through a transport.
+
+        Arguments:
+            transport (Transport|AsyncTransport) : Transport to instrument
+
+        Returns:
+            (Metrics) : self
+        '''
+        for event in EVENTS:
+            transport.hooks.on(event, getattr(self, '_' + event))
+        self._transports.append(transport)
+        return self
+
+
+    def detach(self, transport:Any):
+        '''
+        Stop recording requests sent through a transport.
+        '''
+        for event in EVENTS:
+            transport.hooks.off(event, getattr(self, '_' + event))
+        self._transports = [t for t in self._transports if t is not transport]
+
+
+    def _before_request(self, endpoint:str, attempt:int, **info):
+        if attempt > 0:
+            with self._lock:
+                self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+
+
+    def _after_response(self, endpoint:str, status:int, elapsed:float, size:Any, **info):
+        with self._lock:
+            statuses = self.requests.setdefault(endpoint, dict())
+            statuses[status] = statuses.get(status, 0) + 1
+            self._histogram(self.latency, endpoint, LATENCY_BUCKETS).observe(elapsed)
+            if size is not None:
+                self._histogram(self.size, endpoint, SIZE_BUCKETS).observe(size)
+
+
+    def _on_error(self, endpoint:str, error:Exception, elapsed:float, **info):
+        with self._lock:
+            errors = self.errors.setdefault(endpoint, dict())
+            name = type(error).__name__
+            errors[name] = errors.get(name, 0) + 1
+            self._histogram(self.latency, endpoint, LATENCY_BUCKETS).observe(elapsed)
+
+
+    def _cache(self, endpoint:str, hit:bool, **info):
+        with self._lock:
+            results = self.cache.setdefault(endpoint, {'hit': 0, 'miss': 0})
+            results['hit' if hit else 'miss'] += 1
+
+
+    def _decode(self, endpoint:str, elapsed:float, **info):
+        with self._lock:
+            self._histogram(self.decode, endpoint, LATENCY_BUCKETS).observe(elapsed)
+
+
+    def _construct(self, endpoint:str, count:int, elapsed:float, **info):
+        with self._lock:
+            totals = self.construct.setdefault(endpoint, {'objects': 0, 'seconds': 0.0})
+            totals['objects'] += count
+            totals['seconds'] += elapsed
+
+
+    @staticmethod
+    def _histogram(histograms:dict, endpoint:str, buckets:tuple) -> Histogram:
+        if endpoint not in histograms:
+            histograms[endpoint] = Histogram(buckets)
+        return histograms[endpoint]
+
+
+    def as_dict(self) -> dict:
+        '''
+        Recorded metrics as a dictionary keyed by metric and endpoint
+
+        Returns:
+            (dict) : Metrics
+        '''
+        with self._lock:
+            return {
+                'requests'  : {e: dict(s) for e, s in self.requests.items()},
+                'errors'    : {e: dict(s) for e, s in self.errors.items()},
+                'retries'   : dict(self.retries),
+                'cache'     : {e: dict(s) for e, s in self.cache.items()},
+                'latency'   : {e: h.as_dict() for e, h in self.latency.items()},
+                'size'      : {e: h.as_dict() for e, h in self.size.items()},
+                'decode'    : {e: h.as_dict() for e, h in self.decode.items()},
+                'construct' : {e: dict(s) for e, s in self.construct.items()},
+            }
+
+
+    def to_prometheus(self, prefix:str='poetree') -> str:
+        '''
+        Recorded metrics in the Prometheus text exposition format
+
+        Arguments:
+            prefix (str) : Prefix of metric names; default: 'poetree'
+
+        Returns:
+            (str) : Metrics, one sample per line
+        '''
+        data = self.as_dict()
+        lines = list()
+
+        def counter(name, help_, samples):
+            lines.append(f'# HELP {prefix}_{name} {help_}')
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for labels, value in samples:
+                lines.append(f'{prefix}_{name}{_labels(labels)} {_number(value)}')
+
+        def histogram(name, help_, histograms):
+            lines.append(f'# HELP {prefix}_{name} {help_}')
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            for endpoint, h in histograms.items():
+                cumulative = 0
+                for bound, count in h['buckets'].items():
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(
+                        f'{prefix}_{name}_bucket{_labels({"endpoint": endpoint, "le": le})} {cumulative}'
+                    )
+                lines.append(f'{prefix}_{name}_sum{_labels({"endpoint": endpoint})} {_number(h["sum"])}')
+                lines.append(f'{prefix}_{name}_count{_labels({"endpoint": endpoint})} {h["count"]}')
+
+        counter('requests_total', 'Responses received, by status code.', [
+            ({'endpoint': e, 'status': s}, n)
+            for e, statuses in data['requests'].items() for s, n in statuses.items()
+        ])
+        counter('request_errors_total', 'Requests failed without a response.', [
+            ({'endpoint': e, 'error': name}, n)
+            for e, errors in data['errors'].items() for name, n in errors.items()
+        ])
+        counter('request_retries_total', 'Repeated attempts of failed requests.', [
+            ({'endpoint': e}, n) for e, n in data['retries'].items()
+        ])
+        counter('cache_requests_total', 'Cache lookups, by result.', [
+            ({'endpoint': e, 'result': r}, n)
+            for e, results in data['cache'].items() for r, n in results.items()
+        ])
+        histogram('request_duration_seconds', 'Time until the response was received.', data['latency'])
+        histogram('response_size_bytes', 'Size of decompressed response bodies.', data['size'])
+        histogram('decode_duration_seconds', 'Time spent decoding JSON responses.', data['decode'])
+        counter('objects_constructed_total', 'Instances created from responses.', [
+            ({'endpoint': e}, c['objects']) for e, c in data['construct'].items()
+        ])
+        counter('construction_seconds_total', 'Time spent creating instances from responses.', [
+            ({'endpoint': e}, c['seconds']) for e, c in data['construct'].items()
+        ])
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels:dict) -> str:
+    escaped = (
+        str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        for v in labels.values()
+    )
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+def _number(value:float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,260 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Union, Callable
+from .config import BASE_URL
+from .transport import BaseTransport
+from .main import Poetree
+from .corpus import Corpus
+from .poem import Poem
+
+
+def write_jsonl(path:str, records:list):
+    '''
+    Write records to a JSONL file atomically (via a temporary file), so that
+    an interrupted run never leaves a truncated listing behind.
+
+    Arguments:
+        path    (str)  : Target file
+        records (list) : JSON-serializable records
+
+    Returns:
+        None
+    '''
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+    os.replace(tmp, path)
+
+
+def read_jsonl(path:str) -> list:
+    '''
+    Read all records from a JSONL file.
+
+    Arguments:
+        path (str) : Source file
+
+    Returns:
+        (list) : Decoded records
+    '''
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _done_poems(path:str) -> set:
+    '''
+    Return ids of poems already stored in bodies.jsonl. A trailing partial
+    line (left by an interrupted run) is cut off.
+
+    Arguments:
+        path (str) : Path of bodies.jsonl
+
+    Returns:
+        (set) : Poem ids
+    '''
+    done = set()
+    if not os.path.exists(path):
+        return done
+    valid = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            done.add(json.loads(line)['id_'])
+            valid += len(line)
+    if valid != os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(valid)
+    return done
+
+
+def append_bodies(
+        poems       : list,
+        path        : str,
+        max_workers : int                  = 8,
+        stored      : Union[Callable,None] = None,
+        skip        : Union[Callable,None] = None,
+    ) -> dict:
+    '''
+    Fetch metadata and bodies of poems concurrently and append them to a
+    bodies.jsonl file as they arrive (at most [max_workers] * 4 poems are
+    in flight at once).
+
+    Arguments:
+        poems       (list)          : Poem instances
+        path        (str)           : Path of bodies.jsonl
+        max_workers (int)           : Max. number of concurrent requests; default: 8
+        stored      (Callable|None) : Called as stored(poem, line) after each poem,
+                                      with the JSON line of the poem (None if the
+                                      poem failed); default: None
+        skip        (Callable|None) : Called as skip(poem, line); lines for which it
+                                      returns True are not written (e.g. identical to
+                                      the stored ones); default: None
+
+    Returns:
+        (dict) : Exceptions keyed by ids of poems that failed
+    '''
+    errors = dict()
+    with open(path, 'a', encoding='utf-8') as f, \
+         ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = dict()
+        todo = iter(poems)
+        while True:
+            for poem in todo:
+                pending[executor.submit(poem.get_all)] = poem
+                if len(pending) >= max_workers * 4:
+                    break
+            if len(pending) == 0:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                poem = pending.pop(future)
+                line = None
+                try:
+                    line = json.dumps(future.result(), ensure_ascii=False)
+                    if skip is None or not skip(poem, line):
+                        f.write(line + '\n')
+                        f.flush()
+                except Exception as e:
+                    errors[poem.id_] = e
+                if stored is not None:
+                    stored(poem, line)
+    return errors
+
+
+def mirror_corpus(
+        corpus      : Corpus,
+        out_dir     : str,
+        max_workers : int                  = 8,
+        progress    : Union[Callable,None] = None,
+        authors     : Union[dict,None]     = None,
+        bodies      : bool                 = True,
+    ) -> dict:
+    '''
+    Download metadata of authors, sources and poems of the corpus together
+    with bodies of all the poems into [out_dir]/[corpus]/. Listings are
+    written once, bodies are appended to bodies.jsonl as they arrive, so an
+    interrupted run resumes with the poems not stored yet. Failed poems are
+    written to errors.jsonl and retried by the next run.
+
+    Arguments:
+        corpus      (Corpus)        : Corpus to mirror
+        out_dir     (str)           : Snapshot directory
+        max_workers (int)           : Max. number of concurrent requests; default: 8
+        progress    (Callable|None) : Called as progress(lang, done, total) after
+                                      each poem; default: None
+        authors     (dict|None)     : Filters of Corpus.get_authors() (country,
+                                      born_after...) limiting the authors whose
+                                      sources and poems are downloaded; default: None
+        bodies      (bool)          : Download bodies of the poems; default: True
+
+    Returns:
+        (dict) : Exceptions keyed by ids of poems that failed
+    '''
+    lang = corpus.metadata_['corpus']
+    path = os.path.join(out_dir, lang)
+    os.makedirs(path, exist_ok=True)
+
+    authors_path = os.path.join(path, 'authors.jsonl')
+    sources_path = os.path.join(path, 'sources.jsonl')
+    poems_path = os.path.join(path, 'poems.jsonl')
+    filters_path = os.path.join(path, 'filters.json')
+    filters = {k: v for k, v in (authors or dict()).items() if v is not None}
+    previous = dict()
+    if os.path.exists(filters_path):
+        with open(filters_path, encoding='utf-8') as f:
+            previous = json.load(f)
+    if previous != filters:
+        # listings of a run with other filters cannot be resumed
+        for listing in (authors_path, sources_path, poems_path, filters_path):
+            if os.path.exists(listing):
+                os.remove(listing)
+    if not os.path.exists(authors_path):
+        write_jsonl(authors_path, [a.metadata_ for a in corpus.get_authors(**filters)])
+    if not os.path.exists(sources_path):
+        ids = {a['id_'] for a in read_jsonl(authors_path)}
+        write_jsonl(sources_path, [
+            s.metadata_ for s in corpus.get_sources()
+            if len(filters) == 0 or s.metadata_.get('id_author') in ids
+        ])
+    if not os.path.exists(poems_path):
+        selected = corpus.content_.get('authors')
+        if selected is None or len(filters) > 0:
+            selected = corpus.get_authors(**filters)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            listings = executor.map(lambda a: a.get_poems(), selected)
+            write_jsonl(poems_path, [p.metadata_ for poems in listings for p in poems])
+    if len(filters) > 0 and not os.path.exists(filters_path):
+        with open(filters_path, 'w', encoding='utf-8') as f:
+            json.dump(filters, f)
+    if not bodies:
+        return dict()
+
+    bodies_path = os.path.join(path, 'bodies.jsonl')
+    done = _done_poems(bodies_path)
+    todo = [
+        Poem(base_url=corpus.base_url, transport=corpus.transport, metadata=p)
+        for p in read_jsonl(poems_path) if p['id_'] not in done
+    ]
+    total = len(done) + len(todo)
+
+    def stored(poem:Poem, line:Union[str,None]):
+        if line is not None:
+            done.add(poem.id_)
+        if progress is not None:
+            progress(lang, len(done), total)
+
+    errors = append_bodies(todo, bodies_path, max_workers, stored)
+
+    errors_path = os.path.join(path, 'errors.jsonl')
+    if len(errors) > 0:
+        write_jsonl(errors_path, [{'id_': k, 'error': str(v)} for k, v in errors.items()])
+    elif os.path.exists(errors_path):
+        os.remove(errors_path)
+    return errors
+
+
+def mirror(
+        out_dir     : str,
+        corpora     : Union[list,None]          = None,
+        base_url    : str                       = BASE_URL,
+        transport   : Union[BaseTransport,None] = None,
+        max_workers : int                       = 8,
+        progress    : Union[Callable,None]      = None,
+        authors     : Union[dict,None]          = None,
+        bodies      : bool                      = True,
+    ) -> dict:
+    '''
+    Download selected corpora (or the whole PoeTree collection) into a local
+    snapshot: corpora.jsonl in [out_dir] and one directory per corpus with
+    authors.jsonl, sources.jsonl, poems.jsonl and bodies.jsonl. Running it
+    again over the same directory resumes an interrupted download.
+
+    Arguments:
+        out_dir     (str)            : Snapshot directory
+        corpora     (list|None)      : ISO codes of corpora to download; default: None (all)
+        base_url    (str)            : API base URL (default: set in config.py)
+        transport   (Transport|None) : Transport to send requests with (default:
+                                       process-wide shared transport)
+        max_workers (int)            : Max. number of concurrent requests; default: 8
+        progress    (Callable|None)  : Called as progress(lang, done, total) after
+                                       each poem; default: None
+        authors     (dict|None)      : Filters of Corpus.get_authors() applied in
+                                       every corpus; default: None
+        bodies      (bool)           : Download bodies of the poems; default: True
+
+    Returns:
+        (dict) : Errors of each corpus as returned by mirror_corpus()
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    all_corpora = Poetree(base_url, transport).get_corpora()
+    write_jsonl(os.path.join(out_dir, 'corpora.jsonl'), [c.metadata_ for c in all_corpora])
+    errors = dict()
+    for corpus in all_corpora:
+        if corpora is None or corpus.metadata_['corpus'] in corpora:
+            errors[corpus.metadata_['corpus']] = mirror_corpus(
+                corpus, out_dir, max_workers, progress, authors, bodies
+            )
+    return errors
+
@@ -1,30 +1,39 @@
-from typing import Union
-import pandas as pd
+from typing import Union, TYPE_CHECKING
 from .config import BASE_URL
-from .glob import make_request, metadata
+from .transport import BaseTransport
+from .glob import Entity, make_request, metadata, construct_many
+if TYPE_CHECKING:
+    import pandas as pd
+    from .columnar import Tokens
+    from .syntax import Tree
 
 
-class Poem:
+class Poem(Entity):
     '''
     Class corresponding to a particular poem.
     '''
 
+    __slots__ = ('tokens_', 'tree_')
+
     def __init__(
             self, 
-            lang     : Union[None,str] = None, 
-            base_url : str             = BASE_URL, 
-            id_      : Union[None,int] = None,
-            metadata : dict            = None
+            lang      : Union[None,str]           = None, 
+            base_url  : str                       = BASE_URL, 
+            id_       : Union[None,int]           = None,
+            metadata  : dict                      = None,
+            transport : Union[BaseTransport,None] = None
         ):
         '''
         Store poem metadata (if initialized by Poetree instance) or get them 
         from API (if initialized directly). 
 
         Arguments:
-            lang     (str|None)  : ISO code of the corpus, required if initialized directly 
-            base_url (str)       : API base URL (default: set in config.py)
-            id_      (int|None)  : Id(DB) of the poem
-            metadata (dict|None) : Poem metadata passed when initialized by Poetree instance
+            lang      (str|None)       : ISO code of the corpus, required if initialized directly 
+            base_url  (str)            : API base URL (default: set in config.py)
+            id_       (int|None)       : Id(DB) of the poem
+            metadata  (dict|None)      : Poem metadata passed when initialized by Poetree instance
+            transport (Transport|None) : Transport to send requests with (default: 
+                                         process-wide shared transport)
         
         Raises:
             ValueError : If neither [metadata] nor [lang] is passed
@@ -34,7 +43,10 @@ class Poem:
             None    
         '''
         self.base_url = base_url
+        self.transport = transport
         self.content_ = list()
+        self.tokens_ = None
+        self.tree_ = None
 
         if metadata is not None:
             self.metadata_ = metadata
@@ -50,12 +62,60 @@ class Poem:
             )
         else:
             self._get_poem_metadata(lang, id_)
-        for k, v in self.metadata_.items(): setattr(self, k, v)
+        self._register('poem')
+
+
+    @classmethod
+    def from_ids(
+            cls,
+            lang        : str,
+            ids         : list,
+            base_url    : str                       = BASE_URL,
+            transport   : Union[BaseTransport,None] = None,
+            bodies      : bool                      = False,
+            max_workers : int                       = 8,
+        ) -> tuple:
+        '''
+        Create Poem instances of many poems at once, fetching their metadata
+        (and bodies) concurrently. With [bodies], metadata and body of each
+        poem come in a single request.
+
+        Arguments:
+            lang        (str)            : ISO code of the corpus
+            ids         (list)           : Ids(DB) of the poems
+            base_url    (str)            : API base URL (default: set in config.py)
+            transport   (Transport|None) : Transport to send requests with (default: 
+                                           process-wide shared transport)
+            bodies      (bool)           : Fetch bodies as well; default: False
+            max_workers (int)            : Max. number of concurrent requests; default: 8
+
+        Returns:
+            (tuple) : List of Poem instances in the order of [ids] (None where
+                      a poem failed) and dict of exceptions keyed by the ids
+                      that failed
+        '''
+        def build(id_:Union[int,str]) -> 'Poem':
+            if not bodies:
+                return cls(lang, base_url, id_, transport=transport)
+            response = make_request(
+                base_url, 'poem', transport, **{'corpus': lang, 'id_poem': id_}
+            )
+            poem = cls(
+                base_url  = base_url, 
+                metadata  = {**{k: v for k, v in response.items() if k != 'body'}, 'corpus': lang},
+                transport = transport,
+            )
+            if len(poem.content_) == 0:
+                poem.content_[:] = response['body']
+            return poem
+
+        return construct_many(build, list(ids), max_workers)
 
 
     def _get_poem_metadata(self, lang: str, id_:Union[int,str]):
         '''
-        Get metadata on poem and store them in self.metadata_
+        Get metadata on poem (unless loaded already through the same 
+        transport) and store them in self.metadata_
         
         Arguments:
             lang (str)     : ISO code of the corpus
@@ -64,12 +124,16 @@ class Poem:
         Returns:
             None      
         '''
-        self.metadata_ = make_request(
+        if self._resolve('poem', lang, 'id_', id_):
+            return
+        response = make_request(
             self.base_url, 
             'poem',
+            self.transport,
             **{'corpus': lang, 'id_poem': id_, 'lines': 0}
         )
-        self.metadata_['corpus'] = lang
+        # the response may be shared with concurrent callers
+        self.metadata_ = {**response, 'corpus': lang}
 
 
     def get_body(self, **kwargs):
@@ -87,12 +151,50 @@ class Poem:
             response = make_request(
                 self.base_url, 
                 'poem',
+                self.transport,
                 **{'corpus': self.corpus, 'id_poem': self.id_, **kwargs}
             )
-            self.content_ = response['body']
+            self.content_[:] = response['body']
         return self.content_
 
 
+    def tokens(self, **kwargs) -> 'Tokens':
+        '''
+        Get body of the poem (if not fetched yet) and return it in columnar
+        form: token attributes as parallel NumPy arrays, string attributes
+        dictionary-encoded, lines/stanzas/sentences as offset arrays. The
+        result is cached in self.tokens_.
+
+        Arguments:
+            None
+                
+        Returns:
+            (Tokens) : Columnar representation of the body
+        '''
+        if self.tokens_ is None:
+            from .columnar import Tokens
+            self.tokens_ = Tokens.from_body(self.get_body(**kwargs))
+        return self.tokens_
+
+
+    def tree(self, **kwargs) -> 'Tree':
+        '''
+        Get body of the poem (if not fetched yet) and return dependency
+        trees of its sentences as parent and child index arrays over the
+        tokens of tokens(). The result is cached in self.tree_.
+
+        Arguments:
+            None
+                
+        Returns:
+            (Tree) : Dependency trees of the body
+        '''
+        if self.tree_ is None:
+            from .syntax import Tree
+            self.tree_ = Tree.from_tokens(self.tokens(**kwargs))
+        return self.tree_
+
+
     def get_all(self):
         '''
         Get body of the poem (if not fetched yet), store it in self.content_
@@ -116,7 +218,7 @@ class Poem:
             output  : str             = 'list', 
             sortby  : Union[str,list] = None, 
             reverse : bool            = False
-        ) -> Union[list, pd.DataFrame, None]:
+        ) -> Union[list, 'pd.DataFrame', None]:
         '''
         Returns target metadata either as a formatted table (tabular=True)
         or as a list as received from API (tabular=False). The list may be
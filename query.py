@@ -0,0 +1,150 @@
+import bisect
+from typing import Union, Any
+
+HASH_KEYS = ('id_', 'wiki', 'viaf', 'country', 'id_author', 'id_source', 'corpus')
+RANGE_KEYS = ('born', 'died', 'published')
+ALIASES = {
+    'born_after'       : ('born', 'after'),
+    'born_before'      : ('born', 'before'),
+    'died_after'       : ('died', 'after'),
+    'died_before'      : ('died', 'before'),
+    'published_after'  : ('published', 'after'),
+    'published_before' : ('published', 'before'),
+}
+
+
+class Index:
+    '''
+    Client-side index over already fetched metadata (Author, Source or Poem
+    instances, or plain metadata dicts). Answers the same filters as the API
+    (country, born_after, published_before, id_author...) without sending a
+    request: identifier fields are looked up in hash indexes, year fields
+    by binary search in sorted arrays. Beyond the API, any combination of
+    filters may be used, every hashed field accepts a list of values and
+    every year field accepts [field]_after / [field]_before bounds. Indexes
+    are built lazily, on first use of each field.
+    '''
+
+    def __init__(
+            self,
+            items      : list,
+            hash_keys  : tuple = HASH_KEYS,
+            range_keys : tuple = RANGE_KEYS,
+        ):
+        '''
+        Arguments:
+            items      (list)  : Instances (with metadata_) or metadata dicts
+            hash_keys  (tuple) : Fields filtered by equality
+            range_keys (tuple) : Fields filtered by range (years)
+        '''
+        self.items = items
+        self.records = [getattr(i, 'metadata_', i) for i in items]
+        self.hash_keys = hash_keys
+        self.range_keys = range_keys
+        self._hash = dict()
+        self._sorted = dict()
+
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+    def equal(self, key:str, values:Union[Any,list]) -> set:
+        '''
+        Positions of items whose [key] equals one of [values]. A string
+        holding comma-separated values (country="pt,br") counts as a list.
+
+        Arguments:
+            key    (str)      : Field name
+            values (Any|list) : Accepted value(s)
+
+        Returns:
+            (set) : Positions in self.items
+        '''
+        if key not in self._hash:
+            index = dict()
+            for i, r in enumerate(self.records):
+                if r.get(key) is not None:
+                    index.setdefault(str(r[key]), list()).append(i)
+            self._hash[key] = index
+        if not isinstance(values, (list, tuple, set)):
+            values = str(values).split(',')
+        result = set()
+        for v in values:
+            result.update(self._hash[key].get(str(v), ()))
+        return result
+
+
+    def between(self, key:str, low:Union[int,None]=None, high:Union[int,None]=None) -> set:
+        '''
+        Positions of items whose [key] lies within [low, high] (both
+        inclusive, None means unbounded). Items missing the value never match.
+
+        Arguments:
+            key  (str)      : Field name
+            low  (int|None) : Lower bound
+            high (int|None) : Upper bound
+
+        Returns:
+            (set) : Positions in self.items
+        '''
+        if key not in self._sorted:
+            pairs = sorted(
+                (r[key], i) for i, r in enumerate(self.records) if r.get(key) is not None
+            )
+            self._sorted[key] = ([p[0] for p in pairs], [p[1] for p in pairs])
+        values, positions = self._sorted[key]
+        start = 0 if low is None else bisect.bisect_left(values, int(low))
+        end = len(values) if high is None else bisect.bisect_right(values, int(high))
+        return set(positions[start:end])
+
+
+    def positions(self, **kwargs) -> Union[set,None]:
+        '''
+        Positions of items matching all filters (None if no filter is given)
+
+        Raises:
+            ValueError : If a filter refers to a field that is not indexed
+        '''
+        result = None
+        ranges = dict()
+        for name, value in kwargs.items():
+            if value is None:
+                continue
+            if name in ALIASES:
+                key, bound = ALIASES[name]
+            elif name.endswith(('_after', '_before')) and name.rsplit('_', 1)[0] in self.range_keys:
+                key, bound = name.rsplit('_', 1)
+            elif name in self.hash_keys:
+                found = self.equal(name, value)
+                result = found if result is None else result & found
+                continue
+            else:
+                raise ValueError(f'Cannot filter by [{name}]')
+            ranges.setdefault(key, [None, None])[bound == 'before'] = value
+        for key, (low, high) in ranges.items():
+            found = self.between(key, low, high)
+            result = found if result is None else result & found
+        return result
+
+
+    def filter(self, **kwargs) -> list:
+        '''
+        Items matching all filters, in their original order, e.g.
+        filter(country='cz,sk', born_after=1800, died_before=1900)
+
+        Returns:
+            (list) : Matching items
+        '''
+        positions = self.positions(**kwargs)
+        if positions is None:
+            return list(self.items)
+        return [self.items[i] for i in sorted(positions)]
+
+
+    def get(self, key:str, value:Any) -> Any:
+        '''
+        First item whose [key] equals [value] (None if there is none)
+        '''
+        found = self.equal(key, [value])
+        return self.items[min(found)] if len(found) > 0 else None
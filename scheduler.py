@@ -0,0 +1,303 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Union, Any
+
+PRIORITIES = {'poem': 1}
+
+
+def retry_after(headers:dict) -> Union[float,None]:
+    '''
+    Parse the Retry-After header, given either in seconds or as an HTTP
+    date.
+
+    Arguments:
+        headers (dict) : Response headers
+
+    Returns:
+        (float|None) : Seconds to wait (None if the header is missing or invalid)
+    '''
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Scheduler:
+    '''
+    Admission control for all requests sent through a transport. Combines
+    a token bucket (optional fixed rate limit) with an adaptive concurrency
+    limit: the limit grows by one per window of successful requests while
+    it is fully used (additive increase) and shrinks on 429/5xx responses
+    and connection errors (halved) or when latency grows well above the
+    lowest latency seen (by 10 %). Retry-After pauses all requests. Waiting
+    requests are admitted by priority, then in order of arrival: metadata
+    requests (priority 0) go before downloads of poem bodies (priority 1).
+    Latency is tracked separately for each kind of request, as a body
+    download is naturally slower than a list of authors.
+    '''
+
+    def __init__(
+            self,
+            rate              : Union[float,None] = None,
+            burst             : Union[int,None]   = None,
+            min_concurrency   : int               = 1,
+            max_concurrency   : int               = 10,
+            concurrency       : Union[int,None]   = None,
+            latency_tolerance : float             = 2.0,
+            priorities        : Union[dict,None]  = None,
+        ):
+        '''
+        Arguments:
+            rate              (float|None) : Max. number of requests per second;
+                                             default: None (unlimited)
+            burst             (int|None)   : Capacity of the token bucket;
+                                             default: max(1, rate)
+            min_concurrency   (int)        : Lower bound of the concurrency limit; default: 1
+            max_concurrency   (int)        : Upper bound of the concurrency limit; default: 10
+            concurrency       (int|None)   : Initial concurrency limit;
+                                             default: None (max_concurrency)
+            latency_tolerance (float)      : Back off when the average latency exceeds
+                                             the lowest one this many times; default: 2.0
+            priorities        (dict|None)  : Priority of API methods (lower goes first,
+                                             unlisted methods have 0); default: {'poem': 1}
+        '''
+        if min_concurrency < 1 or max_concurrency < min_concurrency:
+            raise ValueError('Invalid concurrency bounds')
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate or 1)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(concurrency if concurrency is not None else max_concurrency)
+        self.latency_tolerance = latency_tolerance
+        self.priorities = PRIORITIES if priorities is None else priorities
+        self.active = 0
+        self.latencies = dict()
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._next_decrease = 0.0
+        self._queue = list()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+
+    def priority(self, url:str, params:dict) -> int:
+        '''
+        Priority of a request. Requests of a poem without its body
+        (lines=0) count as metadata.
+
+        Arguments:
+            url    (str)  : Full URL of the API method
+            params (dict) : URL parameters
+
+        Returns:
+            (int) : Priority, lower goes first
+        '''
+        endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+        if endpoint == 'poem' and str(params.get('lines')) == '0':
+            return 0
+        return self.priorities.get(endpoint, 0)
+
+
+    def acquire(self, priority:int=0) -> float:
+        '''
+        Wait until a request may be sent.
+
+        Arguments:
+            priority (int) : Priority of the request, lower goes first; default: 0
+
+        Returns:
+            (float) : Start time, to be passed to release()
+        '''
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    delay = None
+                    if self._queue[0] == entry:
+                        delay = self._grant(time.monotonic())
+                        if delay == 0:
+                            heapq.heappop(self._queue)
+                            self._cond.notify_all()
+                            return time.monotonic()
+                    self._cond.wait(delay)
+            except BaseException:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+                raise
+
+
+    def release(
+            self,
+            started     : float,
+            key         : Any               = None,
+            overloaded  : bool              = False,
+            retry_after : Union[float,None] = None,
+        ):
+        '''
+        Report a finished request and adapt the concurrency limit.
+
+        Arguments:
+            started     (float)      : Value returned by acquire()
+            key         (Any)        : Kind of the request (e.g. URL and priority),
+                                       latencies are compared within a kind
+            overloaded  (bool)       : The server refused the request or failed
+                                       (429, 5xx, connection error); default: False
+            retry_after (float|None) : Seconds to pause all requests for
+        '''
+        with self._cond:
+            self._update(time.monotonic(), started, key, overloaded, retry_after)
+            self._cond.notify_all()
+
+
+    def _grant(self, now:float) -> Union[float,None]:
+        '''
+        Admit a request if the limits allow it. Returns 0 if admitted,
+        otherwise seconds until it may be admitted (None: until a request
+        finishes).
+        '''
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.active >= int(self.limit):
+            return None
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        self.active += 1
+        return 0
+
+
+    def _update(
+            self,
+            now         : float,
+            started     : float,
+            key         : Any,
+            overloaded  : bool,
+            retry_after : Union[float,None],
+        ):
+        '''
+        AIMD update of the concurrency limit after a finished request
+        '''
+        saturated = self.active >= int(self.limit)
+        self.active -= 1
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        if overloaded:
+            self._decrease(now, 0.5, now - started)
+            return
+        sample = now - started
+        if key not in self.latencies:
+            self.latencies[key] = (sample, sample)
+        latency, baseline = self.latencies[key]
+        latency = 0.8 * latency + 0.2 * sample
+        if latency < baseline:
+            baseline = latency
+        else:
+            # let the baseline follow a lasting change of the server's speed
+            baseline += 0.01 * (latency - baseline)
+        self.latencies[key] = (latency, baseline)
+        if latency > self.latency_tolerance * max(baseline, 0.001):
+            self._decrease(now, 0.9, latency)
+        elif saturated:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+
+    def _decrease(self, now:float, factor:float, latency:float):
+        '''
+        Shrink the limit, at most once per latency of a request, so that
+        one burst of failures is counted once
+        '''
+        if now < self._next_decrease:
+            return
+        self.limit = max(self.min_concurrency, self.limit * factor)
+        self._next_decrease = now + max(latency, 0.1)
+
+
+class AsyncScheduler(Scheduler):
+    '''
+    Scheduler for requests sent by tasks of one event loop
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._changed = None
+
+
+    def _notify(self):
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+
+    async def acquire(self, priority:int=0) -> float:
+        '''
+        Wait until a request may be sent.
+
+        Arguments:
+            priority (int) : Priority of the request, lower goes first; default: 0
+
+        Returns:
+            (float) : Start time, to be passed to release()
+        '''
+        import asyncio  # on use only, synchronous clients never need it
+        entry = (priority, next(self._seq))
+        heapq.heappush(self._queue, entry)
+        try:
+            while True:
+                delay = None
+                if self._queue[0] == entry:
+                    delay = self._grant(time.monotonic())
+                    if delay == 0:
+                        heapq.heappop(self._queue)
+                        self._notify()
+                        return time.monotonic()
+                if self._changed is None:
+                    self._changed = asyncio.Event()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._notify()
+            raise
+
+
+    def release(
+            self,
+            started     : float,
+            key         : Any               = None,
+            overloaded  : bool              = False,
+            retry_after : Union[float,None] = None,
+        ):
+        '''
+        Report a finished request and adapt the concurrency limit.
+
+        Arguments:
+            started     (float)      : Value returned by acquire()
+            key         (Any)        : Kind of the request (e.g. URL and priority),
+                                       latencies are compared within a kind
+            overloaded  (bool)       : The server refused the request or failed
+                                       (429, 5xx, connection error); default: False
+            retry_after (float|None) : Seconds to pause all requests for
+        '''
+        self._update(time.monotonic(), started, key, overloaded, retry_after)
+        self._notify()
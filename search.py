@@ -0,0 +1,358 @@
+import json
+import os
+import re
+from array import array
+from typing import Union, Iterator
+import numpy as np
+from .decode import loads
+from .snapshot import _ID
+
+# token attributes indexed as terms [field]:[value]; feats are split into
+# one feat:[key]=[value] term per feature
+FIELDS = ('form', 'lemma', 'upos')
+# positions are encoded as poem << 32 | line << 16 | token
+LINE_BITS = 16
+TOKEN_BITS = 16
+MAX_POSITION = (1 << TOKEN_BITS) - 1
+
+
+def _key(poem:Union[int,np.ndarray], line:Union[int,np.ndarray], token:Union[int,np.ndarray]):
+    return (poem << (LINE_BITS + TOKEN_BITS)) | (line << TOKEN_BITS) | token
+
+
+def _encode(values:np.ndarray) -> tuple:
+    '''
+    Encode non-negative integers as LEB128 varints (7 bits per byte, high
+    bit set on all but the last byte of a value). Returns the bytes and
+    the end offset of each value.
+    '''
+    values = values.astype(np.uint64)
+    n_bytes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        n_bytes += rest > 0
+        rest >>= np.uint64(7)
+    ends = np.cumsum(n_bytes)
+    starts = ends - n_bytes
+    out = np.empty(int(ends[-1]) if len(ends) > 0 else 0, dtype=np.uint8)
+    for k in range(int(n_bytes.max(initial=0))):
+        has = n_bytes > k
+        byte = (values[has] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (n_bytes[has] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[has] + k] = (byte | more).astype(np.uint8)
+    return out, ends
+
+
+def _decode(data:np.ndarray) -> np.ndarray:
+    '''
+    Decode a sequence of LEB128 varints (see _encode)
+    '''
+    if len(data) == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shift = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7f).astype(np.uint64) << (7 * shift).astype(np.uint64)
+    return np.add.reduceat(parts, starts).astype(np.int64)
+
+
+def iter_bodies(source:Union[str,list]) -> Iterator:
+    '''
+    Yield (poem id, body) pairs from Poem instances (fetching bodies not
+    fetched yet) or from bodies.jsonl of a snapshot, where the last
+    occurrence of a poem is the current one.
+
+    Arguments:
+        source (str|list) : Path of bodies.jsonl or list of Poem instances
+
+    Returns:
+        (Iterator) : Pairs of poem id and body
+    '''
+    if not isinstance(source, str):
+        for poem in source:
+            yield poem.id_, poem.get_body()
+        return
+    offsets = dict()
+    position = 0
+    with open(source, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            match = _ID.match(line)
+            offsets[int(match.group(1)) if match else loads(line)['id_']] = position
+            position += len(line)
+        for id_ in sorted(offsets):
+            f.seek(offsets[id_])
+            yield id_, loads(f.readline())['body']
+
+
+def _terms(word:dict) -> Iterator:
+    for field in FIELDS:
+        value = word.get(field)
+        if value:
+            yield f'{field}:{value}'
+    feats = word.get('feats')
+    if feats and feats != '_':
+        for feat in feats.split('|'):
+            yield f'feat:{feat}'
+
+
+def build_search_index(out_dir:str, source:Union[str,list]) -> 'SearchIndex':
+    '''
+    Build an inverted index over poem bodies and store it in [out_dir]:
+    every form, lemma, UPOS and feature (feat:Case=Nom) of a token maps to
+    the sorted list of its (poem, line, token) positions, delta-encoded
+    as varints in postings.bin and addressed through offsets.npy by the
+    position of the term in terms.txt. Lines and tokens are counted from
+    0 within poem and line respectively.
+
+    Arguments:
+        out_dir (str)      : Directory of the index
+        source  (str|list) : Path of bodies.jsonl of a snapshot or list of
+                             Poem instances
+
+    Raises:
+        ValueError : If a poem has more lines or a line more tokens than
+                     positions can encode (65536)
+
+    Returns:
+        (SearchIndex) : The index opened for queries
+    '''
+    term_ids, term_list = dict(), list()
+    terms, keys = array('i'), array('q')
+    poems = array('q')
+    n_tokens = 0
+    for id_, body in iter_bodies(source):
+        poems.append(id_)
+        if len(body) > MAX_POSITION + 1:
+            raise ValueError(f'Poem {id_} has more than {MAX_POSITION + 1} lines')
+        for i, line in enumerate(body):
+            words = line.get('words') or list()
+            if len(words) > MAX_POSITION + 1:
+                raise ValueError(f'Line {i} of poem {id_} has more than {MAX_POSITION + 1} tokens')
+            line_key = _key(id_, i, 0)
+            for j, word in enumerate(words):
+                found = list()
+                for term in _terms(word):
+                    t = term_ids.get(term)
+                    if t is None:
+                        t = term_ids[term] = len(term_list)
+                        term_list.append(term)
+                    found.append(t)
+                terms.extend(found)
+                keys.extend([line_key | j] * len(found))
+            n_tokens += len(words)
+
+    # renumber terms in sorted order, then sort postings by term and position
+    order = sorted(range(len(term_list)), key=term_list.__getitem__)
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    terms = rank[np.array(terms, dtype=np.int32)]
+    keys = np.array(keys, dtype=np.int64)
+    by = np.lexsort((keys, terms))
+    terms, keys = terms[by], keys[by]
+    # duplicate positions (a feature repeated within feats) are dropped
+    unique = np.ones(len(keys), dtype=bool)
+    unique[1:] = (terms[1:] != terms[:-1]) | (keys[1:] != keys[:-1])
+    terms, keys = terms[unique], keys[unique]
+
+    # every term has postings, so starts[:-1] are first postings of terms
+    starts = np.searchsorted(terms, np.arange(len(order) + 1))
+    deltas = np.diff(keys, prepend=0)
+    deltas[starts[:-1]] = keys[starts[:-1]]
+    data, ends = _encode(deltas)
+    offsets = np.concatenate(([0], ends))[starts].astype(np.int64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'postings.bin'), 'wb') as f:
+        f.write(data.tobytes())
+    np.save(os.path.join(out_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(out_dir, 'poems.npy'), np.unique(np.array(poems, dtype=np.int64)))
+    with open(os.path.join(out_dir, 'terms.txt'), 'w', encoding='utf-8') as f:
+        for i in order:
+            f.write(term_list[i] + '\n')
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'poems': len(poems), 'tokens': n_tokens, 'terms': len(order), 'postings': len(keys)}, f)
+    return SearchIndex(out_dir)
+
+
+_QUERY_TOKEN = re.compile(r'\s*(\(|\)|"[^"]*"|[^\s()"]+)')
+
+
+class SearchIndex:
+    '''
+    Inverted index over poem bodies written by build_search_index().
+    Postings are memory-mapped and decoded per term on demand.
+
+    Token patterns join terms of one token with '+'
+    (lemma:být+upos:AUX+feat:Tense=Past); a phrase is a quoted sequence of
+    token patterns on consecutive positions of a line ("upos:ADJ lemma:noc").
+    Queries combine patterns and phrases with AND (also implied between
+    adjacent operands), OR, NOT and parentheses and select poems:
+
+        index = SearchIndex('cs-index')
+        index.search('lemma:noc AND ("upos:ADJ lemma:noc" OR NOT lemma:den)')
+        index.find('"upos:ADJ lemma:noc"')   # (poem, line, token) positions
+    '''
+
+    def __init__(self, path:str):
+        '''
+        Arguments:
+            path (str) : Directory of the index
+
+        Raises:
+            FileNotFoundError : If [path] holds no index
+        '''
+        if not os.path.exists(os.path.join(path, 'terms.txt')):
+            raise FileNotFoundError(f'No search index found in {path}')
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, 'terms.txt'), encoding='utf-8') as f:
+            self.terms = {line[:-1]: i for i, line in enumerate(f)}
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self.poem_ids = np.load(os.path.join(path, 'poems.npy'), mmap_mode='r')
+        postings_path = os.path.join(path, 'postings.bin')
+        if os.path.getsize(postings_path) > 0:
+            self.postings = np.memmap(postings_path, dtype=np.uint8, mode='r')
+        else:
+            self.postings = np.empty(0, dtype=np.uint8)
+
+
+    def __contains__(self, term:str) -> bool:
+        return term in self.terms
+
+
+    def vocabulary(self, field:str) -> list:
+        '''
+        Indexed values of a field ('form', 'lemma', 'upos' or 'feat')
+        '''
+        prefix = field + ':'
+        return [t[len(prefix):] for t in self.terms if t.startswith(prefix)]
+
+
+    def postings_of(self, term:str) -> np.ndarray:
+        '''
+        Sorted encoded positions (poem << 32 | line << 16 | token) of a term
+
+        Arguments:
+            term (str) : [field]:[value], e.g. 'lemma:noc' or 'feat:Case=Nom'
+
+        Returns:
+            (np.ndarray) : int64 array, empty if the term does not occur
+        '''
+        i = self.terms.get(term)
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        data = np.asarray(self.postings[self.offsets[i]:self.offsets[i + 1]])
+        return np.cumsum(_decode(data))
+
+
+    def _pattern(self, pattern:str) -> np.ndarray:
+        keys = None
+        for term in pattern.split('+'):
+            if ':' not in term:
+                raise ValueError(f'Invalid term: {term} (expected [field]:[value])')
+            postings = self.postings_of(term)
+            keys = postings if keys is None else np.intersect1d(keys, postings, assume_unique=True)
+            if len(keys) == 0:
+                break
+        return keys
+
+
+    def _phrase(self, phrase:str) -> np.ndarray:
+        patterns = phrase.split()
+        if len(patterns) == 0:
+            raise ValueError('Empty phrase')
+        keys = self._pattern(patterns[0])
+        for i, pattern in enumerate(patterns[1:], 1):
+            if len(keys) == 0:
+                break
+            following = self._pattern(pattern)
+            following = following[(following & MAX_POSITION) >= i]
+            keys = np.intersect1d(keys, following - i, assume_unique=True)
+        return keys
+
+
+    def find(self, query:str) -> np.ndarray:
+        '''
+        Positions of a token pattern or phrase (of its first token)
+
+        Arguments:
+            query (str) : Token pattern or quoted phrase
+
+        Returns:
+            (np.ndarray) : Array of shape (n, 3): poem id, line, token
+        '''
+        query = query.strip()
+        if query.startswith('"') and query.endswith('"') and len(query) > 1:
+            keys = self._phrase(query[1:-1])
+        else:
+            keys = self._pattern(query)
+        return np.stack((
+            keys >> (LINE_BITS + TOKEN_BITS),
+            (keys >> TOKEN_BITS) & ((1 << LINE_BITS) - 1),
+            keys & MAX_POSITION,
+        ), axis=1)
+
+
+    def search(self, query:str) -> np.ndarray:
+        '''
+        Ids of poems matching a boolean query
+
+        Arguments:
+            query (str) : Query (see SearchIndex)
+
+        Raises:
+            ValueError : If the query is malformed
+
+        Returns:
+            (np.ndarray) : Sorted poem ids
+        '''
+        if query.count('"') % 2 != 0:
+            raise ValueError(f'Unbalanced quotes in query: {query}')
+        tokens = _QUERY_TOKEN.findall(query)
+        result, i = self._or(tokens, 0)
+        if i != len(tokens):
+            raise ValueError(f'Unexpected "{tokens[i]}" in query: {query}')
+        return result
+
+
+    def _or(self, tokens:list, i:int) -> tuple:
+        result, i = self._and(tokens, i)
+        while i < len(tokens) and tokens[i] == 'OR':
+            other, i = self._and(tokens, i + 1)
+            result = np.union1d(result, other)
+        return result, i
+
+
+    def _and(self, tokens:list, i:int) -> tuple:
+        result, i = self._not(tokens, i)
+        while i < len(tokens) and tokens[i] not in ('OR', ')'):
+            if tokens[i] == 'AND':
+                i += 1
+            other, i = self._not(tokens, i)
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result, i
+
+
+    def _not(self, tokens:list, i:int) -> tuple:
+        if i < len(tokens) and tokens[i] == 'NOT':
+            result, i = self._not(tokens, i + 1)
+            return np.setdiff1d(self.poem_ids, result, assume_unique=True), i
+        return self._operand(tokens, i)
+
+
+    def _operand(self, tokens:list, i:int) -> tuple:
+        if i >= len(tokens):
+            raise ValueError('Unexpected end of query')
+        token = tokens[i]
+        if token == '(':
+            result, i = self._or(tokens, i + 1)
+            if i >= len(tokens) or tokens[i] != ')':
+                raise ValueError('Missing ")" in query')
+            return result, i + 1
+        if token in (')', 'AND', 'OR'):
+            raise ValueError(f'Unexpected "{token}" in query')
+        keys = self._phrase(token[1:-1]) if token.startswith('"') else self._pattern(token)
+        return np.unique(keys >> (LINE_BITS + TOKEN_BITS)), i + 1
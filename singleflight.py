@@ -0,0 +1,95 @@
+import threading
+from typing import Any, Callable, Hashable, Awaitable
+
+
+class _Call:
+    '''
+    Outstanding call shared by all callers with the same key
+    '''
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''
+    Thread-safe in-flight deduplication: concurrent calls with the same key
+    wait for the first one and share its result (or exception) instead of
+    each doing the work. Nothing is remembered once the call finishes.
+    '''
+
+    def __init__(self):
+        self._calls = dict()
+        self._lock = threading.Lock()
+
+
+    def do(self, key:Hashable, fn:Callable) -> Any:
+        '''
+        Call [fn] unless a call with the same key is in flight, in which
+        case wait for it and return its result.
+
+        Arguments:
+            key (Hashable) : Call identity
+            fn  (Callable) : Function without arguments doing the work
+
+        Returns:
+            (Any) : Result of [fn], shared by all concurrent callers
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    '''
+    Asyncio counterpart of SingleFlight: concurrent tasks awaiting a call
+    with the same key share one outstanding coroutine.
+    '''
+
+    def __init__(self):
+        self._calls = dict()
+
+
+    async def do(self, key:Hashable, fn:Callable[[], Awaitable]) -> Any:
+        '''
+        Await [fn]() unless a call with the same key is in flight, in which
+        case wait for it and return its result.
+
+        Arguments:
+            key (Hashable) : Call identity
+            fn  (Callable) : Coroutine function without arguments doing the work
+
+        Returns:
+            (Any) : Result of [fn], shared by all concurrent callers
+        '''
+        import asyncio  # on use only, synchronous clients never need it
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._calls[key] = asyncio.ensure_future(fn())
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._calls.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._calls.pop(key, None))
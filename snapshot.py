@@ -0,0 +1,271 @@
+import json
+import mmap
+import os
+import re
+import threading
+from array import array
+from typing import Union
+from .query import Index
+from .identity import IdentityMap
+from .hooks import Hooks
+
+
+class Snapshot:
+    '''
+    Local snapshot (as written by mirror.mirror) serving the same endpoints
+    as PoeTree API. Listings are loaded lazily per corpus and indexed. Poem
+    bodies stay on disk: bodies.jsonl is memory-mapped together with an
+    index of byte offsets addressed directly by poem id. Instances created
+    over a file:// URL without a transport share the identity map and hooks
+    of the snapshot instead of those of the HTTP default transport.
+    '''
+
+    ENDPOINTS = ('corpora', 'corpus', 'authors', 'author', 'sources', 'source', 'poems', 'poem')
+
+    def __init__(self, path:str):
+        '''
+        Arguments:
+            path (str) : Snapshot directory
+
+        Raises:
+            FileNotFoundError : If [path] holds no snapshot
+        '''
+        if not os.path.exists(os.path.join(path, 'corpora.jsonl')):
+            raise FileNotFoundError(f'No PoeTree snapshot found in {path}')
+        self.path = path
+        self._lock = threading.Lock()
+        self._corpora_records = None
+        self._listings = dict()
+        self._bodies = dict()
+        self.identity = IdentityMap()
+        self.hooks = Hooks()
+
+
+    def request(self, endpoint:str, **kwargs) -> Union[dict,list]:
+        '''
+        Answer API request from the snapshot.
+
+        Arguments:
+            endpoint (str)  : API method name
+            **kwargs (dict) : URL parameters
+
+        Raises:
+            ValueError : If [endpoint] is not supported
+            Exception  : If requested item is not in the snapshot
+
+        Returns:
+            (dict|list) : Response as returned by PoeTree API
+        '''
+        if endpoint not in self.ENDPOINTS:
+            raise ValueError(f'Unsupported endpoint: {endpoint}')
+        return getattr(self, f'_{endpoint}')(**kwargs)
+
+
+    def _read(self, *path:str) -> list:
+        with open(os.path.join(self.path, *path), encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+    def _listing(self, corpus:str, target:str) -> Index:
+        '''
+        Load and index listing of [target] in [corpus] on first use
+        '''
+        with self._lock:
+            if (corpus, target) not in self._listings:
+                self._listings[(corpus, target)] = Index(
+                    self._read(corpus, f'{target}.jsonl')
+                )
+            return self._listings[(corpus, target)]
+
+
+    def _select(self, listing:Index, **kwargs) -> list:
+        '''
+        Copies of records matching filters (callers may modify them)
+        '''
+        with self._lock:
+            return [dict(r) for r in listing.filter(**kwargs)]
+
+
+    def _one(self, listing:Index, key:str, value:Union[int,str], what:str) -> dict:
+        with self._lock:
+            found = listing.get(key, value)
+        if found is None:
+            raise Exception(f'{what} with {key}={value} not found in snapshot')
+        return dict(found)
+
+
+    def _corpora(self) -> list:
+        if self._corpora_records is None:
+            self._corpora_records = self._read('corpora.jsonl')
+        return [dict(c) for c in self._corpora_records]
+
+
+    def _corpus(self, corpus:str) -> dict:
+        for c in self._corpora():
+            if c['corpus'] == corpus:
+                return c
+        raise Exception(f'Corpus {corpus} not found in snapshot')
+
+
+    def _authors(
+            self,
+            corpus      : str,
+            country     : Union[str,None] = None,
+            born_after  : Union[int,None] = None,
+            born_before : Union[int,None] = None,
+            died_after  : Union[int,None] = None,
+            died_before : Union[int,None] = None,
+        ) -> list:
+        return self._select(
+            self._listing(corpus, 'authors'),
+            country     = country,
+            born_after  = born_after,
+            born_before = born_before,
+            died_after  = died_after,
+            died_before = died_before,
+        )
+
+
+    def _author(self, corpus:str, id_author=None, wiki=None, viaf=None) -> dict:
+        listing = self._listing(corpus, 'authors')
+        for key, value in (('id_', id_author), ('wiki', wiki), ('viaf', viaf)):
+            if value is not None:
+                return self._one(listing, key, value, 'Author')
+        raise ValueError('One of [id_author,wiki,viaf] is required')
+
+
+    def _sources(
+            self,
+            corpus           : str,
+            id_author        : Union[int,None] = None,
+            wiki             : Union[str,None] = None,
+            viaf             : Union[str,None] = None,
+            published_after  : Union[int,None] = None,
+            published_before : Union[int,None] = None,
+        ) -> list:
+        listing = self._listing(corpus, 'sources')
+        if id_author is None and (wiki is not None or viaf is not None):
+            id_author = self._author(corpus, wiki=wiki, viaf=viaf)['id_']
+        return self._select(
+            listing,
+            id_author        = id_author,
+            published_after  = published_after,
+            published_before = published_before,
+        )
+
+
+    def _source(self, corpus:str, id_source=None, id_poem=None) -> dict:
+        listing = self._listing(corpus, 'sources')
+        if id_source is None and id_poem is not None:
+            id_source = self._poem(corpus, id_poem, lines=0).get('id_source')
+        if id_source is None:
+            raise ValueError('One of [id_source,id_poem] is required')
+        return self._one(listing, 'id_', id_source, 'Source')
+
+
+    def _poems(self, corpus:str, id_author=None, id_source=None) -> list:
+        return self._select(
+            self._listing(corpus, 'poems'), id_author=id_author, id_source=id_source
+        )
+
+
+    def _poem(self, corpus:str, id_poem:Union[int,str], lines:Union[int,str]=1) -> dict:
+        if str(lines) in ('0', 'False'):
+            # metadata only, available without bodies
+            return self._one(self._listing(corpus, 'poems'), 'id_', id_poem, 'Poem')
+        bodies, index = self._body_index(corpus)
+        id_poem = int(id_poem)
+        offset = index[id_poem] if 0 <= id_poem < len(index) else -1
+        if offset < 0:
+            raise Exception(f'Poem with id_poem={id_poem} not found in snapshot')
+        return json.loads(bodies[offset:bodies.find(b'\n', offset)])
+
+
+    def _body_index(self, corpus:str) -> tuple:
+        '''
+        Memory-map bodies.jsonl of [corpus] and its offset index (bodies.idx,
+        int64 offsets addressed by poem id, -1 where missing). The index is
+        (re)built if missing or older than bodies.jsonl; when a poem occurs
+        more than once the last occurrence wins. Opened only when a body is
+        requested, metadata of poems are served from poems.jsonl.
+        '''
+        with self._lock:
+            if corpus not in self._bodies:
+                bodies_path = os.path.join(self.path, corpus, 'bodies.jsonl')
+                index_path = os.path.join(self.path, corpus, 'bodies.idx')
+                if not os.path.exists(bodies_path):
+                    raise Exception(
+                        f'Bodies of corpus {corpus} not found in snapshot (downloaded without bodies)'
+                    )
+                if (
+                    not os.path.exists(index_path) or
+                    os.path.getmtime(index_path) < os.path.getmtime(bodies_path)
+                ):
+                    build_index(bodies_path, index_path)
+                self._bodies[corpus] = (
+                    _map(bodies_path), memoryview(_map(index_path)).cast('q')
+                )
+            return self._bodies[corpus]
+
+
+_ID = re.compile(rb'\{"id_": ?(\d+)[,}]')
+
+def build_index(bodies_path:str, index_path:str):
+    '''
+    Build offset index of bodies.jsonl.
+
+    Arguments:
+        bodies_path (str) : Path of bodies.jsonl
+        index_path  (str) : Path of the index to write
+
+    Returns:
+        None
+    '''
+    offsets = dict()
+    position = 0
+    with open(bodies_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            match = _ID.match(line)
+            id_ = int(match.group(1)) if match else json.loads(line)['id_']
+            offsets[id_] = position
+            position += len(line)
+    index = array('q', [-1]) * (max(offsets, default=-1) + 1)
+    for id_, offset in offsets.items():
+        index[id_] = offset
+    tmp = index_path + '.tmp'
+    with open(tmp, 'wb') as f:
+        index.tofile(f)
+    os.replace(tmp, index_path)
+
+
+def _map(path:str) -> Union[mmap.mmap,bytes]:
+    '''
+    Read-only memory map of a file (empty files cannot be mapped)
+    '''
+    if os.path.getsize(path) == 0:
+        return b''
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+_snapshots = dict()
+_snapshots_lock = threading.Lock()
+
+def get_snapshot(base_url:str) -> Snapshot:
+    '''
+    Return Snapshot for a file:// base URL, opened once per process.
+
+    Arguments:
+        base_url (str) : file:// URL of the snapshot directory
+
+    Returns:
+        (Snapshot) : Snapshot instance
+    '''
+    from urllib.request import url2pathname
+    path = os.path.abspath(url2pathname(base_url[len('file://'):]))
+    with _snapshots_lock:
+        if path not in _snapshots:
+            _snapshots[path] = Snapshot(path)
+        return _snapshots[path]
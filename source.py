@@ -1,23 +1,28 @@
-from typing import Union
-import pandas as pd
-from tabulate import tabulate
+from typing import Union, Iterator, TYPE_CHECKING
 from .config import BASE_URL
-from .glob import make_request, metadata, get_content
+from .transport import BaseTransport
+from .glob import IndexedEntity, make_request, metadata, get_content, iter_content, fetch_bodies, construct_many
 from .poem import Poem
+if TYPE_CHECKING:
+    import pandas as pd
 
 
-class Source:
+class Source(IndexedEntity):
     '''
     Class corresponding to a particular source.
     '''
 
+    __slots__ = ('errors_',)
+    QUERY_TARGETS = ('poems',)
+
     def __init__(
             self, 
-            lang     : Union[None,str] = None, 
-            base_url : str             = BASE_URL, 
-            id_      : Union[None,int] = None,
-            id_poem  : Union[None,int] = None, 
-            metadata : dict            = None, 
+            lang      : Union[None,str]           = None, 
+            base_url  : str                       = BASE_URL, 
+            id_       : Union[None,int]           = None,
+            id_poem   : Union[None,int]           = None, 
+            metadata  : dict                      = None, 
+            transport : Union[BaseTransport,None] = None
         ):
         '''
         Store source metadata (if initialized by Poetree instance) or get them 
@@ -25,11 +30,13 @@ class Source:
         that will hold lists of Authors and Poem instances respectively.
 
         Arguments:
-            lang     (str|None)  : ISO code of the corpus, required if initialized directly 
-            base_url (str)       : API base URL (default: set in config.py)
-            id_      (int|None)  : Id(DB) of the source
-            id_poem  (int|None)  : Id(DB) of the poem its source is to be found
-            metadata (dict|None) : Author metadata passed when initialized by Poetree instance
+            lang      (str|None)       : ISO code of the corpus, required if initialized directly 
+            base_url  (str)            : API base URL (default: set in config.py)
+            id_       (int|None)       : Id(DB) of the source
+            id_poem   (int|None)       : Id(DB) of the poem its source is to be found
+            metadata  (dict|None)      : Author metadata passed when initialized by Poetree instance
+            transport (Transport|None) : Transport to send requests with (default: 
+                                         process-wide shared transport)
         
         Raises:
             ValueError : If neither [metadata] nor [lang] is passed
@@ -39,7 +46,10 @@ class Source:
             None    
         '''
         self.base_url = base_url
+        self.transport = transport
         self.content_ = dict()
+        self.indexes_ = dict()
+        self.errors_ = dict()
 
         if metadata is not None:
             self.metadata_ = metadata
@@ -55,9 +65,51 @@ class Source:
             raise ValueError (
                 f'One of the arguments [id_,id_poem] is required when initializing {__class__.__name__} instance directly'
             )
-        for k, v in self.metadata_.items(): setattr(self, k, v)
+        self._register('source', {'id_poem': id_poem})
                 
 
+    @classmethod
+    def from_ids(
+            cls,
+            lang        : str,
+            ids         : list,
+            id_type     : str                       = 'id_',
+            base_url    : str                       = BASE_URL,
+            transport   : Union[BaseTransport,None] = None,
+            max_workers : int                       = 8,
+        ) -> tuple:
+        '''
+        Create Source instances of many sources at once, fetching their
+        metadata concurrently.
+
+        Arguments:
+            lang        (str)            : ISO code of the corpus
+            ids         (list)           : Identifiers of the sources
+            id_type     (str)            : Which identifier [ids] are: 'id_' (source)
+                                           or 'id_poem' (a poem in the source);
+                                           default: 'id_'
+            base_url    (str)            : API base URL (default: set in config.py)
+            transport   (Transport|None) : Transport to send requests with (default: 
+                                           process-wide shared transport)
+            max_workers (int)            : Max. number of concurrent requests; default: 8
+
+        Raises:
+            ValueError : If [id_type] is not one of 'id_', 'id_poem'
+
+        Returns:
+            (tuple) : List of Source instances in the order of [ids] (None where
+                      a source failed) and dict of exceptions keyed by the
+                      identifiers that failed
+        '''
+        if id_type not in ('id_', 'id_poem'):
+            raise ValueError(f'Unknown [id_type]: {id_type} (expected one of id_, id_poem)')
+        return construct_many(
+            lambda value: cls(lang, base_url, transport=transport, **{id_type: value}),
+            list(ids),
+            max_workers,
+        )
+
+
     def _get_source_metadata(
             self, 
             lang    : str, 
@@ -65,7 +117,8 @@ class Source:
             id_val  : Union[int,str]
         ):
         '''
-        Get metadata on author and store them in self.metadata_
+        Get metadata on source (unless loaded already through the same 
+        transport) and store them in self.metadata_
         
         Arguments:
             lang    (str)     : ISO code of the corpus
@@ -75,32 +128,63 @@ class Source:
         Returns:
             None      
         '''
-        self.metadata_ = make_request(
+        key = 'id_' if id_type == 'id_source' else id_type
+        if self._resolve('source', lang, key, id_val):
+            return
+        response = make_request(
             self.base_url, 
             'source', 
+            self.transport,
             **{'corpus': lang, id_type: id_val}
         )
-        self.metadata_['corpus'] = lang
+        # the response may be shared with concurrent callers
+        self.metadata_ = {**response, 'corpus': lang}
 
 
-    def get_poems(self, **kwargs) -> list:
+    def get_poems(
+            self, 
+            with_bodies : bool = False, 
+            max_workers : int  = 8, 
+            **kwargs
+        ) -> list:
         '''
         Get metadata of poems in the source. Create a new Poem instance 
         for each poem, store it in a list and return it.
         
         Arguments:
-            None
+            with_bodies (bool) : Fetch bodies of the poems as well (concurrently);
+                                 poems that failed are stored in self.errors_ 
+                                 together with the exception; default: False
+            max_workers (int)  : Max. number of concurrent body requests; default: 8
         
         Returns:
             (list) : List holding instances of Poem      
         '''
         self.content_['poems'] = get_content(
-            self.base_url, 'poems', Poem, 
+            self.base_url, 'poems', Poem, self.transport,
             corpus = self.metadata_['corpus'], 
             id_source = self.metadata_['id_'],
             **kwargs
         )
+        if with_bodies:
+            self.errors_ = fetch_bodies(self.content_['poems'], max_workers)
         return self.content_['poems']     
+
+
+    def iter_poems(self, **kwargs) -> Iterator:
+        '''
+        Lazy variant of get_poems(): yield Poem instances one by one
+        without storing them in self.content_.
+        
+        Returns:
+            (Iterator) : Poem instances      
+        '''
+        return iter_content(
+            self.base_url, 'poems', Poem, self.transport,
+            corpus = self.metadata_['corpus'], 
+            id_source = self.metadata_['id_'],
+            **kwargs
+        )
     
 
     def metadata(
@@ -109,7 +193,7 @@ class Source:
             output  : str             = 'list', 
             sortby  : Union[str,list] = None, 
             reverse : bool            = False
-        ) -> Union[list, pd.DataFrame, None]:
+        ) -> Union[list, 'pd.DataFrame', None]:
         '''
         Returns targt metadata either as a formatted table (tabular=True)
         or as a list as received from API (tabular=False). The list may be
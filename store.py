@@ -0,0 +1,323 @@
+import json
+import os
+from array import array
+from typing import Union, Iterator
+import numpy as np
+from .columnar import Tokens, STRING_FIELDS, INT_FIELDS
+from .search import iter_bodies
+from .snapshot import _map
+
+# rows of a column converted from the raw file to .npy at once
+CHUNK = 1 << 22
+
+
+class Strings:
+    '''
+    Read-only list of strings stored as one UTF-8 heap (memory-mapped) and
+    an array of offsets, so that opening it costs nothing and a string is
+    decoded only when accessed. The reverse lookup table of code() is
+    built on first use.
+    '''
+
+    def __init__(self, data_path:str, offsets_path:str):
+        '''
+        Arguments:
+            data_path    (str) : Concatenated UTF-8 strings
+            offsets_path (str) : .npy array of their start offsets (plus size
+                                 of the heap)
+        '''
+        self.data = _map(data_path)
+        self.offsets = _load(offsets_path)
+        self._codes = None
+
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+
+    def __getitem__(self, i:Union[int,slice]) -> Union[str,list]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+
+    def __iter__(self) -> Iterator:
+        for i in range(len(self)):
+            yield self[i]
+
+
+    def code(self, value:str) -> int:
+        '''
+        Position of a string (-1 if it does not occur)
+        '''
+        if self._codes is None:
+            self._codes = {v: i for i, v in enumerate(self)}
+        return self._codes.get(value, -1)
+
+
+def _load(path:str) -> np.ndarray:
+    '''
+    Memory-mapped .npy array (read into memory if empty, which cannot be
+    mapped)
+    '''
+    array_ = np.load(path, mmap_mode='r')
+    return array_ if array_.size > 0 else np.load(path)
+
+
+class _Heap:
+    '''
+    Writer of a Strings heap
+    '''
+
+    def __init__(self, data_path:str, offsets_path:str):
+        self.file = open(data_path, 'wb')
+        self.offsets_path = offsets_path
+        self.offsets = array('q', [0])
+
+    def extend(self, strings:list):
+        for s in strings:
+            data = (s or '').encode('utf-8')
+            self.file.write(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        self.file.close()
+        np.save(self.offsets_path, np.array(self.offsets, dtype=np.int64))
+
+
+def _code_dtype(size:int) -> np.dtype:
+    '''
+    Narrowest dtype holding codes of a vocabulary of [size] strings
+    '''
+    for dtype in (np.uint8, np.uint16, np.int32):
+        if size <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _finish_column(raw_path:str, path:str, length:int, dtype:np.dtype):
+    '''
+    Convert a raw int32 column to .npy of [dtype], chunk by chunk
+    '''
+    if length == 0:
+        np.save(path, np.empty(0, dtype=dtype))
+    else:
+        raw = np.memmap(raw_path, dtype=np.int32, mode='r', shape=(length,))
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(length,))
+        for start in range(0, length, CHUNK):
+            out[start:start + CHUNK] = raw[start:start + CHUNK]
+        out.flush()
+        del out, raw
+    os.remove(raw_path)
+
+
+def export_store(out_dir:str, source:Union[str,list], corpus:Union[str,None]=None) -> 'TokenStore':
+    '''
+    Write all tokens of a corpus into a token store in [out_dir], poem by
+    poem, without holding the bodies in memory: one .npy column per token
+    field (string fields as codes into vocabularies shared by all poems,
+    in the narrowest integer type), poem, line, stanza and sentence
+    boundaries as offset arrays, ids of the poems and texts of the lines.
+
+    Arguments:
+        out_dir (str)      : Directory of the store
+        source  (str|list) : Path of bodies.jsonl of a snapshot or list of
+                             Poem instances
+        corpus  (str|None) : ISO code of the corpus, recorded in meta.json;
+                             default: None
+
+    Returns:
+        (TokenStore) : The store opened for reading
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    fields = INT_FIELDS + STRING_FIELDS
+    raw = {f: open(os.path.join(out_dir, f'{f}.raw'), 'wb') for f in fields}
+    vocab = {f: list() for f in STRING_FIELDS}
+    codes = {f: dict() for f in STRING_FIELDS}
+    poem_ids = array('q')
+    poem_offsets, poem_lines = array('q', [0]), array('q', [0])
+    line_offsets = array('q', [0])
+    line_id, line_stanza = array('i'), array('i')
+    stanza_offsets, sentence_offsets = array('q'), array('q')
+    texts = _Heap(os.path.join(out_dir, 'text.bin'), os.path.join(out_dir, 'text_offsets.npy'))
+    try:
+        for id_, body in iter_bodies(source):
+            tokens = Tokens.from_body(body, vocab, codes)
+            for f in fields:
+                tokens.columns[f].tofile(raw[f])
+            start, start_line = poem_offsets[-1], poem_lines[-1]
+            stanza_offsets.extend((tokens.stanza_offsets[:-1] + start_line).tolist())
+            sentence_offsets.extend((tokens.sentence_offsets[:-1] + start).tolist())
+            line_offsets.extend((tokens.line_offsets[1:] + start).tolist())
+            line_id.extend(tokens.line_id.tolist())
+            line_stanza.extend(tokens.line_stanza.tolist())
+            texts.extend(tokens.line_text)
+            poem_ids.append(id_)
+            poem_offsets.append(start + len(tokens))
+            poem_lines.append(start_line + tokens.n_lines)
+    finally:
+        for f in raw.values():
+            f.close()
+        texts.close()
+
+    n_tokens, n_lines = poem_offsets[-1], poem_lines[-1]
+    stanza_offsets.append(n_lines)
+    sentence_offsets.append(n_tokens)
+    for f in fields:
+        dtype = _code_dtype(len(vocab[f])) if f in STRING_FIELDS else np.dtype(np.int32)
+        _finish_column(os.path.join(out_dir, f'{f}.raw'), os.path.join(out_dir, f'{f}.npy'), n_tokens, dtype)
+    for f in STRING_FIELDS:
+        heap = _Heap(os.path.join(out_dir, f'vocab_{f}.bin'), os.path.join(out_dir, f'vocab_{f}.npy'))
+        heap.extend(vocab[f])
+        heap.close()
+    arrays = {
+        'poem_ids'         : (poem_ids, np.int64),
+        'poem_offsets'     : (poem_offsets, np.int64),
+        'poem_lines'       : (poem_lines, np.int64),
+        'line_offsets'     : (line_offsets, np.int64),
+        'line_id'          : (line_id, np.int32),
+        'line_stanza'      : (line_stanza, np.int32),
+        'stanza_offsets'   : (stanza_offsets, np.int64),
+        'sentence_offsets' : (sentence_offsets, np.int64),
+    }
+    for name, (values, dtype) in arrays.items():
+        values = np.array(values, dtype=dtype)
+        if name in ('stanza_offsets', 'sentence_offsets'):
+            # empty poems add no boundary of their own
+            values = np.unique(values)
+        np.save(os.path.join(out_dir, f'{name}.npy'), values)
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'corpus' : corpus,
+            'poems'  : len(poem_ids),
+            'lines'  : n_lines,
+            'tokens' : n_tokens,
+            'vocab'  : {f: len(vocab[f]) for f in STRING_FIELDS},
+        }, f)
+    return TokenStore(out_dir)
+
+
+class TokenStore:
+    '''
+    Token store written by export_store(). All arrays are memory-mapped
+    read-only, so opening a store is nearly free and processes opening the
+    same store share one copy of it in the page cache. The whole corpus is
+    available as one Tokens instance (self.tokens: masks, counts and syntax
+    patterns over all poems at once), single poems by their id.
+    '''
+
+    def __init__(self, path:str):
+        '''
+        Arguments:
+            path (str) : Directory of the store
+
+        Raises:
+            FileNotFoundError : If [path] holds no token store
+        '''
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            raise FileNotFoundError(f'No token store found in {path}')
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        load = lambda name: _load(os.path.join(path, f'{name}.npy'))
+        self.columns = {f: load(f) for f in INT_FIELDS + STRING_FIELDS}
+        self.vocab = {
+            f: Strings(os.path.join(path, f'vocab_{f}.bin'), os.path.join(path, f'vocab_{f}.npy'))
+            for f in STRING_FIELDS
+        }
+        self.texts = Strings(os.path.join(path, 'text.bin'), os.path.join(path, 'text_offsets.npy'))
+        self.poem_ids = load('poem_ids')
+        self.poem_offsets = load('poem_offsets')
+        self.poem_lines = load('poem_lines')
+        self.line_offsets = load('line_offsets')
+        self.line_id = load('line_id')
+        self.line_stanza = load('line_stanza')
+        self.stanza_offsets = load('stanza_offsets')
+        self.sentence_offsets = load('sentence_offsets')
+        self.tokens = Tokens(
+            self.columns, self.vocab, self.line_offsets, self.line_id,
+            self.line_stanza, self.texts, self.stanza_offsets, self.sentence_offsets,
+        )
+        self._positions = None
+
+
+    def __len__(self) -> int:
+        return len(self.poem_ids)
+
+
+    def __contains__(self, id_:int) -> bool:
+        return self._position(id_) >= 0
+
+
+    def _position(self, id_:int) -> int:
+        if self._positions is None:
+            self._positions = {int(p): i for i, p in enumerate(self.poem_ids)}
+        return self._positions.get(int(id_), -1)
+
+
+    def poem(self, id_:int) -> Tokens:
+        '''
+        Columnar body of a poem: views of the memory-mapped columns
+        sharing the vocabularies of the store
+
+        Arguments:
+            id_ (int) : Id of the poem
+
+        Raises:
+            KeyError : If the poem is not in the store
+
+        Returns:
+            (Tokens) : Columnar body as returned by Poem.tokens()
+        '''
+        i = self._position(id_)
+        if i < 0:
+            raise KeyError(f'Poem {id_} not in the token store')
+        start, end = int(self.poem_offsets[i]), int(self.poem_offsets[i + 1])
+        first, last = int(self.poem_lines[i]), int(self.poem_lines[i + 1])
+
+        def within(offsets:np.ndarray, lo:int, hi:int) -> np.ndarray:
+            a, b = np.searchsorted(offsets, [lo, hi])
+            return np.append(np.asarray(offsets[a:b]) - lo, hi - lo)
+
+        return Tokens(
+            {f: c[start:end] for f, c in self.columns.items()},
+            self.vocab,
+            np.asarray(self.line_offsets[first:last + 1]) - start,
+            self.line_id[first:last],
+            self.line_stanza[first:last],
+            self.texts[first:last],
+            within(self.stanza_offsets, first, last),
+            within(self.sentence_offsets, start, end),
+        )
+
+
+    def poem_of(self, positions:Union[int,np.ndarray]) -> Union[int,np.ndarray]:
+        '''
+        Ids of poems of tokens at corpus-wide [positions] (e.g. positions
+        matched in self.tokens)
+
+        Arguments:
+            positions (int|np.ndarray) : Token positions
+
+        Returns:
+            (int|np.ndarray) : Poem ids
+        '''
+        return self.poem_ids[np.searchsorted(self.poem_offsets, positions, side='right') - 1]
+
+
+    def line_of(self, positions:Union[int,np.ndarray]) -> Union[int,np.ndarray]:
+        '''
+        Line of tokens at corpus-wide [positions], counted from 0 within
+        their poem
+
+        Arguments:
+            positions (int|np.ndarray) : Token positions
+
+        Returns:
+            (int|np.ndarray) : Line numbers
+        '''
+        lines = np.searchsorted(self.line_offsets, positions, side='right') - 1
+        poems = np.searchsorted(self.poem_offsets, positions, side='right') - 1
+        return lines - self.poem_lines[poems]
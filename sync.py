@@ -0,0 +1,342 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, Callable
+from .config import BASE_URL
+from .transport import BaseTransport
+from .main import Poetree
+from .corpus import Corpus
+from .poem import Poem
+from .mirror import write_jsonl, read_jsonl, append_bodies, _done_poems
+
+# corpus counts compared before anything else is requested
+COUNTS = ('n_poems', 'n_authors', 'n_lines')
+
+
+def digest(data:Union[dict,list,str]) -> str:
+    '''
+    SHA-256 of a JSON line (str) or of the canonical JSON of a record
+
+    Arguments:
+        data (dict|list|str) : Record or JSON line
+
+    Returns:
+        (str) : Hex digest
+    '''
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _body_lines(path:str) -> dict:
+    '''
+    Hashes and numbers of lines of the bodies stored in bodies.jsonl, the
+    last occurrence of a poem winning (as in the snapshot index). The file
+    is only read: a trailing partial line (left by an interrupted run) is
+    skipped, not cut off.
+    '''
+    stored = dict()
+    if not os.path.exists(path):
+        return stored
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            line = line[:-1]
+            if line:
+                record = json.loads(line)
+                stored[str(record['id_'])] = (digest(line), len(record.get('body') or list()))
+    return stored
+
+
+def _bootstrap(path:str) -> dict:
+    '''
+    Manifest of a corpus directory written by mirror() (or by an earlier
+    version without manifest): hashes of what is stored locally, counts
+    unknown so that the first sync compares the listings
+    '''
+    manifest = {'counts': None, 'authors': dict(), 'sources': dict(), 'poems': dict()}
+    for target in ('authors', 'sources'):
+        listing = os.path.join(path, f'{target}.jsonl')
+        if os.path.exists(listing):
+            manifest[target] = {str(r['id_']): digest(r) for r in read_jsonl(listing)}
+    listing = os.path.join(path, 'poems.jsonl')
+    if os.path.exists(listing):
+        stored = _body_lines(os.path.join(path, 'bodies.jsonl'))
+        for r in read_jsonl(listing):
+            id_ = str(r['id_'])
+            body, lines = stored.get(id_, (None, None))
+            manifest['poems'][id_] = {'sha256': digest(r), 'body': body, 'lines': lines}
+    return manifest
+
+
+def load_manifest(path:str) -> dict:
+    '''
+    Load manifest.json of a corpus directory (bootstrapped from the stored
+    files if missing)
+
+    Arguments:
+        path (str) : Corpus directory of a snapshot
+
+    Returns:
+        (dict) : Corpus counts, hashes of authors, sources and poems by id
+                 and hashes of stored bodies
+    '''
+    manifest_path = os.path.join(path, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return _bootstrap(path)
+    with open(manifest_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(path:str, manifest:dict):
+    '''
+    Write manifest.json of a corpus directory atomically
+    '''
+    manifest_path = os.path.join(path, 'manifest.json')
+    tmp = manifest_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path)
+
+
+def _diff(old:dict, new:dict) -> dict:
+    return {
+        'added'   : sum(1 for k in new if k not in old),
+        'changed' : sum(1 for k in new if k in old and old[k] != new[k]),
+        'removed' : sum(1 for k in old if k not in new),
+    }
+
+
+def _accounted(manifest:dict, counts:dict, n_authors:int) -> bool:
+    '''
+    Whether the listed authors and poems and the lines of the stored bodies
+    add up to the counts of the corpus
+    '''
+    poems = manifest['poems'].values()
+    if any(p.get('lines') is None for p in poems):
+        return False
+    return (
+        n_authors == counts['n_authors']
+        and len(poems) == counts['n_poems']
+        and sum(p['lines'] for p in poems) == counts['n_lines']
+    )
+
+
+def sync_corpus(
+        corpus      : Corpus,
+        out_dir     : str,
+        max_workers : int                  = 8,
+        progress    : Union[Callable,None] = None,
+        bodies      : bool                 = True,
+    ) -> dict:
+    '''
+    Bring [out_dir]/[corpus]/ up to date with the API, downloading only what
+    is new or changed. Counts of poems, authors and lines of the corpus are
+    compared with the manifest first; only if they differ (or bodies are
+    missing) are the listings of authors, sources and poems fetched and
+    compared record by record, and bodies fetched for new or changed poems.
+    If the listings and the line counts of the stored bodies still do not
+    add up to the counts of the corpus, the change is in bodies only: all
+    other bodies are fetched again and those that differ are stored. This
+    is not possible for a snapshot limited to some authors (filters of
+    dump), where bodies are fetched for new, changed and missing poems
+    only. The counts are recorded once the snapshot accounts for them, so
+    a sync that failed (or fetched no bodies) is redone by the next one.
+    SHA-256 hashes of all records and stored bodies are kept in
+    manifest.json.
+
+    Bodies are appended to bodies.jsonl, the last occurrence of a poem
+    being the current one; bodies of removed poems stay in the file but
+    are no longer listed.
+
+    Arguments:
+        corpus      (Corpus)        : Corpus to sync
+        out_dir     (str)           : Snapshot directory
+        max_workers (int)           : Max. number of concurrent requests; default: 8
+        progress    (Callable|None) : Called as progress(lang, done, total) after
+                                      each body; default: None
+        bodies      (bool)          : Download bodies of new and changed poems;
+                                      default: True
+
+    Returns:
+        (dict) : Numbers of added, changed and removed authors, sources and
+                 poems, number of bodies fetched and exceptions keyed by ids
+                 of poems that failed
+    '''
+    lang = corpus.metadata_['corpus']
+    path = os.path.join(out_dir, lang)
+    os.makedirs(path, exist_ok=True)
+    manifest = load_manifest(path)
+    counts = {k: corpus.metadata_.get(k) for k in COUNTS}
+    report = {'authors': None, 'sources': None, 'poems': None, 'bodies': 0, 'errors': dict()}
+    missing = bodies and any(p['body'] is None for p in manifest['poems'].values())
+    if manifest['counts'] == counts and not missing:
+        return report
+
+    filters = dict()
+    filters_path = os.path.join(path, 'filters.json')
+    if os.path.exists(filters_path):
+        with open(filters_path, encoding='utf-8') as f:
+            filters = json.load(f)
+
+    authors = corpus.get_authors(**filters)
+    hashes = {str(a.id_): digest(a.metadata_) for a in authors}
+    report['authors'] = _diff(manifest['authors'], hashes)
+    ids = set(hashes)
+    sources = [
+        s.metadata_ for s in corpus.get_sources()
+        if len(filters) == 0 or str(s.metadata_.get('id_author')) in ids
+    ]
+    source_hashes = {str(s['id_']): digest(s) for s in sources}
+    report['sources'] = _diff(manifest['sources'], source_hashes)
+
+    # poems of all authors are compared, a changed poem need not change its author
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        listings = executor.map(lambda a: [p.metadata_ for p in a.get_poems()], authors)
+        poems = [p for listing in listings for p in listing]
+    poem_hashes = {str(p['id_']): digest(p) for p in poems}
+    report['poems'] = _diff(
+        {k: v['sha256'] for k, v in manifest['poems'].items()}, poem_hashes
+    )
+
+    poems_path = os.path.join(path, 'poems.jsonl')
+    write_jsonl(os.path.join(path, 'authors.jsonl'), [a.metadata_ for a in authors])
+    write_jsonl(os.path.join(path, 'sources.jsonl'), sources)
+    write_jsonl(poems_path, poems)
+    manifest['authors'], manifest['sources'] = hashes, source_hashes
+    previous = manifest['poems']
+    manifest['poems'] = dict()
+    for k, h in poem_hashes.items():
+        old = previous.get(k, dict())
+        if old.get('sha256') == h:
+            manifest['poems'][k] = {'sha256': h, 'body': old['body'], 'lines': old.get('lines')}
+        else:
+            manifest['poems'][k] = {'sha256': h, 'body': None, 'lines': None}
+
+    if not bodies:
+        # changes of bodies are not looked for, the counts are left to a
+        # sync with bodies
+        save_manifest(path, manifest)
+        return report
+
+    bodies_path = os.path.join(path, 'bodies.jsonl')
+    _done_poems(bodies_path)
+    by_id = {str(p['id_']): p for p in poems}
+
+    def fetch(ids:list, recheck:bool) -> dict:
+        todo = (
+            Poem(base_url=corpus.base_url, transport=corpus.transport, metadata=by_id[k])
+            for k in ids
+        )
+        done = 0
+
+        def stored(poem:Poem, line:Union[str,None]):
+            nonlocal done
+            done += 1
+            if line is not None:
+                entry = manifest['poems'][str(poem.id_)]
+                entry['body'], entry['lines'] = digest(line), len(poem.content_)
+                report['bodies'] += 1
+            if progress is not None:
+                progress(lang, done, len(ids))
+
+        def unchanged(poem:Poem, line:str) -> bool:
+            return recheck and manifest['poems'][str(poem.id_)]['body'] == digest(line)
+
+        return append_bodies(todo, bodies_path, max_workers, stored, unchanged)
+
+    try:
+        fetched = [k for k, p in manifest['poems'].items() if p['body'] is None]
+        report['errors'] = fetch(fetched, recheck=False)
+        # a snapshot limited to some authors never adds up to the counts of
+        # the corpus, only its listings are compared
+        unexplained = len(filters) == 0 and not _accounted(manifest, counts, len(authors))
+        if len(report['errors']) == 0 and unexplained:
+            fetched = set(fetched)
+            report['errors'] = fetch([k for k in manifest['poems'] if k not in fetched], recheck=True)
+        if len(report['errors']) == 0:
+            manifest['counts'] = counts
+    finally:
+        save_manifest(path, manifest)
+    return report
+
+
+def sync(
+        out_dir     : str,
+        corpora     : Union[list,None]          = None,
+        base_url    : str                       = BASE_URL,
+        transport   : Union[BaseTransport,None] = None,
+        max_workers : int                       = 8,
+        progress    : Union[Callable,None]      = None,
+        bodies      : bool                      = True,
+    ) -> dict:
+    '''
+    Refresh a local snapshot (see mirror.mirror) with the changes of the
+    collection since the last sync, corpus by corpus (see sync_corpus).
+    Corpora not in the snapshot yet are downloaded whole.
+
+    Arguments:
+        out_dir     (str)            : Snapshot directory
+        corpora     (list|None)      : ISO codes of corpora to sync; default: None
+                                       (all corpora present in the snapshot)
+        base_url    (str)            : API base URL (default: set in config.py)
+        transport   (Transport|None) : Transport to send requests with (default:
+                                       process-wide shared transport)
+        max_workers (int)            : Max. number of concurrent requests; default: 8
+        progress    (Callable|None)  : Called as progress(lang, done, total) after
+                                       each body; default: None
+        bodies      (bool)           : Download bodies of new and changed poems;
+                                       default: True
+
+    Returns:
+        (dict) : Report of each corpus as returned by sync_corpus()
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    all_corpora = Poetree(base_url, transport).get_corpora()
+    write_jsonl(os.path.join(out_dir, 'corpora.jsonl'), [c.metadata_ for c in all_corpora])
+    if corpora is None:
+        corpora = [
+            c.metadata_['corpus'] for c in all_corpora
+            if os.path.isdir(os.path.join(out_dir, c.metadata_['corpus']))
+        ]
+    reports = dict()
+    for corpus in all_corpora:
+        if corpus.metadata_['corpus'] in corpora:
+            reports[corpus.metadata_['corpus']] = sync_corpus(
+                corpus, out_dir, max_workers, progress, bodies
+            )
+    return reports
+
+
+def verify(out_dir:str, corpora:Union[list,None]=None) -> dict:
+    '''
+    Check the stored bodies of a snapshot against the hashes recorded in
+    the manifests. Nothing is written, not even to cut off a partial line
+    left by an interrupted run.
+
+    Arguments:
+        out_dir (str)       : Snapshot directory
+        corpora (list|None) : ISO codes of corpora to check; default: None
+                              (all corpora with a manifest)
+
+    Returns:
+        (dict) : Ids of poems whose body is missing or does not match its
+                 hash, by corpus
+    '''
+    if corpora is None:
+        corpora = sorted(
+            name for name in os.listdir(out_dir)
+            if os.path.exists(os.path.join(out_dir, name, 'manifest.json'))
+        )
+    mismatches = dict()
+    for lang in corpora:
+        path = os.path.join(out_dir, lang)
+        manifest = load_manifest(path)
+        stored = _body_lines(os.path.join(path, 'bodies.jsonl'))
+        mismatches[lang] = [
+            int(k) for k, p in manifest['poems'].items()
+            if p['body'] is None or stored.get(k, (None,))[0] != p['body']
+        ]
+    return mismatches
@@ -0,0 +1,218 @@
+from typing import Union
+import numpy as np
+from .columnar import Tokens
+
+
+class Tree:
+    '''
+    Dependency trees of all sentences of a body as index arrays over its
+    tokens (positions as in Tokens): self.parents holds the position of
+    the head of each token (-1 for roots and heads that cannot be
+    resolved), children of token i are
+    self.children[self.child_offsets[i]:self.child_offsets[i + 1]]
+    in token order.
+    '''
+
+    def __init__(self, parents:np.ndarray):
+        '''
+        Arguments:
+            parents (np.ndarray) : Position of the head of each token (-1 for roots)
+        '''
+        self.parents = parents
+        has = np.flatnonzero(parents >= 0)
+        order = np.argsort(parents[has], kind='stable')
+        self.children = has[order].astype(np.int32)
+        counts = np.bincount(parents[has], minlength=len(parents))
+        self.child_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+
+    @classmethod
+    def from_tokens(cls, tokens:Tokens) -> 'Tree':
+        '''
+        Resolve heads of tokens: a head is the token of the same sentence
+        whose id equals its head (ids of words are numbered within sentence).
+
+        Arguments:
+            tokens (Tokens) : Columnar body
+
+        Returns:
+            (Tree) : Dependency trees
+        '''
+        n = len(tokens)
+        offsets = tokens.sentence_offsets
+        sentence = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+        ids = (sentence << 32) | tokens['id'].astype(np.int64)
+        order = np.argsort(ids, kind='stable')
+        ids = ids[order]
+        heads = tokens['head'].astype(np.int64)
+        wanted = (sentence << 32) | np.maximum(heads, 0)
+        found = np.minimum(np.searchsorted(ids, wanted), max(n - 1, 0))
+        valid = (heads > 0) & (ids[found] == wanted) if n > 0 else np.zeros(0, dtype=bool)
+        return cls(np.where(valid, order[found], -1).astype(np.int32))
+
+
+    @classmethod
+    def concat(cls, trees:list) -> 'Tree':
+        '''
+        Concatenate trees of several bodies (in the order of Tokens.concat)
+
+        Arguments:
+            trees (list) : Tree instances
+
+        Returns:
+            (Tree) : Trees of all the bodies
+        '''
+        parents, start = list(), 0
+        for tree in trees:
+            parents.append(np.where(tree.parents >= 0, tree.parents + start, -1))
+            start += len(tree)
+        return cls(np.concatenate(parents).astype(np.int32) if len(parents) > 0 else np.empty(0, np.int32))
+
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+
+    @property
+    def roots(self) -> np.ndarray:
+        '''
+        Positions of tokens without a head
+        '''
+        return np.flatnonzero(self.parents < 0)
+
+
+    def children_of(self, i:int) -> np.ndarray:
+        '''
+        Positions of children of token [i]
+        '''
+        return self.children[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+
+    def depth(self) -> np.ndarray:
+        '''
+        Distance of each token from the root of its tree (0 for roots)
+        '''
+        depth = np.zeros(len(self), dtype=np.int32)
+        current = self.parents.copy()
+        # cycles (malformed annotation) stop the walk after len() steps
+        for _ in range(len(self)):
+            active = current >= 0
+            if not active.any():
+                break
+            depth[active] += 1
+            current[active] = self.parents[current[active]]
+        return depth
+
+
+def match(tokens:Tokens, tree:Tree, pattern:dict) -> np.ndarray:
+    '''
+    Find subtrees matching a pattern. A pattern is a dict of token
+    conditions as in Tokens.mask() (a value or a list of accepted values
+    of any field) with an optional 'children' list of patterns, each of
+    which must be matched by a child of the token; identical child
+    patterns must be matched by as many distinct children. For example
+    a NOUN subject with an adjective modifier:
+
+        {'upos': 'NOUN', 'deprel': 'nsubj', 'children': [{'upos': 'ADJ', 'deprel': 'amod'}]}
+
+    All tokens are tested at once, so [tokens] and [tree] may hold many
+    poems (see Tokens.concat, Tree.concat).
+
+    Arguments:
+        tokens  (Tokens) : Columnar bodies
+        tree    (Tree)   : Their dependency trees
+        pattern (dict)   : Pattern
+
+    Raises:
+        ValueError : If the pattern refers to an unknown field
+
+    Returns:
+        (np.ndarray) : Positions of tokens matching the root of the pattern
+    '''
+    return np.flatnonzero(_match(tokens, tree, pattern))
+
+
+def _match(tokens:Tokens, tree:Tree, pattern:dict) -> np.ndarray:
+    conditions = {k: v for k, v in pattern.items() if k != 'children'}
+    unknown = set(conditions) - set(tokens.columns)
+    if len(unknown) > 0:
+        raise ValueError(f'Unknown fields in pattern: {", ".join(sorted(unknown))}')
+    result = tokens.mask(**conditions)
+    groups = dict()
+    for child in pattern.get('children') or list():
+        groups.setdefault(_freeze(child), [child, 0])[1] += 1
+    for child, needed in groups.values():
+        if not result.any():
+            break
+        matched = _match(tokens, tree, child)
+        parents = tree.parents[matched]
+        counts = np.bincount(parents[parents >= 0], minlength=len(tokens))
+        result &= counts >= needed
+    return result
+
+
+def _freeze(pattern:Union[dict,list,str,int]):
+    '''
+    Hashable form of a pattern (for counting identical child patterns)
+    '''
+    if isinstance(pattern, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in pattern.items()))
+    if isinstance(pattern, (list, tuple, set)):
+        return tuple(_freeze(v) for v in pattern)
+    return pattern
+
+
+class Treebank:
+    '''
+    Columnar bodies and dependency trees of many poems concatenated once,
+    so that any number of patterns can be matched over all of them.
+    '''
+
+    def __init__(self, poems:list):
+        '''
+        Bodies are fetched if not fetched yet; columnar bodies and trees of
+        single poems are cached in the Poem instances.
+
+        Arguments:
+            poems (list) : Poem instances
+        '''
+        self.poems = poems
+        self.tokens = Tokens.concat([p.tokens() for p in poems])
+        self.tree = Tree.concat([p.tree() for p in poems])
+        self.starts = np.cumsum([0] + [len(p.tokens()) for p in poems])
+
+
+    def match(self, pattern:dict) -> dict:
+        '''
+        Find subtrees matching a pattern (see match) in all the poems
+
+        Arguments:
+            pattern (dict) : Pattern
+
+        Returns:
+            (dict) : Positions (within the poem) of tokens matching the root
+                     of the pattern keyed by Poem instances with at least
+                     one match
+        '''
+        found = match(self.tokens, self.tree, pattern)
+        which = np.searchsorted(self.starts, found, side='right') - 1
+        result = dict()
+        for i in np.unique(which):
+            result[self.poems[i]] = found[which == i] - self.starts[i]
+        return result
+
+
+def match_poems(poems:list, pattern:dict) -> dict:
+    '''
+    Find subtrees matching a pattern (see match) in many poems at once
+    (see Treebank to match several patterns)
+
+    Arguments:
+        poems   (list) : Poem instances
+        pattern (dict) : Pattern
+
+    Returns:
+        (dict) : Positions (within the poem) of tokens matching the root of
+                 the pattern keyed by Poem instances with at least one match
+    '''
+    return Treebank(poems).match(pattern)
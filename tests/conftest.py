@@ -0,0 +1,84 @@
+import pytest
+from poetree import InProcessTransport
+from poetree.transport import Response
+
+BASE_URL = 'http://poetree.test/api'
+
+
+class FakeAPI:
+    '''
+    In-memory stand-in of PoeTree API (one corpus, two authors with two
+    poems each) to be called by InProcessTransport. Records are mutable,
+    requests are recorded in self.calls.
+    '''
+
+    def __init__(self):
+        self.authors = [
+            {'id_': a, 'name': f'A{a}', 'wiki': f'Q{a}', 'viaf': str(100 + a),
+             'country': 'cz' if a == 1 else 'at', 'born': 1800 + a * 10, 'died': 1850 + a * 10}
+            for a in (1, 2)
+        ]
+        self.sources = [{'id_': a, 'title': f'S{a}', 'published': 1830 + a, 'id_author': a} for a in (1, 2)]
+        self.poems = [
+            {'id_': p, 'title': f'P{p}', 'id_author': 1 + (p - 1) // 2, 'id_source': 1 + (p - 1) // 2}
+            for p in (1, 2, 3, 4)
+        ]
+        self.lines = {p['id_']: 6 for p in self.poems}
+        self.calls = list()
+
+    def corpus(self) -> dict:
+        return {
+            'corpus'    : 'cs',
+            'n_authors' : len(self.authors),
+            'n_poems'   : len(self.poems),
+            'n_lines'   : sum(self.lines[p['id_']] for p in self.poems),
+        }
+
+    def body(self, id_:int) -> list:
+        return [
+            {'id_': i, 'id': i, 'id_stanza': 1 + i // 4, 'text': f'line {i}', 'words': [
+                {'id_': j, 'id': j + 1, 'id_sentence': 1 + i // 2, 'head': 0 if j == 0 else 1,
+                 'deprel': 'root' if j == 0 else 'amod', 'form': f'w{(id_ + j) % 7}',
+                 'lemma': f'l{(id_ + j) % 5}', 'upos': 'NOUN' if j == 0 else 'ADJ',
+                 'xpos': 'X', 'feats': '_'}
+                for j in range(3)
+            ]}
+            for i in range(self.lines[id_])
+        ]
+
+    def __call__(self, endpoint:str, **params):
+        self.calls.append((endpoint, params))
+        if endpoint == 'corpora':
+            return [self.corpus()]
+        if endpoint == 'corpus':
+            return self.corpus()
+        if endpoint == 'authors':
+            return [a for a in self.authors if str(a['born']) >= params.get('born_after', '0')]
+        if endpoint == 'author':
+            return next(a for a in self.authors if str(a['id_']) == params.get('id_author'))
+        if endpoint == 'sources':
+            return [s for s in self.sources if str(s['id_author']) == params.get('id_author', str(s['id_author']))]
+        if endpoint == 'poems':
+            return [
+                p for p in self.poems
+                if str(p['id_author']) == params.get('id_author', str(p['id_author']))
+                and str(p['id_source']) == params.get('id_source', str(p['id_source']))
+            ]
+        if endpoint == 'poem':
+            poem = next((dict(p) for p in self.poems if str(p['id_']) == params['id_poem']), None)
+            if poem is None:
+                return Response(404)
+            if params.get('lines') != '0':
+                poem['body'] = self.body(poem['id_'])
+            return poem
+        return Response(404)
+
+
+@pytest.fixture
+def api() -> FakeAPI:
+    return FakeAPI()
+
+
+@pytest.fixture
+def transport(api:FakeAPI) -> InProcessTransport:
+    return InProcessTransport(api)
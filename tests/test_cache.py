@@ -0,0 +1,57 @@
+import time
+import pytest
+from poetree import Corpus, Cache, CacheMiss, InProcessTransport
+from conftest import BASE_URL
+
+
+def _rows(cache:Cache) -> int:
+    return cache._connection().db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+def test_round_trip(tmp_path):
+    cache = Cache(str(tmp_path / 'cache.sqlite'))
+    key = cache.key(BASE_URL, 'authors', {'corpus': 'cs', 'id_author': 1})
+    assert key == cache.key(BASE_URL + '/', 'authors', {'id_author': '1', 'corpus': 'cs'})
+    assert cache.get(key) is None
+    cache.set(key, b'[1, 2]')
+    assert cache.get(key) == b'[1, 2]'
+
+
+def test_ttl(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = Cache(path, ttl=0.05)
+    cache.set('old', b'old')
+    time.sleep(0.1)
+    assert cache.get('old') is None
+    # expired entries stay until something is stored
+    assert _rows(cache) == 1
+    assert Cache(path, ttl=0.05, offline=True).get('old') == b'old'
+    cache.set('new', b'new')
+    assert _rows(cache) == 1
+    assert cache.get('new') == b'new'
+
+
+def test_offline_serves_stale_responses(tmp_path, api):
+    path = str(tmp_path / 'cache.sqlite')
+    online = InProcessTransport(api, cache=Cache(path, ttl=0.05))
+    Corpus('cs', base_url=BASE_URL, transport=online).get_authors()
+    time.sleep(0.1)
+    api.calls.clear()
+    offline = Cache(path, ttl=0.05, offline=True)
+    for _ in range(2):
+        transport = InProcessTransport(api, cache=offline)
+        corpus = Corpus('cs', base_url=BASE_URL, transport=transport)
+        assert [a.name for a in corpus.get_authors()] == ['A1', 'A2']
+    assert api.calls == []
+    with pytest.raises(CacheMiss):
+        corpus.get_sources()
+
+
+def test_max_size(tmp_path):
+    cache = Cache(str(tmp_path / 'cache.sqlite'), max_size=2000)
+    for i in range(20):
+        cache.set(str(i), bytes(range(256)) * 4)
+    assert cache.get('0') is None
+    assert cache.get('19') is not None
+    total = cache._connection().db.execute('SELECT total FROM meta').fetchone()[0]
+    assert 0 < total <= 2000
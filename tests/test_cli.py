@@ -0,0 +1,10 @@
+from poetree.cli import Progress
+
+
+def test_progress_counts_poems_across_passes(transport):
+    progress = Progress(transport, quiet=True)
+    # mirror resumed at the 11th poem, then two passes of sync
+    for lang, done, total in [('cs', 11, 12), ('cs', 12, 12), ('de', 1, 2), ('de', 2, 2), ('de', 1, 3), ('de', 2, 3)]:
+        progress(lang, done, total)
+    assert progress.poems == 6
+    assert (progress.lang, progress.done, progress.total) == ('de', 2, 3)
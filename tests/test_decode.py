@@ -0,0 +1,26 @@
+import json
+import pytest
+from poetree.decode import iter_array, loads, dumps
+
+DOCUMENT = [1, 3.5, -2e3, 'a "quoted", [bracketed] string', None, True, {'k': [1, {'n': 'č'}]}, []]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 1000])
+def test_iter_array_any_chunking(size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode('utf-8')
+    chunks = [data[i:i + size] for i in range(0, len(data), size)]
+    assert list(iter_array(chunks)) == DOCUMENT
+
+
+def test_iter_array_empty():
+    assert list(iter_array([b' [ ', b' ] '])) == []
+
+
+@pytest.mark.parametrize('data', [b'{"a": 1}', b'[1, 2', b'[1 2]', b'[1] [2]'])
+def test_iter_array_invalid(data):
+    with pytest.raises(ValueError):
+        list(iter_array([data]))
+
+
+def test_round_trip():
+    assert loads(dumps(DOCUMENT)) == DOCUMENT
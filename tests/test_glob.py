@@ -0,0 +1,58 @@
+import threading
+import time
+from poetree import Corpus, Author, Cache, InProcessTransport
+
+SOURCES = [{'id': i, 'id_author': 1, 'title': f'Source {i}'} for i in range(1, 51)]
+
+
+def test_concurrent_cached_listing(tmp_path):
+    calls = list()
+
+    def handler(endpoint, **params):
+        calls.append(endpoint)
+        # keep the request in flight until the other thread joins it
+        time.sleep(0.2)
+        return SOURCES
+
+    transport = InProcessTransport(handler, cache=Cache(str(tmp_path / 'cache.sqlite')))
+    corpus = Corpus(metadata={'corpus': 'cs'}, transport=transport)
+    results = [None, None]
+
+    def run(i):
+        results[i] = Corpus(metadata={'corpus': 'cs'}, transport=transport).get_sources()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ['sources']
+    for result in results:
+        assert [s.metadata_['id'] for s in result] == [s['id'] for s in SOURCES]
+        assert all(s.metadata_['corpus'] == 'cs' for s in result)
+    # records of the response are not modified
+    assert all('corpus' not in s for s in SOURCES)
+    assert len(corpus.get_sources()) == len(SOURCES)
+
+
+def test_concurrent_lookups_do_not_share_metadata(api):
+    def handler(endpoint, **params):
+        time.sleep(0.2)
+        return api(endpoint, **params)
+
+    transport = InProcessTransport(handler, identity_map=False)
+    results = [None, None]
+
+    def run(i):
+        results[i] = Author('cs', id_=1, base_url='http://poetree.test/api', transport=transport)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [endpoint for endpoint, _ in api.calls] == ['author']
+    assert results[0].metadata_ == results[1].metadata_
+    assert results[0].metadata_ is not results[1].metadata_
@@ -0,0 +1,29 @@
+from poetree import Corpus, Cache, InProcessTransport
+from poetree.metrics import Metrics
+from conftest import BASE_URL
+
+
+def test_events_of_the_request_path(tmp_path, api):
+    transport = InProcessTransport(api, cache=Cache(str(tmp_path / 'cache.sqlite')))
+    events = list()
+    for name in ('before_request', 'after_response', 'cache', 'decode', 'construct'):
+        transport.hooks.on(name, lambda name=name, **event: events.append((name, event.get('endpoint'))))
+    Corpus('cs', base_url=BASE_URL, transport=transport).get_authors()
+    assert ('construct', 'authors') in events
+    assert [n for n, e in events if e == 'authors'] == [
+        'cache', 'before_request', 'after_response', 'decode', 'construct'
+    ]
+    events.clear()
+    Corpus('cs', base_url=BASE_URL, transport=transport).get_authors()
+    assert [n for n, e in events if e == 'authors'] == ['cache', 'decode', 'construct']
+
+
+def test_metrics(api):
+    transport = InProcessTransport(api)
+    metrics = Metrics().attach(transport)
+    corpus = Corpus('cs', base_url=BASE_URL, transport=transport)
+    list(corpus.iter_authors())
+    data = metrics.as_dict()
+    assert sum(data['requests']['authors'].values()) == 1
+    assert data['size']['authors']['count'] == 1
+    assert 'request_duration_seconds' in metrics.to_prometheus()
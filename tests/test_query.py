@@ -0,0 +1,22 @@
+import pytest
+from poetree import Corpus, Poem
+from poetree.aio import AsyncCorpus
+from conftest import BASE_URL
+
+
+def test_query(transport, api):
+    corpus = Corpus('cs', base_url=BASE_URL, transport=transport)
+    assert [a.name for a in corpus.query(country='cz')] == ['A1']
+    assert [s.title for s in corpus.query('sources', published_after=1832)] == ['S2']
+    author = corpus.query(born_after=1815)[0]
+    assert [p.id_ for p in author.query()] == [3, 4]
+    calls = len(api.calls)
+    assert [p.id_ for p in author.query(id_source=2)] == [3, 4]
+    assert len(api.calls) == calls
+    with pytest.raises(ValueError):
+        corpus.query('poems')
+
+
+def test_query_only_on_indexed_entities(transport):
+    assert not hasattr(Poem('cs', id_=1, base_url=BASE_URL, transport=transport), 'query')
+    assert not hasattr(AsyncCorpus, 'query')
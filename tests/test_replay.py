@@ -0,0 +1,45 @@
+import pytest
+from poetree import Corpus, Poem, CacheMiss, InProcessTransport, ReplayTransport
+from poetree.transport import Response
+from conftest import BASE_URL
+
+
+def test_record_and_replay(tmp_path, api, transport):
+    path = str(tmp_path / 'recordings')
+    recorder = ReplayTransport(path, 'record', transport)
+    corpus = Corpus('cs', base_url=BASE_URL, transport=recorder)
+    recorded = [a.name for a in corpus.get_authors()]
+    body = Poem('cs', id_=1, base_url=BASE_URL, transport=recorder).get_body()
+
+    api.calls.clear()
+    player = ReplayTransport(path)
+    corpus = Corpus('cs', base_url='http://elsewhere:8080/api', transport=player)
+    assert [a.name for a in corpus.get_authors()] == recorded
+    assert Poem('cs', id_=1, base_url=BASE_URL, transport=player).get_body() == body
+    assert api.calls == []
+    with pytest.raises(CacheMiss):
+        corpus.get_sources()
+
+
+def test_auto_records_missing(tmp_path, api, transport):
+    path = str(tmp_path / 'recordings')
+    player = ReplayTransport(path, 'auto', transport)
+    Corpus('cs', base_url=BASE_URL, transport=player).get_authors()
+    Corpus('cs', base_url=BASE_URL, transport=ReplayTransport(path, 'auto', transport)).get_authors()
+    assert [endpoint for endpoint, _ in api.calls] == ['corpus', 'authors']
+
+
+def test_transient_failures_not_recorded(tmp_path):
+    failures = [Response(503)]
+    transport = InProcessTransport(lambda endpoint, **params: failures.pop() if failures else [])
+    recorder = ReplayTransport(str(tmp_path), 'record', transport)
+    assert recorder.get(BASE_URL + '/corpora', {}).status_code == 503
+    with pytest.raises(CacheMiss):
+        ReplayTransport(str(tmp_path)).get(BASE_URL + '/corpora', {})
+    assert recorder.get(BASE_URL + '/corpora', {}).status_code == 200
+    assert ReplayTransport(str(tmp_path)).get(BASE_URL + '/corpora', {}).content == b'[]'
+
+
+def test_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        ReplayTransport(str(tmp_path), 'rewind')
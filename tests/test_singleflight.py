@@ -0,0 +1,46 @@
+import asyncio
+import threading
+import time
+import pytest
+from poetree.singleflight import SingleFlight, AsyncSingleFlight
+
+
+def test_concurrent_calls_share_one():
+    flight, calls, results = SingleFlight(), list(), list()
+
+    def work():
+        calls.append(1)
+        time.sleep(0.1)
+        return 42
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do('k', work))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == [42] * 4
+    # nothing is remembered once the call finishes
+    assert flight.do('k', work) == 42
+    assert calls == [1, 1]
+
+
+def test_errors_are_shared():
+    flight = SingleFlight()
+    with pytest.raises(KeyError):
+        flight.do('k', lambda: {}['missing'])
+
+
+def test_async_calls_share_one():
+    flight, calls = AsyncSingleFlight(), list()
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    async def main():
+        return await asyncio.gather(*(flight.do('k', work) for _ in range(4)))
+
+    assert asyncio.run(main()) == ['done'] * 4
+    assert calls == [1]
@@ -0,0 +1,40 @@
+import pytest
+from poetree import Corpus, Poem, Source
+from poetree.mirror import mirror
+from conftest import BASE_URL
+
+
+@pytest.fixture(params=[True, False], ids=['bodies', 'metadata'])
+def snapshot(request, tmp_path, transport):
+    mirror(str(tmp_path), base_url=BASE_URL, transport=transport, bodies=request.param)
+    return 'file://' + str(tmp_path), request.param
+
+
+def test_listings(snapshot):
+    url, _ = snapshot
+    corpus = Corpus('cs', base_url=url)
+    assert [a.name for a in corpus.get_authors()] == ['A1', 'A2']
+    assert [a.name for a in corpus.get_authors(born_after=1820)] == ['A2']
+    assert [p.id_ for p in corpus.get_authors()[1].get_poems()] == [3, 4]
+
+
+def test_poem_metadata_without_bodies(snapshot):
+    url, _ = snapshot
+    assert Poem('cs', id_=3, base_url=url).title == 'P3'
+    assert Source('cs', id_poem=3, base_url=url).id_ == 2
+
+
+def test_bodies(snapshot):
+    url, bodies = snapshot
+    poem = Poem('cs', id_=2, base_url=url)
+    if bodies:
+        assert len(poem.get_body()) == 6
+    else:
+        with pytest.raises(Exception, match='without bodies'):
+            poem.get_body()
+
+
+def test_missing_poem(snapshot):
+    url, _ = snapshot
+    with pytest.raises(Exception, match='not found'):
+        Poem('cs', id_=99, base_url=url)
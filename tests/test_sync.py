@@ -0,0 +1,71 @@
+import json
+import os
+from poetree.mirror import mirror
+from poetree.sync import sync, verify
+from conftest import BASE_URL
+
+
+def _bodies(path:str) -> list:
+    with open(os.path.join(path, 'cs', 'bodies.jsonl'), encoding='utf-8') as f:
+        return [json.loads(line)['id_'] for line in f]
+
+
+def _poem_calls(api) -> list:
+    return [int(params['id_poem']) for endpoint, params in api.calls if endpoint == 'poem']
+
+
+def test_unchanged(tmp_path, api, transport):
+    mirror(str(tmp_path), base_url=BASE_URL, transport=transport)
+    sync(str(tmp_path), base_url=BASE_URL, transport=transport)
+    api.calls.clear()
+    report = sync(str(tmp_path), base_url=BASE_URL, transport=transport)
+    assert report['cs']['authors'] is None
+    assert [endpoint for endpoint, _ in api.calls] == ['corpora']
+
+
+def test_added_poem(tmp_path, api, transport):
+    mirror(str(tmp_path), base_url=BASE_URL, transport=transport)
+    api.poems.append({'id_': 5, 'title': 'P5', 'id_author': 2, 'id_source': 2})
+    api.lines[5] = 3
+    api.calls.clear()
+    report = sync(str(tmp_path), base_url=BASE_URL, transport=transport)
+    assert report['cs']['poems'] == {'added': 1, 'changed': 0, 'removed': 0}
+    assert _poem_calls(api) == [5]
+    assert sorted(_bodies(str(tmp_path))) == [1, 2, 3, 4, 5]
+
+
+def test_body_only_change(tmp_path, api, transport):
+    mirror(str(tmp_path), base_url=BASE_URL, transport=transport)
+    sync(str(tmp_path), base_url=BASE_URL, transport=transport)
+    api.lines[2] = 7
+    report = sync(str(tmp_path), base_url=BASE_URL, transport=transport)
+    assert report['cs']['poems'] == {'added': 0, 'changed': 0, 'removed': 0}
+    # all bodies are rechecked, only the changed one is stored again
+    assert sorted(_bodies(str(tmp_path))) == [1, 2, 2, 3, 4]
+    assert verify(str(tmp_path)) == {'cs': []}
+    api.calls.clear()
+    sync(str(tmp_path), base_url=BASE_URL, transport=transport)
+    assert [endpoint for endpoint, _ in api.calls] == ['corpora']
+
+
+def test_filtered_snapshot(tmp_path, api, transport):
+    mirror(str(tmp_path), base_url=BASE_URL, transport=transport, authors={'born_after': 1820})
+    api.calls.clear()
+    sync(str(tmp_path), base_url=BASE_URL, transport=transport)
+    assert _poem_calls(api) == []
+    api.poems.append({'id_': 5, 'title': 'P5', 'id_author': 2, 'id_source': 2})
+    api.lines[5] = 3
+    api.calls.clear()
+    sync(str(tmp_path), base_url=BASE_URL, transport=transport)
+    assert _poem_calls(api) == [5]
+    assert sorted(_bodies(str(tmp_path))) == [3, 4, 5]
+
+
+def test_verify_is_read_only(tmp_path, transport):
+    mirror(str(tmp_path), base_url=BASE_URL, transport=transport)
+    bodies_path = os.path.join(str(tmp_path), 'cs', 'bodies.jsonl')
+    with open(bodies_path, 'a', encoding='utf-8') as f:
+        f.write('{"id_": 4, "bo')
+    size = os.path.getsize(bodies_path)
+    assert verify(str(tmp_path), ['cs']) == {'cs': []}
+    assert os.path.getsize(bodies_path) == size
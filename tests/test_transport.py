@@ -0,0 +1,27 @@
+import threading
+import time
+from poetree import transport as transport_module
+
+
+def test_default_transport_created_once(monkeypatch):
+    created = list()
+
+    class Slow:
+        def __init__(self):
+            # widen the window in which threads race for the first use
+            time.sleep(0.05)
+            created.append(self)
+
+    monkeypatch.setattr(transport_module, 'Transport', Slow)
+    monkeypatch.setattr(transport_module, '_default_transport', None)
+    results = list()
+    threads = [
+        threading.Thread(target=lambda: results.append(transport_module.get_default_transport()))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(created) == 1
+    assert all(r is created[0] for r in results)
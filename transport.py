@@ -0,0 +1,495 @@
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from http import HTTPStatus
+from typing import Union, Callable, Iterator, TYPE_CHECKING
+from urllib.parse import urlsplit
+from .cache import Cache, CacheMiss
+from .identity import IdentityMap
+from .singleflight import SingleFlight
+from .scheduler import Scheduler, retry_after
+from .hooks import Hooks
+from .decode import dumps
+if TYPE_CHECKING:
+    import requests
+
+
+class Response:
+    '''
+    Response produced without HTTP (by InProcessTransport or
+    ReplayTransport), offering the parts of requests.Response that the
+    client uses.
+    '''
+
+    def __init__(
+            self,
+            status_code : int              = 200,
+            content     : bytes            = b'',
+            reason      : Union[str,None]  = None,
+            headers     : Union[dict,None] = None,
+        ):
+        '''
+        Arguments:
+            status_code (int)       : HTTP status code; default: 200
+            content     (bytes)     : Body of the response
+            reason      (str|None)  : Reason phrase; default: None (standard phrase
+                                      of the status code)
+            headers     (dict|None) : Response headers
+        '''
+        if reason is None:
+            try:
+                reason = HTTPStatus(status_code).phrase
+            except ValueError:
+                reason = ''
+        self.status_code = status_code
+        self.content = content
+        self.reason = reason
+        self.headers = headers or dict()
+
+
+    def iter_content(self, chunk_size:int=65536) -> Iterator[bytes]:
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+    def close(self):
+        pass
+
+
+class _Streamed:
+    '''
+    Streamed requests.Response reporting 'after_response' to the hooks once
+    its body has been read (or the response closed): the size is that of
+    the body as read (decompressed, unlike Content-Length) and the elapsed
+    time includes the download, as for responses that are not streamed.
+    '''
+
+    def __init__(self, response:'requests.Response', hooks:Hooks, sent:float, event:dict):
+        self.response = response
+        self.hooks = hooks
+        self.sent = sent
+        self.event = event
+        self.size = 0
+        self._reported = False
+
+
+    def __getattr__(self, name:str):
+        return getattr(self.response, name)
+
+
+    def iter_content(self, chunk_size:int=65536) -> Iterator[bytes]:
+        for chunk in self.response.iter_content(chunk_size=chunk_size):
+            self.size += len(chunk)
+            yield chunk
+        self._report()
+
+
+    def close(self):
+        self._report()
+        self.response.close()
+
+
+    def _report(self):
+        if not self._reported:
+            self._reported = True
+            self.hooks.emit(
+                'after_response', status=self.response.status_code, size=self.size,
+                elapsed=time.perf_counter() - self.sent, **self.event
+            )
+
+
+class BaseTransport:
+    '''
+    Interface of transports used by Poetree, Corpus, Author, Source and
+    Poem instances. A transport sends requests (get()) and holds the state
+    shared by the instances using it: response cache, identity map,
+    deduplication of in-flight requests and event hooks. Subclasses
+    implement send(), which get() wraps with reporting to the hooks (or
+    override get() itself, like the HTTP Transport does).
+    '''
+
+    def __init__(
+            self,
+            cache        : Union[Cache,None] = None,
+            identity_map : bool              = True,
+        ):
+        '''
+        Arguments:
+            cache        (Cache|None) : On-disk response cache consulted before
+                                        sending a request; default: None
+            identity_map (bool)       : Resolve entities through an identity map, so
+                                        that an entity already loaded through this
+                                        transport is not fetched again; default: True
+        '''
+        self.cache = cache
+        self.identity = IdentityMap() if identity_map else None
+        self.inflight = SingleFlight()
+        self.hooks = Hooks()
+
+
+    def get(self, url:str, params:dict, stream:bool=False) -> Union['requests.Response',Response]:
+        '''
+        Send GET request.
+
+        Arguments:
+            url    (str)  : Full URL of the API method
+            params (dict) : URL parameters
+            stream (bool) : The body is to be read with response.iter_content();
+                            default: False
+
+        Returns:
+            (requests.Response|Response) : Server response
+        '''
+        event = {
+            'url': url, 'endpoint': url.rsplit('/', 1)[-1], 'params': params, 'attempt': 0
+        }
+        self.hooks.emit('before_request', **event)
+        sent = time.perf_counter()
+        try:
+            response = self.send(url, params, stream)
+        except Exception as e:
+            self.hooks.emit('on_error', error=e, elapsed=time.perf_counter() - sent, **event)
+            raise
+        self.hooks.emit(
+            'after_response', status=response.status_code, size=len(response.content),
+            elapsed=time.perf_counter() - sent, **event
+        )
+        return response
+
+
+    def send(self, url:str, params:dict, stream:bool=False) -> Union['requests.Response',Response]:
+        '''
+        Produce response to a request (to be implemented by subclasses)
+        '''
+        raise NotImplementedError
+
+
+    def close(self):
+        '''
+        Release resources held by the transport.
+        '''
+        pass
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Transport(BaseTransport):
+    '''
+    Pooled HTTP transport shared by Poetree, Corpus, Author, Source and Poem
+    instances. Owns a requests.Session with keep-alive connections and
+    gzip encoding, applies timeouts and retries transient failures
+    (connection errors, timeouts, 429 and 5xx responses) with exponential
+    backoff and full jitter. Every attempt is admitted by a scheduler that
+    adapts the number of requests in flight to the server's responses.
+    Events of the request path are reported to handlers in hooks.
+    '''
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(
+            self,
+            timeout          : Union[float,tuple]    = (3.05, 30),
+            retries          : int                   = 3,
+            backoff_factor   : float                 = 0.5,
+            backoff_max      : float                 = 30,
+            pool_connections : int                   = 10,
+            pool_maxsize     : int                   = 10,
+            headers          : Union[dict,None]      = None,
+            cache            : Union[Cache,None]     = None,
+            identity_map     : bool                  = True,
+            scheduler        : Union[Scheduler,None] = None,
+        ):
+        '''
+        Create the session and mount a pooled adapter for http and https.
+
+        Arguments:
+            timeout          (float|tuple)    : Request timeout in seconds, either a single
+                                                value or (connect, read); default: (3.05, 30)
+            retries          (int)            : How many times to retry a failed request;
+                                                default: 3
+            backoff_factor   (float)          : Base of exponential backoff in seconds;
+                                                default: 0.5
+            backoff_max      (float)          : Upper bound of a single backoff in seconds;
+                                                default: 30
+            pool_connections (int)            : Number of connection pools to cache; default: 10
+            pool_maxsize     (int)            : Max. number of connections kept alive per pool;
+                                                should be at least the number of threads
+                                                sharing the transport; default: 10
+            headers          (dict|None)      : Extra headers sent with every request
+            cache            (Cache|None)     : On-disk response cache consulted before
+                                                sending a request; default: None
+            identity_map     (bool)           : Resolve entities through an identity map, so
+                                                that an entity already loaded through this
+                                                transport is not fetched again; default: True
+            scheduler        (Scheduler|None) : Rate and concurrency limits of requests;
+                                                default: None (adaptive, at most pool_maxsize
+                                                requests in flight, no rate limit)
+
+        Returns:
+            None
+        '''
+        super().__init__(cache, identity_map)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.scheduler = scheduler if scheduler is not None else Scheduler(
+            max_concurrency = pool_maxsize
+        )
+        # requests is imported here rather than at the top, so that clients
+        # working offline (snapshots, replays) do not pay for importing it
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections = pool_connections,
+            pool_maxsize     = pool_maxsize,
+            max_retries      = 0,
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding' : 'gzip, deflate',
+            'Connection'      : 'keep-alive',
+        })
+        if headers is not None:
+            self.session.headers.update(headers)
+
+
+    def get(self, url:str, params:dict, stream:bool=False) -> 'requests.Response':
+        '''
+        Send GET request, retrying transient failures. The last response
+        (or exception) is passed on once retries are exhausted. Each attempt
+        waits for the scheduler; a streamed response counts as finished
+        once its headers arrive. A successful streamed response is reported
+        to the 'after_response' hooks once its body has been read.
+
+        Arguments:
+            url    (str)  : Full URL of the API method
+            params (dict) : URL parameters
+            stream (bool) : Do not download the body before returning, it is
+                            to be read with response.iter_content(); default: False
+
+        Returns:
+            (requests.Response) : Server response
+        '''
+        import requests
+        endpoint = url.rsplit('/', 1)[-1]
+        priority = self.scheduler.priority(url, params)
+        for attempt in range(self.retries + 1):
+            started = self.scheduler.acquire(priority)
+            overloaded, delay = False, None
+            event = {'url': url, 'endpoint': endpoint, 'params': params, 'attempt': attempt}
+            self.hooks.emit('before_request', **event)
+            sent = time.perf_counter()
+            try:
+                response = self.session.get(
+                    url, params=params, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                overloaded = True
+                self.hooks.emit('on_error', error=e, elapsed=time.perf_counter() - sent, **event)
+                if attempt == self.retries:
+                    raise
+            else:
+                if stream and response.status_code == 200:
+                    # reported once the body has been read
+                    response = _Streamed(response, self.hooks, sent, event)
+                else:
+                    self.hooks.emit(
+                        'after_response', status=response.status_code, size=len(response.content),
+                        elapsed=time.perf_counter() - sent, **event
+                    )
+                if response.status_code in self.RETRY_STATUS:
+                    overloaded, delay = True, retry_after(response.headers)
+                if not overloaded or attempt == self.retries:
+                    return response
+                response.close()
+            finally:
+                self.scheduler.release(started, (url, priority), overloaded, delay)
+            time.sleep(self._backoff(attempt))
+
+
+    def _backoff(self, attempt:int) -> float:
+        '''
+        Exponential backoff with full jitter: random delay between zero and
+        backoff_factor * 2^attempt, capped at backoff_max.
+
+        Arguments:
+            attempt (int) : Number of the failed attempt (starting from 0)
+
+        Returns:
+            (float) : Delay in seconds
+        '''
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2 ** attempt))
+
+
+    def close(self):
+        '''
+        Close all pooled connections.
+        '''
+        self.session.close()
+
+
+class InProcessTransport(BaseTransport):
+    '''
+    Transport calling a Python function instead of sending HTTP requests,
+    e.g. Snapshot(path).request or a fake API in tests. The handler gets the
+    API method name and URL parameters as keyword arguments (strings, like
+    a server would) and returns the decoded response, which is encoded to JSON so that the
+    rest of the client works as with a real server. It may also return a
+    Response to control the status code; exceptions are passed on.
+
+        transport = InProcessTransport(lambda endpoint, **params: [...])
+        Poetree(transport=transport).get_corpora()
+    '''
+
+    def __init__(
+            self,
+            handler      : Callable,
+            cache        : Union[Cache,None] = None,
+            identity_map : bool              = True,
+        ):
+        '''
+        Arguments:
+            handler      (Callable)   : Function (endpoint, **params) -> dict|list|Response
+            cache        (Cache|None) : On-disk response cache; default: None
+            identity_map (bool)       : Resolve entities through an identity map;
+                                        default: True
+        '''
+        super().__init__(cache, identity_map)
+        self.handler = handler
+
+
+    def send(self, url:str, params:dict, stream:bool=False) -> Response:
+        endpoint = url.rstrip('/').rsplit('/', 1)[-1]
+        result = self.handler(endpoint, **{k: str(v) for k, v in params.items()})
+        if isinstance(result, Response):
+            return result
+        return Response(200, dumps(result), headers={'Content-Type': 'application/json'})
+
+
+class ReplayTransport(BaseTransport):
+    '''
+    Transport recording responses to gzip-compressed files and playing them
+    back. In 'record' mode requests are sent through another transport and
+    every response (except transient failures) is saved; in 'replay' mode
+    responses are read from the files only, a request that was not recorded
+    raises CacheMiss; 'auto' replays what is recorded and records the rest.
+    Recordings are keyed by URL path and parameters, one file per response,
+    and can be shared (e.g. committed as test fixtures).
+    '''
+
+    MODES = ('record', 'replay', 'auto')
+
+    def __init__(
+            self,
+            path         : str,
+            mode         : str                       = 'replay',
+            transport    : Union[BaseTransport,None] = None,
+            cache        : Union[Cache,None]         = None,
+            identity_map : bool                      = True,
+            level        : int                       = 6,
+        ):
+        '''
+        Arguments:
+            path         (str)                : Directory of the recordings
+            mode         (str)                : 'record', 'replay' or 'auto'; default: 'replay'
+            transport    (BaseTransport|None) : Transport to record from;
+                                                default: None (new Transport())
+            cache        (Cache|None)         : On-disk response cache; default: None
+            identity_map (bool)               : Resolve entities through an identity map;
+                                                default: True
+            level        (int)                : Gzip compression level (1-9); default: 6
+
+        Raises:
+            ValueError : If [mode] is unknown
+        '''
+        if mode not in self.MODES:
+            raise ValueError(f'Unknown mode [{mode}], use one of: {", ".join(self.MODES)}')
+        super().__init__(cache, identity_map)
+        self.path = path
+        self.mode = mode
+        self.transport = transport
+        self.level = level
+        os.makedirs(path, exist_ok=True)
+
+
+    @staticmethod
+    def key(url:str, params:dict) -> str:
+        '''
+        Name of the recording of a request: hash of the path of the URL
+        and the parameters (in any order). Host and port are left out, so
+        recordings of a local server replay whatever port it runs on.
+        '''
+        params = sorted((str(k), str(v)) for k, v in params.items())
+        path = urlsplit(url).path
+        return hashlib.sha256(json.dumps([path, params]).encode('utf-8')).hexdigest()
+
+
+    def send(self, url:str, params:dict, stream:bool=False) -> Response:
+        path = os.path.join(self.path, self.key(url, params) + '.json.gz')
+        if self.mode != 'record' and os.path.exists(path):
+            with gzip.open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                return Response(meta['status'], f.read(), meta['reason'], meta['headers'])
+        if self.mode == 'replay':
+            raise CacheMiss(f'Response not recorded: {url} {params}')
+        if self.transport is None:
+            self.transport = Transport()
+        response = self.transport.get(url, params)
+        headers = {
+            k: v for k, v in response.headers.items()
+            if k.lower() in ('content-type', 'retry-after')
+        }
+        if response.status_code not in Transport.RETRY_STATUS:
+            meta = {
+                'url'     : url,
+                'params'  : {str(k): str(v) for k, v in params.items()},
+                'status'  : response.status_code,
+                'reason'  : response.reason,
+                'headers' : headers,
+            }
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with gzip.open(tmp, 'wb', compresslevel=self.level) as f:
+                f.write(json.dumps(meta).encode('utf-8') + b'\n')
+                f.write(response.content)
+            os.replace(tmp, path)
+        return Response(response.status_code, response.content, response.reason, headers)
+
+
+    def close(self):
+        '''
+        Close the transport recorded from.
+        '''
+        if self.transport is not None:
+            self.transport.close()
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+def get_default_transport() -> Transport:
+    '''
+    Return the transport used by instances created without one. It is
+    created on first use and shared by the whole process.
+
+    Returns:
+        (Transport) : Process-wide default transport
+    '''
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+    return _default_transport